@@ -0,0 +1,664 @@
+#! /usr/bin/env python3
+
+
+import sys
+import itertools
+import json
+import operator
+import time
+
+import options
+import pddl
+import timers
+from functools import reduce
+
+def convert_rules(prog):
+    RULE_TYPES = {
+        "join": JoinRule,
+        "product": ProductRule,
+        "project": ProjectRule,
+        }
+    result = []
+    for rule in prog.rules:
+        RuleType = RULE_TYPES[rule.type]
+        new_effect, new_conditions = variables_to_numbers(
+            rule.effect, rule.conditions)
+        rule = RuleType(new_effect, new_conditions)
+        #rule.validate()
+        result.append(rule)
+    return result
+
+def variables_to_numbers(effect, conditions):
+    new_effect_args = list(effect.args)
+    rename_map = {}
+    for i, arg in enumerate(effect.args):
+        if arg[0] == "?":
+            rename_map[arg] = i
+            new_effect_args[i] = i
+    new_effect = pddl.Atom(effect.predicate, new_effect_args)
+
+    # There are three possibilities for arguments in conditions:
+    # 1. They are variables that occur in the effect. In that case,
+    #    they are replaced by the corresponding position in the
+    #    effect, as indicated by the rename_map.
+    # 2. They are constants. In that case, the unifier must guarantee
+    #    that they are matched appropriately. In that case, they are
+    #    not modified (remain strings denoting objects).
+    # 3. They are variables that don't occur in the effect (are
+    #    projected away). This is only allowed in projection rules.
+    #    Such arguments are also not modified (remain "?x" strings).
+
+    new_conditions = []
+    for cond in conditions:
+        new_cond_args = [rename_map.get(arg, arg) for arg in cond.args]
+        new_conditions.append(pddl.Atom(cond.predicate, new_cond_args))
+    return new_effect, new_conditions
+
+class BuildRule:
+    def prepare_effect(self, new_atom, cond_index):
+        effect_args = list(self.effect.args)
+        cond = self.conditions[cond_index]
+        for var_no, obj in zip(cond.args, new_atom.args):
+            if isinstance(var_no, int):
+                effect_args[var_no] = obj
+        return effect_args
+    def __str__(self):
+        return "%s :- %s" % (self.effect, ", ".join(map(str, self.conditions)))
+    def __repr__(self):
+        return "<%s %s>" % (self.__class__.__name__, self)
+
+class JoinRule(BuildRule):
+    def __init__(self, effect, conditions):
+        self.effect = effect
+        self.conditions = conditions
+        left_args = conditions[0].args
+        right_args = conditions[1].args
+        left_vars = {var for var in left_args if isinstance(var, int)}
+        right_vars = {var for var in right_args if isinstance(var, int)}
+        common_vars = sorted(left_vars & right_vars)
+        self.common_var_positions = [
+            [args.index(var) for var in common_vars]
+            for args in (list(left_args), list(right_args))]
+        self.atoms_by_key = ({}, {})
+    def validate(self):
+        assert len(self.conditions) == 2, self
+        left_args = self.conditions[0].args
+        right_args = self.conditions[1].args
+        eff_args = self.effect.args
+        left_vars = {v for v in left_args
+                     if isinstance(v, int) or v[0] == "?"}
+        right_vars = {v for v in right_args
+                      if isinstance(v, int) or v[0] == "?"}
+        eff_vars = {v for v in eff_args
+                    if isinstance(v, int) or v[0] == "?"}
+        assert left_vars & right_vars, self
+        assert (left_vars | right_vars) == (left_vars & right_vars) | eff_vars, self
+    def update_index(self, new_atom, cond_index):
+        ordered_common_args = [
+            new_atom.args[position]
+            for position in self.common_var_positions[cond_index]]
+        key = tuple(ordered_common_args)
+        self.atoms_by_key[cond_index].setdefault(key, []).append(new_atom)
+    def fire(self, new_atom, cond_index, enqueue_func):
+        effect_args = self.prepare_effect(new_atom, cond_index)
+        ordered_common_args = [
+            new_atom.args[position]
+            for position in self.common_var_positions[cond_index]]
+        key = tuple(ordered_common_args)
+        other_cond_index = 1 - cond_index
+        other_cond = self.conditions[other_cond_index]
+        for atom in self.atoms_by_key[other_cond_index].get(key, []):
+            for var_no, obj in zip(other_cond.args, atom.args):
+                if isinstance(var_no, int):
+                    effect_args[var_no] = obj
+            enqueue_func(self.effect.predicate, effect_args)
+
+class ProductRule(BuildRule):
+    def __init__(self, effect, conditions):
+        self.effect = effect
+        self.conditions = conditions
+        # For each condition, the bindings of the atoms seen so far. We
+        # compute them once when an atom arrives, so that firing only needs
+        # to combine the new atom with the stored bindings.
+        self.bindings_by_index = [[] for c in self.conditions]
+        self.empty_atom_list_no = len(self.conditions)
+    def validate(self):
+        assert len(self.conditions) >= 2, self
+        cond_vars = [{v for v in cond.args
+                      if isinstance(v, int) or v[0] == "?"}
+                     for cond in self.conditions]
+        all_cond_vars = reduce(set.union, cond_vars)
+        eff_vars = {v for v in self.effect.args
+                    if isinstance(v, int) or v[0] == "?"}
+        assert len(all_cond_vars) == len(eff_vars), self
+        assert len(all_cond_vars) == sum([len(c) for c in cond_vars])
+    def update_index(self, new_atom, cond_index):
+        bindings_list = self.bindings_by_index[cond_index]
+        if not bindings_list:
+            self.empty_atom_list_no -= 1
+        bindings_list.append(
+            self._get_bindings(new_atom, self.conditions[cond_index]))
+
+    def _get_bindings(self, atom, cond):
+        return [(var_no, obj) for var_no, obj in zip(cond.args, atom.args)
+                if isinstance(var_no, int)]
+
+    def fire(self, new_atom, cond_index, enqueue_func):
+        if self.empty_atom_list_no:
+            return
+
+        # Binding: a (var_no, object) pair
+        # Bindings: List-of(Binding)
+        # BindingsFactor: List-of(Bindings)
+        # BindingsFactors: List-of(BindingsFactor)
+        bindings_factors = [
+            bindings_list
+            for pos, bindings_list in enumerate(self.bindings_by_index)
+            if pos != cond_index]
+
+        eff_args = self.prepare_effect(new_atom, cond_index)
+        predicate = self.effect.predicate
+
+        for bindings_tuple in itertools.product(*bindings_factors):
+            for bindings in bindings_tuple:
+                for var_no, obj in bindings:
+                    eff_args[var_no] = obj
+            enqueue_func(predicate, eff_args)
+
+
+class ProjectRule(BuildRule):
+    def __init__(self, effect, conditions):
+        self.effect = effect
+        self.conditions = conditions
+    def validate(self):
+        assert len(self.conditions) == 1
+    def update_index(self, new_atom, cond_index):
+        pass
+    def fire(self, new_atom, cond_index, enqueue_func):
+        effect_args = self.prepare_effect(new_atom, cond_index)
+        enqueue_func(self.effect.predicate, effect_args)
+
+class Unifier:
+    def __init__(self, rules):
+        self.predicate_to_rule_generator = {}
+        for rule in rules:
+            for i, cond in enumerate(rule.conditions):
+                self._insert_condition(rule, i)
+    def unify(self, atom):
+        result = []
+        generator = self.predicate_to_rule_generator.get(atom.predicate)
+        if generator:
+            generator.generate(atom, result)
+        return result
+    def _insert_condition(self, rule, cond_index):
+        condition = rule.conditions[cond_index]
+        root = self.predicate_to_rule_generator.get(condition.predicate)
+        if not root:
+            root = LeafGenerator()
+        constant_arguments = [
+            (arg_index, arg)
+            for (arg_index, arg) in enumerate(condition.args)
+            if not isinstance(arg, int) and arg[0] != "?"]
+        newroot = root._insert(constant_arguments, (rule, cond_index))
+        self.predicate_to_rule_generator[condition.predicate] = newroot
+    def dump(self):
+        predicates = sorted(self.predicate_to_rule_generator)
+        print("Unifier:")
+        for pred in predicates:
+            print("    %s:" % pred)
+            rule_gen = self.predicate_to_rule_generator[pred]
+            rule_gen.dump("    " * 2)
+
+class LeafGenerator:
+    index = sys.maxsize
+    def __init__(self):
+        self.matches = []
+    def empty(self):
+        return not self.matches
+    def generate(self, atom, result):
+        result += self.matches
+    def _insert(self, args, value):
+        if not args:
+            self.matches.append(value)
+            return self
+        else:
+            root = LeafGenerator()
+            root.matches.append(value)
+            for arg_index, arg in args[::-1]:
+                new_root = MatchGenerator(arg_index, LeafGenerator())
+                new_root.match_generator[arg] = root
+                root = new_root
+            root.matches = self.matches # can be swapped in C++
+            return root
+    def dump(self, indent):
+        for match in self.matches:
+            print("%s%s" % (indent, match))
+
+class MatchGenerator:
+    def __init__(self, index, next):
+        self.index = index
+        self.matches = []
+        self.match_generator = {}
+        self.next = next
+    def empty(self):
+        return False
+    def generate(self, atom, result):
+        result += self.matches
+        generator = self.match_generator.get(atom.args[self.index])
+        if generator:
+            generator.generate(atom, result)
+        self.next.generate(atom, result)
+    def _insert(self, args, value):
+        if not args:
+            self.matches.append(value)
+            return self
+        else:
+            arg_index, arg = args[0]
+            if self.index < arg_index:
+                self.next = self.next._insert(args, value)
+                return self
+            elif self.index > arg_index:
+                new_parent = MatchGenerator(arg_index, self)
+                new_branch = LeafGenerator()._insert(args[1:], value)
+                new_parent.match_generator[arg] = new_branch
+                return new_parent
+            else:
+                branch_generator = self.match_generator.get(arg)
+                if not branch_generator:
+                    branch_generator = LeafGenerator()
+                self.match_generator[arg] = branch_generator._insert(
+                    args[1:], value)
+                return self
+    def dump(self, indent):
+        for match in self.matches:
+            print("%s%s" % (indent, match))
+        for key in sorted(self.match_generator.keys()):
+            print("%sargs[%s] == %s:" % (indent, self.index, key))
+            self.match_generator[key].dump(indent + "    ")
+        if not self.next.empty():
+            assert isinstance(self.next, MatchGenerator)
+            print("%s[*]" % indent)
+            self.next.dump(indent + "    ")
+
+class Queue:
+    def __init__(self, atoms):
+        self.queue = atoms
+        self.queue_pos = 0
+        self.enqueued = {(atom.predicate,) + tuple(atom.args)
+                         for atom in self.queue}
+        self.num_pushes = len(atoms)
+    def __bool__(self):
+        return self.queue_pos < len(self.queue)
+    __nonzero__ = __bool__
+    def push(self, predicate, args):
+        self.num_pushes += 1
+        eff_tuple = (predicate,) + tuple(args)
+        if eff_tuple not in self.enqueued:
+            self.enqueued.add(eff_tuple)
+            self.queue.append(pddl.Atom(predicate, list(args)))
+    def pop(self):
+        result = self.queue[self.queue_pos]
+        self.queue_pos += 1
+        return result
+
+# The batched semi-naive evaluation (see compute_model_semi_naive) interns
+# all objects as integers and represents the atoms of each predicate as
+# tuples of object numbers. Rules are fired once per round for all new
+# tuples of their condition predicates (the delta), and pddl.Atom objects
+# are only created for the final model.
+
+class ObjectInterner:
+    def __init__(self):
+        self.object_ids = {}
+        self.objects = []
+    def get_id(self, obj):
+        object_id = self.object_ids.get(obj)
+        if object_id is None:
+            object_id = len(self.objects)
+            self.object_ids[obj] = object_id
+            self.objects.append(obj)
+        return object_id
+    def get_ids(self, objects):
+        return tuple(self.get_id(obj) for obj in objects)
+
+def make_projection(positions):
+    # Like operator.itemgetter, but always returns a tuple.
+    if not positions:
+        return lambda row: ()
+    elif len(positions) == 1:
+        position = positions[0]
+        return lambda row: (row[position],)
+    return operator.itemgetter(*positions)
+
+class BatchedCondition:
+    def __init__(self, condition, interner):
+        self.predicate = condition.predicate
+        self.arity = len(condition.args)
+        self.checks = [
+            (position, interner.get_id(arg))
+            for position, arg in enumerate(condition.args)
+            if not isinstance(arg, int) and arg[0] != "?"]
+    def get_delta(self, delta):
+        tuples = delta.get(self.predicate, ())
+        if self.checks and tuples:
+            checks = self.checks
+            tuples = [args for args in tuples
+                      if all(args[position] == obj
+                             for position, obj in checks)]
+        return tuples
+
+class BatchedRule:
+    """Batched counterpart of a JoinRule, ProductRule or ProjectRule.
+
+    The effect arguments are computed from the concatenated tuples of
+    the conditions followed by the constant effect arguments."""
+    def __init__(self, rule, interner):
+        self.predicate = rule.effect.predicate
+        self.conditions = [BatchedCondition(cond, interner)
+                           for cond in rule.conditions]
+        offsets = list(itertools.accumulate(
+            [0] + [cond.arity for cond in self.conditions]))
+        var_positions = {}
+        for cond, offset in zip(rule.conditions, offsets):
+            for position, arg in enumerate(cond.args):
+                if isinstance(arg, int):
+                    var_positions.setdefault(arg, offset + position)
+        constants = []
+        effect_positions = []
+        for arg in rule.effect.args:
+            if isinstance(arg, int):
+                effect_positions.append(var_positions[arg])
+            else:
+                effect_positions.append(offsets[-1] + len(constants))
+                constants.append(interner.get_id(arg))
+        self.constants = tuple(constants)
+        self.get_effect_args = make_projection(effect_positions)
+
+class BatchedJoinRule(BatchedRule):
+    def __init__(self, rule, interner):
+        super().__init__(rule, interner)
+        # Like JoinRule, index the tuples of both conditions by the
+        # values of their common variables.
+        self.get_keys = [make_projection(positions)
+                         for positions in rule.common_var_positions]
+        self.tuples_by_key = ({}, {})
+    def fire(self, delta, result):
+        constants = self.constants
+        get_effect_args = self.get_effect_args
+        # The delta of the first condition is joined with the old tuples
+        # of the second condition, the delta of the second condition with
+        # all tuples of the first condition.
+        for cond_index, cond in enumerate(self.conditions):
+            tuples = cond.get_delta(delta)
+            if not tuples:
+                continue
+            get_key = self.get_keys[cond_index]
+            other_tuples_by_key = self.tuples_by_key[1 - cond_index]
+            for args in tuples:
+                matches = other_tuples_by_key.get(get_key(args))
+                if matches:
+                    if cond_index == 0:
+                        for other_args in matches:
+                            result.append(get_effect_args(
+                                args + other_args + constants))
+                    else:
+                        for other_args in matches:
+                            result.append(get_effect_args(
+                                other_args + args + constants))
+            tuples_by_key = self.tuples_by_key[cond_index]
+            for args in tuples:
+                tuples_by_key.setdefault(get_key(args), []).append(args)
+
+class BatchedProductRule(BatchedRule):
+    def __init__(self, rule, interner):
+        super().__init__(rule, interner)
+        self.tuples_by_index = [[] for c in self.conditions]
+    def fire(self, delta, result):
+        constants = self.constants
+        get_effect_args = self.get_effect_args
+        chain = itertools.chain.from_iterable
+        # The delta of each condition is combined with all tuples of the
+        # previous conditions and the old tuples of the following ones.
+        for cond_index, cond in enumerate(self.conditions):
+            tuples = cond.get_delta(delta)
+            if not tuples:
+                continue
+            factors = list(self.tuples_by_index)
+            factors[cond_index] = tuples
+            if all(factors):
+                for combination in itertools.product(*factors):
+                    result.append(get_effect_args(
+                        tuple(chain(combination)) + constants))
+            self.tuples_by_index[cond_index].extend(tuples)
+
+class BatchedProjectRule(BatchedRule):
+    def fire(self, delta, result):
+        constants = self.constants
+        get_effect_args = self.get_effect_args
+        for args in self.conditions[0].get_delta(delta):
+            result.append(get_effect_args(args + constants))
+
+class RuleProfile:
+    """Statistics about firing a rule in the model computation (see
+    options.model_profile_file)."""
+    def __init__(self, rule):
+        self.rule = rule
+        self.fires = 0
+        self.pushes = 0
+        self.duplicate_pushes = 0
+        self.time = 0.0
+    def add(self, other):
+        self.fires += other.fires
+        self.pushes += other.pushes
+        self.duplicate_pushes += other.duplicate_pushes
+        self.time += other.time
+    def get_statistics(self):
+        return {
+            "fires": self.fires,
+            "pushes": self.pushes,
+            "duplicate_pushes": self.duplicate_pushes,
+            "time": round(self.time, 6),
+            }
+
+def get_rule_profiles(prog, rules):
+    # The rules are converted from the rules of prog in the same order.
+    assert len(rules) == len(prog.rules)
+    return {rule: RuleProfile(prolog_rule)
+            for rule, prolog_rule in zip(rules, prog.rules)}
+
+def report_rule_profiles(profiles, filename, num_reported_rules=10):
+    import pddl_to_prolog
+    profiles = sorted(profiles, key=lambda profile: -profile.time)
+    origin_profiles = {}
+    for profile in profiles:
+        origin = profile.rule.origin
+        if origin not in origin_profiles:
+            origin_profiles[origin] = RuleProfile(None)
+        origin_profiles[origin].add(profile)
+    print("Rules that took the most time in the model computation:")
+    for profile in profiles[:num_reported_rules]:
+        print("%.3fs, %d fires, %d pushes (%d duplicates), from %s: %s" % (
+            profile.time, profile.fires, profile.pushes,
+            profile.duplicate_pushes, profile.rule.origin,
+            pddl_to_prolog.get_rule_string(profile.rule)))
+    data = {
+        "rules": [
+            dict(rule=pddl_to_prolog.get_rule_string(profile.rule),
+                 type=profile.rule.type, origin=profile.rule.origin,
+                 **profile.get_statistics())
+            for profile in profiles],
+        "origins": [
+            dict(origin=origin, **profile.get_statistics())
+            for origin, profile in sorted(
+                origin_profiles.items(), key=lambda item: -item[1].time)],
+        }
+    with open(filename, "w") as profile_file:
+        json.dump(data, profile_file, indent=2)
+    print("Wrote model computation profile to %s" % filename)
+
+def fire_profiled(matches, next_atom, queue, profiles):
+    for rule, cond_index in matches:
+        profile = profiles[rule]
+        num_pushes = queue.num_pushes
+        queue_length = len(queue.queue)
+        start_time = time.perf_counter()
+        rule.update_index(next_atom, cond_index)
+        rule.fire(next_atom, cond_index, queue.push)
+        profile.time += time.perf_counter() - start_time
+        profile.fires += 1
+        pushes = queue.num_pushes - num_pushes
+        profile.pushes += pushes
+        profile.duplicate_pushes += pushes - (len(queue.queue) - queue_length)
+
+def fire_batched_profiled(rules, delta, relations, new_tuples, profiles):
+    new_tuple_sets = {}
+    for rule in rules:
+        profile = profiles[rule]
+        tuples = []
+        start_time = time.perf_counter()
+        rule.fire(delta, tuples)
+        profile.time += time.perf_counter() - start_time
+        profile.fires += 1
+        profile.pushes += len(tuples)
+        relation = relations.get(rule.predicate, ())
+        seen_tuples = new_tuple_sets.setdefault(rule.predicate, set())
+        for args in tuples:
+            if args in relation or args in seen_tuples:
+                profile.duplicate_pushes += 1
+            else:
+                seen_tuples.add(args)
+        new_tuples.setdefault(rule.predicate, []).extend(tuples)
+
+def compute_model_semi_naive(prog):
+    BATCHED_RULE_TYPES = {
+        JoinRule: BatchedJoinRule,
+        ProductRule: BatchedProductRule,
+        ProjectRule: BatchedProjectRule,
+        }
+    with timers.timing("Preparing model"):
+        interner = ObjectInterner()
+        rules = []
+        rules_by_predicate = {}
+        for rule in convert_rules(prog):
+            batched_rule = BATCHED_RULE_TYPES[type(rule)](rule, interner)
+            rules.append(batched_rule)
+            for cond in batched_rule.conditions:
+                predicate_rules = rules_by_predicate.setdefault(
+                    cond.predicate, [])
+                if batched_rule not in predicate_rules:
+                    predicate_rules.append(batched_rule)
+        relations = {}
+        delta = {}
+        for fact in sorted(fact.atom for fact in prog.facts):
+            args = interner.get_ids(fact.args)
+            relation = relations.setdefault(fact.predicate, set())
+            if args not in relation:
+                relation.add(args)
+                delta.setdefault(fact.predicate, []).append(args)
+
+        if options.model_profile_file:
+            profiles = get_rule_profiles(prog, rules)
+        else:
+            profiles = None
+
+    print("Generated %d rules." % len(rules))
+    with timers.timing("Computing model"):
+        num_pushes = sum(len(tuples) for tuples in delta.values())
+        derived = list(delta.items())
+        while delta:
+            fired_rules = {}
+            for predicate in delta:
+                for rule in rules_by_predicate.get(predicate, ()):
+                    fired_rules[rule] = None
+            new_tuples = {}
+            if profiles is None:
+                for rule in fired_rules:
+                    rule.fire(delta, new_tuples.setdefault(rule.predicate, []))
+            else:
+                fire_batched_profiled(
+                    fired_rules, delta, relations, new_tuples, profiles)
+            delta = {}
+            for predicate, tuples in new_tuples.items():
+                num_pushes += len(tuples)
+                relation = relations.setdefault(predicate, set())
+                new_relation_tuples = set(tuples) - relation
+                if new_relation_tuples:
+                    relation |= new_relation_tuples
+                    delta[predicate] = list(new_relation_tuples)
+                    derived.append((predicate, delta[predicate]))
+        relevant_atoms = 0
+        auxiliary_atoms = 0
+        for predicate, tuples in derived:
+            if isinstance(predicate, str) and "$" in predicate:
+                auxiliary_atoms += len(tuples)
+            else:
+                relevant_atoms += len(tuples)
+    with timers.timing("Creating model atoms"):
+        get_object = interner.objects.__getitem__
+        model = [pddl.Atom(predicate, list(map(get_object, args)))
+                 for predicate, tuples in derived
+                 for args in tuples]
+    print("%d relevant atoms" % relevant_atoms)
+    print("%d auxiliary atoms" % auxiliary_atoms)
+    print("%d final queue length" % len(model))
+    print("%d total queue pushes" % num_pushes)
+    if profiles is not None:
+        report_rule_profiles(profiles.values(), options.model_profile_file)
+    return model
+
+def compute_model(prog):
+    if options.model_computation == "semi-naive":
+        return compute_model_semi_naive(prog)
+    with timers.timing("Preparing model"):
+        rules = convert_rules(prog)
+        unifier = Unifier(rules)
+        # unifier.dump()
+        fact_atoms = sorted(fact.atom for fact in prog.facts)
+        queue = Queue(fact_atoms)
+        if options.model_profile_file:
+            profiles = get_rule_profiles(prog, rules)
+        else:
+            profiles = None
+
+    print("Generated %d rules." % len(rules))
+    with timers.timing("Computing model"):
+        relevant_atoms = 0
+        auxiliary_atoms = 0
+        while queue:
+            next_atom = queue.pop()
+            pred = next_atom.predicate
+            if isinstance(pred, str) and "$" in pred:
+                auxiliary_atoms += 1
+            else:
+                relevant_atoms += 1
+            matches = unifier.unify(next_atom)
+            if profiles is None:
+                for rule, cond_index in matches:
+                    rule.update_index(next_atom, cond_index)
+                    rule.fire(next_atom, cond_index, queue.push)
+            else:
+                fire_profiled(matches, next_atom, queue, profiles)
+    print("%d relevant atoms" % relevant_atoms)
+    print("%d auxiliary atoms" % auxiliary_atoms)
+    print("%d final queue length" % len(queue.queue))
+    print("%d total queue pushes" % queue.num_pushes)
+    if profiles is not None:
+        report_rule_profiles(profiles.values(), options.model_profile_file)
+    return queue.queue
+
+if __name__ == "__main__":
+    import pddl_parser
+    import normalize
+    import pddl_to_prolog
+
+    print("Parsing...")
+    task = pddl_parser.open()
+    print("Normalizing...")
+    normalize.normalize(task)
+    print("Writing rules...")
+    prog = pddl_to_prolog.translate(task)
+
+    model = compute_model(prog)
+    for atom in model:
+        print(atom)
+    print("%d atoms" % len(model))
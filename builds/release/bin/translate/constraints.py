@@ -0,0 +1,250 @@
+from typing import List, Tuple
+
+class InequalityDisjunction:
+    def __init__(self, parts: List[Tuple[str, str]]):
+        self.parts = parts
+        assert len(parts)
+
+    def __str__(self):
+        disj = " or ".join([f"({v1} != {v2})" for (v1, v2) in self.parts])
+        return f"({disj})"
+
+
+class EqualityConjunction:
+    def __init__(self, equalities: List[Tuple[str, str]]):
+        self.equalities = equalities
+        # A conjunction of expressions x = y, where x,y are either strings
+        # that denote objects or variables, or ints that denote invariant
+        # parameters.
+
+        self._consistent = None
+        self._representative = None # dictionary
+        self._eq_classes = None
+
+    def __str__(self):
+        conj = " and ".join([f"({v1} = {v2})" for (v1, v2) in self.equalities])
+        return f"({conj})"
+
+    def _compute_equivalence_classes(self):
+        eq_classes = {}
+        for (v1, v2) in self.equalities:
+            c1 = eq_classes.setdefault(v1, {v1})
+            c2 = eq_classes.setdefault(v2, {v2})
+            if c1 is not c2:
+                if len(c2) > len(c1):
+                    v1, c1, v2, c2 = v2, c2, v1, c1
+                c1.update(c2)
+                for elem in c2:
+                    eq_classes[elem] = c1
+        self._eq_classes = eq_classes
+
+    def _compute_representatives(self):
+        if not self._eq_classes:
+            self._compute_equivalence_classes()
+
+        # Choose a representative for each equivalence class. Objects are
+        # prioritized over variables and ints, but at most one object per
+        # equivalence class is allowed (otherwise the conjunction is
+        # inconsistent).
+        representative = {}
+        for eq_class in self._eq_classes.values():
+            if next(iter(eq_class)) in representative:
+                continue # we already processed this equivalence class
+            variables = [item for item in eq_class if isinstance(item, int) or
+                         item.startswith("?")]
+            objects = [item for item in eq_class if not isinstance(item, int)
+                       and not item.startswith("?")]
+
+            if len(objects) >= 2:
+                self._consistent = False
+                self._representative = None
+                return
+            if objects:
+                set_val = objects[0]
+            else:
+                set_val = variables[0]
+            for entry in eq_class:
+                representative[entry] = set_val
+        self._consistent = True
+        self._representative = representative
+
+    def is_consistent(self):
+        if self._consistent is None:
+            self._compute_representatives()
+        return self._consistent
+
+    def get_representative(self):
+        if self._consistent is None:
+            self._compute_representatives()
+        return self._representative
+
+
+class ConstraintSystem:
+    """A ConstraintSystem stores two parts, both talking about the equality or
+       inequality of strings and ints (strings representing objects or
+       variables, ints representing invariant parameters):
+        - equality_DNFs is a list containing lists of EqualityConjunctions.
+          Each EqualityConjunction represents an expression of the form
+          (x1 = y1 and ... and xn = yn). A list of EqualityConjunctions can be
+          interpreted as a disjunction of such expressions. So
+          self.equality_DNFs represents a formula of the form "⋀ ⋁ ⋀ (x = y)"
+          as a list of lists of EqualityConjunctions.
+        - ineq_disjunctions is a list of InequalityDisjunctions. Each of them
+          represents a expression of the form (u1 != v1 or ... or um !=i vm).
+        - not_constant is a list of strings.
+
+        We say that the system is solvable if we can pick from each list of
+        EqualityConjunctions in equality_DNFs one EquivalenceConjunction such
+        that the finest equivalence relation induced by all the equivalences in
+        the conjunctions is
+        - consistent, i.e. no equivalence class contains more than one object,
+        - for every disjunction in ineq_disjunctions there is at least one
+          inequality such that the two terms are in different equivalence
+          classes.
+        - every element of not_constant is not in the same equivalence class
+          as a constant.
+        We refer to the equivalence relation as the solution of the system."""
+
+    def __init__(self):
+        self.equality_DNFs = []
+        self.ineq_disjunctions = []
+        self.not_constant = []
+
+    def __str__(self):
+        equality_DNFs = []
+        for eq_DNF in self.equality_DNFs:
+            disj = " or ".join([str(eq_conjunction)
+                                for eq_conjunction in eq_DNF])
+            disj = "(%s)" % disj
+            equality_DNFs.append(disj)
+        eq_part = " and\n".join(equality_DNFs)
+
+        ineq_disjunctions = [str(clause) for clause in self.ineq_disjunctions]
+        ineq_part = " and ".join(ineq_disjunctions)
+        return f"{eq_part} ({ineq_part}) (not constant {self.not_constant}"
+
+    def add_equality_conjunction(self, eq_conjunction: EqualityConjunction):
+        self.add_equality_DNF([eq_conjunction])
+
+    def add_equality_DNF(self, equality_DNF: List[EqualityConjunction]) -> None:
+        self.equality_DNFs.append(equality_DNF)
+
+    def add_inequality_disjunction(self, ineq_disj: InequalityDisjunction):
+        self.ineq_disjunctions.append(ineq_disj)
+
+    def add_not_constant(self, not_constant: str) -> None:
+        self.not_constant.append(not_constant)
+
+    def extend(self, other: "ConstraintSystem") -> None:
+        self.equality_DNFs.extend(other.equality_DNFs)
+        self.ineq_disjunctions.extend(other.ineq_disjunctions)
+        self.not_constant.extend(other.not_constant)
+
+    def is_solvable(self):
+        # cf. top of class for explanation
+        # We pick one EqualityConjunction from each DNF at a time, starting
+        # with the shortest DNFs, and backtrack when the equivalence
+        # relation induced by the chosen conjunctions violates a constraint.
+        # This is sound because merging equivalence classes never repairs a
+        # violated constraint.
+        union_find = BacktrackingUnionFind()
+        equality_DNFs = sorted(self.equality_DNFs, key=len)
+
+        def is_violated():
+            # check whether an element of not_constant is in the same
+            # equivalence class as a constant or whether all inequalities of
+            # some inequality disjunction have both terms in the same
+            # equivalence class.
+            if any(union_find.has_object(s) for s in self.not_constant):
+                return True
+            find = union_find.find
+            for ineq_disj in self.ineq_disjunctions:
+                for a, b in ineq_disj.parts:
+                    if find(a) != find(b):
+                        break
+                else:
+                    return True
+            return False
+
+        def solve(index):
+            # Only check the constraints before we branch and when all
+            # conjunctions are chosen.
+            if index == len(equality_DNFs) or len(equality_DNFs[index]) > 1:
+                if is_violated():
+                    return False
+            if index == len(equality_DNFs):
+                return True
+            for eq_conjunction in equality_DNFs[index]:
+                checkpoint = union_find.checkpoint()
+                if (all(union_find.union(v1, v2)
+                        for v1, v2 in eq_conjunction.equalities) and
+                        solve(index + 1)):
+                    return True
+                union_find.undo(checkpoint)
+            return False
+
+        return solve(0)
+
+
+def is_object(term):
+    return not isinstance(term, int) and not term.startswith("?")
+
+
+class BacktrackingUnionFind:
+    """Equivalence classes of the strings and ints of a ConstraintSystem,
+    where each class contains at most one object for the relation to be
+    consistent. Merges can be undone in reverse order (see checkpoint and
+    undo), so we use union by size but no path compression."""
+    def __init__(self):
+        self.parent = {}
+        self.size = {}
+        # The object of the equivalence class of each root, or None.
+        self.object = {}
+        self.trail = []
+
+    def find(self, term):
+        parent = self.parent.get(term, term)
+        while parent != term:
+            term = parent
+            parent = self.parent[term]
+        return term
+
+    def has_object(self, term):
+        root = self.find(term)
+        if root in self.object:
+            return self.object[root] is not None
+        return is_object(root)
+
+    def union(self, v1, v2):
+        """Merge the equivalence classes of v1 and v2. Return False if the
+        merged class contains two objects."""
+        for term in (v1, v2):
+            if term not in self.parent:
+                self.parent[term] = term
+                self.size[term] = 1
+                self.object[term] = term if is_object(term) else None
+        root1 = self.find(v1)
+        root2 = self.find(v2)
+        if root1 == root2:
+            return True
+        if self.size[root1] < self.size[root2]:
+            root1, root2 = root2, root1
+        object1 = self.object[root1]
+        object2 = self.object[root2]
+        self.trail.append((root1, root2, object1))
+        self.parent[root2] = root1
+        self.size[root1] += self.size[root2]
+        if object1 is None:
+            self.object[root1] = object2
+        return object1 is None or object2 is None
+
+    def checkpoint(self):
+        return len(self.trail)
+
+    def undo(self, checkpoint):
+        """Undo the merges since the given checkpoint."""
+        while len(self.trail) > checkpoint:
+            root1, root2, object1 = self.trail.pop()
+            self.parent[root2] = root2
+            self.size[root1] -= self.size[root2]
+            self.object[root1] = object1
@@ -0,0 +1,166 @@
+from collections import defaultdict
+
+import invariant_finder
+import options
+import pddl
+import timers
+from typing import Dict, List, Set, Tuple
+
+
+DEBUG = False
+
+
+class ReachableFactIndex:
+    """Index of the reachable facts by predicate, position of the counted
+    argument and the remaining arguments. The index for a predicate and
+    position is built when a group first needs it."""
+    def __init__(self, reachable_facts):
+        self.reachable_facts = reachable_facts
+        self.facts_by_predicate = defaultdict(list)
+        for fact in reachable_facts:
+            self.facts_by_predicate[fact.predicate].append(fact)
+        self.indexes = {}
+
+    def get_matching_facts(self, fact, pos):
+        """Return the reachable facts that agree with fact on all arguments
+        except the one at position pos."""
+        index = self.indexes.get((fact.predicate, pos))
+        if index is None:
+            index = {}
+            for reachable_fact in self.facts_by_predicate.get(
+                    fact.predicate, []):
+                args = reachable_fact.args
+                index.setdefault(args[:pos] + args[pos + 1:], []).append(
+                    reachable_fact)
+            self.indexes[(fact.predicate, pos)] = index
+        return index.get(fact.args[:pos] + fact.args[pos + 1:], [])
+
+
+def expand_group(group, fact_index):
+    result = []
+    for fact in group:
+        try:
+            pos = list(fact.args).index("?X")
+        except ValueError:
+            if fact in fact_index.reachable_facts:
+                result.append(fact)
+        else:
+            result += fact_index.get_matching_facts(fact, pos)
+    return result
+
+def instantiate_groups(groups, reachable_facts):
+    fact_index = ReachableFactIndex(reachable_facts)
+    return [expand_group(group, fact_index) for group in groups]
+
+class GroupCoverQueue:
+    def __init__(self, groups):
+        if groups:
+            self.max_size = max([len(group) for group in groups])
+            self.groups_by_size = [[] for i in range(self.max_size + 1)]
+            self.groups_by_fact = {}
+            for group in groups:
+                group = set(group) # Copy group, as it will be modified.
+                self.groups_by_size[len(group)].append(group)
+                for fact in group:
+                    self.groups_by_fact.setdefault(fact, []).append(group)
+            self._update_top()
+        else:
+            self.max_size = 0
+    def __bool__(self):
+        return self.max_size > 1
+    __nonzero__ = __bool__
+    def pop(self):
+        result = list(self.top) # Copy; this group will shrink further.
+        if options.use_partial_encoding:
+            for fact in result:
+                for group in self.groups_by_fact[fact]:
+                    group.remove(fact)
+        self._update_top()
+        return result
+    def _update_top(self):
+        while self.max_size > 1:
+            max_list = self.groups_by_size[self.max_size]
+            while max_list:
+                candidate = max_list.pop()
+                if len(candidate) == self.max_size:
+                    self.top = candidate
+                    return
+                self.groups_by_size[len(candidate)].append(candidate)
+            self.max_size -= 1
+
+def choose_groups(groups, reachable_facts, negative_in_goal):
+    if negative_in_goal:
+        # we remove atoms that occur negatively in the goal from the groups to
+        # enforce them to be encoded with a binary variable.
+        groups = [set(group) - negative_in_goal for group in groups]
+    queue = GroupCoverQueue(groups)
+    uncovered_facts = reachable_facts.copy()
+    result = []
+    while queue:
+        group = queue.pop()
+        uncovered_facts.difference_update(group)
+        result.append(group)
+    print(len(uncovered_facts), "uncovered facts")
+    result += [[fact] for fact in uncovered_facts]
+    return result
+
+def build_translation_key(groups):
+    group_keys = []
+    for group in groups:
+        group_key = [str(fact) for fact in group]
+        if len(group) == 1:
+            group_key.append(str(group[0].negate()))
+        else:
+            group_key.append("<none of those>")
+        group_keys.append(group_key)
+    return group_keys
+
+def collect_all_mutex_groups(groups, atoms):
+    # NOTE: This should be functionally identical to choose_groups
+    # when partial_encoding is set to False. Maybe a future
+    # refactoring could take that into account.
+    all_groups = []
+    uncovered_facts = atoms.copy()
+    for group in groups:
+        uncovered_facts.difference_update(group)
+        all_groups.append(group)
+    all_groups += [[fact] for fact in uncovered_facts]
+    return all_groups
+
+def sort_groups(groups):
+    return sorted(sorted(group) for group in groups)
+
+def compute_groups(task: pddl.Task, atoms: Set[pddl.Literal],
+    reachable_action_params: Dict[pddl.Action, List[str]],
+    negative_in_goal: Set[pddl.Atom]) -> Tuple[
+        List[List[pddl.Atom]], # groups
+        # -> all selected mutex groups plus singleton groups for uncovered facts
+        List[List[pddl.Atom]], # mutex_groups
+        # -> all found mutex groups plus singleton groups for uncovered facts
+        List[List[str]], # translation_key
+        # -> string representations of group atoms (plus one for "other value")
+        ]:
+    groups = invariant_finder.get_groups(task, reachable_action_params)
+
+    with timers.timing("Instantiating groups"):
+        groups = instantiate_groups(groups, atoms)
+
+    # Sort here already to get deterministic mutex groups.
+    groups = sort_groups(groups)
+    # TODO: I think that collect_all_mutex_groups should do the same thing
+    #       as choose_groups with partial_encoding=False, so these two should
+    #       be unified.
+    with timers.timing("Collecting mutex groups"):
+        mutex_groups = collect_all_mutex_groups(groups, atoms)
+    with timers.timing("Choosing groups", block=True):
+        groups = choose_groups(groups, atoms, negative_in_goal)
+    groups = sort_groups(groups)
+    with timers.timing("Building translation key"):
+        translation_key = build_translation_key(groups)
+
+    if DEBUG:
+        for group in groups:
+            if len(group) >= 2:
+                print("{%s}" % ", ".join(map(str, group)))
+
+    return groups, mutex_groups, translation_key
@@ -0,0 +1,532 @@
+#! /usr/bin/env python3
+
+
+import array
+import itertools
+import os
+import struct
+import sys
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import build_model
+import options
+import pddl_to_prolog
+import pddl
+import relevance
+import timers
+
+RELAXED_OPERATORS_FILES = {
+    "binary": "operators_relaxation_heuristic.bin",
+    "text": "operators_relaxation_heuristic.txt",
+}
+RELAXED_OPERATORS_MAGIC = b"RXOP"
+RELAXED_OPERATORS_VERSION = 1
+
+def get_fluent_facts(task, model):
+    fluent_predicates = set()
+    for action in task.actions:
+        for effect in action.effects:
+            fluent_predicates.add(effect.literal.predicate)
+    for axiom in task.axioms:
+        fluent_predicates.add(axiom.name)
+    return {fact for fact in model
+            if fact.predicate in fluent_predicates}
+
+def get_mentioned_facts(actions, axioms, goal):
+    """Return the atoms that occur in the given propositional actions and
+    axioms and in the goal."""
+    literals = list(goal)
+    for action in actions:
+        literals += action.precondition
+        for conditions, effect in action.add_effects + action.del_effects:
+            literals += conditions
+            literals.append(effect)
+    for axiom in axioms:
+        literals += axiom.condition
+        literals.append(axiom.effect)
+    return {literal.positive() for literal in literals}
+
+def get_objects_by_type(typed_objects, types):
+    result = defaultdict(list)
+    supertypes = {}
+    for type in types:
+        supertypes[type.name] = type.supertype_names
+    for obj in typed_objects:
+        result[obj.type_name].append(obj.name)
+        for type in supertypes[obj.type_name]:
+            result[type].append(obj.name)
+    return result
+
+def instantiate_goal(goal, init_facts, fluent_facts):
+    # With the way this module is designed, we need to "instantiate"
+    # the goal to make sure we properly deal with static conditions,
+    # in particular flagging unreachable negative static goals as
+    # impossible. See issue1055.
+    #
+    # This returns None for goals that are impossible due to static
+    # facts.
+
+    # HACK! The implementation of this probably belongs into
+    # pddl.condition or a similar file, not here. The `instantiate`
+    # method of conditions with its slightly weird interface and the
+    # existence of the `Impossible` exceptions should perhaps be
+    # implementation details of `pddl`.
+    result = []
+    try:
+        goal.instantiate({}, init_facts, fluent_facts, result)
+    except pddl.conditions.Impossible:
+        return None
+    return result
+
+# The input task must have been normalized
+# The model has been computed by build_model.compute_model
+def instantiate(task: pddl.Task, model: Any) -> Tuple[
+             bool, # relaxed_reachable
+             Set[pddl.Literal], # fluent_facts (ground)
+             List[pddl.PropositionalAction], # instantiated_actions
+             Optional[List[pddl.Literal]], # instantiated_goal
+             List[pddl.PropositionalAxiom], # instantiated_axioms
+             Dict[pddl.Action, List[str]] # reachable_action_parameters
+            ]:
+    relaxed_reachable = False
+    fluent_facts = get_fluent_facts(task, model)
+    init_facts = set()
+    init_assignments = {}
+    for element in task.init:
+        if isinstance(element, pddl.Assign):
+            init_assignments[element.fluent] = element.expression
+        else:
+            init_facts.add(element)
+
+    type_to_objects = get_objects_by_type(task.objects, task.types)
+
+    relevant_achievers = None
+    if options.relevance_analysis:
+        with timers.timing("Computing relevant actions and axioms"):
+            relevant_achievers = relevance.compute_relevant_achievers(
+                task, model)
+    num_irrelevant = 0
+
+    instantiated_actions = []
+    instantiated_axioms = []
+    reachable_action_parameters = defaultdict(list)
+    for atom in model:
+        if isinstance(atom.predicate, pddl.Action):
+            action = atom.predicate
+            parameters = action.parameters
+            inst_parameters = atom.args[:len(parameters)]
+            # Note: It's important that we use the action object
+            # itself as the key in reachable_action_parameters (rather
+            # than action.name) since we can have multiple different
+            # actions with the same name after normalization, and we
+            # want to distinguish their instantiations.
+            reachable_action_parameters[action].append(inst_parameters)
+            if (relevant_achievers is not None and
+                    atom not in relevant_achievers):
+                num_irrelevant += 1
+                continue
+            variable_mapping = {par.name: arg
+                                for par, arg in zip(parameters, atom.args)}
+            inst_action = action.instantiate(
+                variable_mapping, init_facts, init_assignments,
+                fluent_facts, type_to_objects,
+                task.use_min_cost_metric)
+            if inst_action:
+                instantiated_actions.append(inst_action)
+        elif isinstance(atom.predicate, pddl.Axiom):
+            if (relevant_achievers is not None and
+                    atom not in relevant_achievers):
+                num_irrelevant += 1
+                continue
+            axiom = atom.predicate
+            variable_mapping = {par.name: arg
+                                for par, arg in zip(axiom.parameters, atom.args)}
+            inst_axiom = axiom.instantiate(variable_mapping, init_facts, fluent_facts)
+            if inst_axiom:
+                instantiated_axioms.append(inst_axiom)
+        elif atom.predicate == "@goal-reachable":
+            relaxed_reachable = True
+
+    instantiated_goal = instantiate_goal(task.goal, init_facts, fluent_facts)
+
+    if relevant_achievers is not None:
+        print("%d irrelevant actions and axioms pruned" % num_irrelevant)
+        if instantiated_goal is not None:
+            # Keep only the fluent facts that the relevant actions and
+            # axioms and the goal use.
+            fluent_facts &= get_mentioned_facts(
+                instantiated_actions, instantiated_axioms, instantiated_goal)
+
+    return (relaxed_reachable, fluent_facts,
+            instantiated_actions, instantiated_goal,
+            sorted(instantiated_axioms), reachable_action_parameters)
+
+
+class RelaxationExploration:
+    """The optimized Datalog program for the relaxation heuristics (see
+    pddl_to_prolog.translate_optimize) and its model.
+
+    Passed to explore, the program is explored together with the
+    normal exploration rules. The relaxed model is the same for both
+    programs, so a single model computation serves both instantiate
+    and get_operators_for_relaxation_heuristic; only the auxiliary
+    atoms of both programs are computed separately."""
+    def __init__(self, task):
+        with timers.timing("Building rules"):
+            self.prog = pddl_to_prolog.translate_optimize(task)
+        self.model = None
+
+    def get_model(self):
+        if self.model is None:
+            self.model = build_model.compute_model(self.prog)
+        return self.model
+
+
+def explore(task, relaxation_exploration=None):
+    if relaxation_exploration is None:
+        prog = pddl_to_prolog.translate(task)
+    else:
+        prog = pddl_to_prolog.translate(
+            task, relaxation_exploration.prog.new_name)
+        prog.add_program(relaxation_exploration.prog)
+    model = build_model.compute_model(prog)
+    if relaxation_exploration is not None:
+        relaxation_exploration.model = model
+    with timers.timing("Completing instantiation"):
+        return instantiate(task, model)
+
+
+def is_auxiliary_predicate(predicate):
+    # The "p$" predicates are introduced by rule splitting.
+    return predicate.startswith("p$")
+
+
+def parse_value_name(value_name):
+    """Return the (predicate, args) key of a positive SAS value name
+    like "Atom at(ball1, rooma)", or None for negated atoms and
+    "<none of those>" values."""
+    if not value_name.startswith("Atom "):
+        return None
+    predicate, _, args = value_name[len("Atom "):-1].partition("(")
+    return atom_key(predicate, args.split(", ") if args else ())
+
+
+def atom_key(predicate, args):
+    return (sys.intern(predicate),
+            tuple(sys.intern(arg) for arg in args))
+
+
+class FactMembership:
+    """Constant-time membership tests for the ground atoms that occur
+    while grounding the relaxed operators. Both sets are built once,
+    keyed by interned (predicate, args) tuples, so that checks neither
+    scan lists nor stringify the atom in question."""
+    def __init__(self, value_names, initial_facts):
+        fluent_facts = set()
+        for values in value_names:
+            for value_name in values:
+                key = parse_value_name(value_name)
+                if key is not None:
+                    fluent_facts.add(key)
+        self.fluent_facts = frozenset(fluent_facts)
+        self.initial_facts = frozenset(
+            atom_key(fact.predicate, fact.args) for fact in initial_facts
+            if isinstance(fact, pddl.Atom))
+
+    def is_fluent(self, atom):
+        """Test if the atom is a value of some SAS variable."""
+        return (atom.predicate, atom.args) in self.fluent_facts
+
+    def is_initial(self, atom):
+        return (atom.predicate, atom.args) in self.initial_facts
+
+
+class RelaxedModelIndex:
+    """Hash indexes over the model of the optimized Datalog program.
+
+    Condition atoms are classified once: fluent facts of the SAS task
+    and auxiliary atoms become preconditions of the relaxed operators,
+    static facts are satisfied without becoming preconditions, and
+    all other atoms can never contribute to an operator and are not
+    indexed at all. Effect atoms must be fluent facts or auxiliary
+    atoms. The indexes map the arguments at a given tuple of positions
+    to the matching (args, precondition) pairs and are built lazily
+    for each combination of predicate and bound positions that some
+    rule needs."""
+    def __init__(self, model, fact_membership):
+        self.conditions_by_predicate = defaultdict(list)
+        self.effects_by_predicate = defaultdict(list)
+        for atom in model:
+            pred = atom.predicate
+            if not isinstance(pred, str):
+                # The action and axiom atoms of the exploration program.
+                # The optimized program has no such predicates.
+                continue
+            if is_auxiliary_predicate(pred) or (
+                    "@" not in pred and fact_membership.is_fluent(atom)):
+                self.conditions_by_predicate[pred].append((atom.args, atom))
+                self.effects_by_predicate[pred].append((atom.args, atom))
+            elif "@" in pred or fact_membership.is_initial(atom):
+                self.conditions_by_predicate[pred].append((atom.args, None))
+        # Sort the atoms, so that the order of the relaxed operators does
+        # not depend on the order in which the model was computed.
+        for entries in itertools.chain(self.conditions_by_predicate.values(),
+                                       self.effects_by_predicate.values()):
+            entries.sort(key=lambda entry: entry[0])
+        self.indexes = {}
+
+    def get_index(self, predicate, positions, is_effect):
+        key = (predicate, positions, is_effect)
+        index = self.indexes.get(key)
+        if index is None:
+            if is_effect:
+                entries = self.effects_by_predicate.get(predicate, [])
+            else:
+                entries = self.conditions_by_predicate.get(predicate, [])
+            index = {}
+            for entry in entries:
+                args = entry[0]
+                index.setdefault(
+                    tuple(args[pos] for pos in positions), []).append(entry)
+            self.indexes[key] = index
+        return index
+
+    def estimate_matches(self, predicate, positions, is_effect):
+        # Average number of entries per key of the index.
+        index = self.get_index(predicate, positions, is_effect)
+        if not index:
+            return 0
+        return sum(map(len, index.values())) / len(index)
+
+
+class JoinStep:
+    """Matches one (condition or effect) atom of a rule against the
+    model, given the variables bound by the previous steps."""
+    def __init__(self, atom, cond_index, bound_variables, model_index,
+                 is_effect=False):
+        self.cond_index = cond_index
+        key_positions = []
+        self.key_terms = []
+        self.new_bindings = []
+        self.checks = []
+        new_variables = set()
+        for position, arg in enumerate(atom.args):
+            if arg[0] != "?" or arg in bound_variables:
+                key_positions.append(position)
+                self.key_terms.append(arg)
+            elif arg in new_variables:
+                # Repeated variable within the same atom.
+                self.checks.append((position, arg))
+            else:
+                new_variables.add(arg)
+                self.new_bindings.append((position, arg))
+        self.bound_variables = new_variables
+        self.index = model_index.get_index(
+            atom.predicate, tuple(key_positions), is_effect)
+
+    def get_matches(self, binding):
+        key = tuple(binding.get(term, term) for term in self.key_terms)
+        return self.index.get(key, ())
+
+
+def plan_rule(rule, model_index):
+    """Order the conditions of the rule by selectivity: in each step,
+    greedily pick the condition with the fewest expected matches per
+    lookup, given the variables bound so far. The effect is matched
+    last."""
+    bound_variables = set()
+    remaining = list(range(len(rule.conditions)))
+    steps = []
+    while remaining:
+        def expected_matches(cond_index):
+            cond = rule.conditions[cond_index]
+            positions = tuple(
+                position for position, arg in enumerate(cond.args)
+                if arg[0] != "?" or arg in bound_variables)
+            return model_index.estimate_matches(
+                cond.predicate, positions, False)
+        cond_index = min(remaining, key=expected_matches)
+        remaining.remove(cond_index)
+        step = JoinStep(rule.conditions[cond_index], cond_index,
+                        bound_variables, model_index)
+        bound_variables |= step.bound_variables
+        steps.append(step)
+    effect_step = JoinStep(rule.effect, None, bound_variables, model_index,
+                           is_effect=True)
+    return steps, effect_step
+
+
+def instantiate_rule(rule, model_index):
+    """Generate the (effect, preconditions) pairs of all groundings of
+    the rule in the model. Preconditions are listed in the order of
+    the rule conditions they instantiate."""
+    steps, effect_step = plan_rule(rule, model_index)
+    binding = {}
+    preconditions = [None] * len(rule.conditions)
+
+    # Since the join order is fixed, each variable is always bound by
+    # the same step before it is read, so bindings never need to be
+    # undone on backtracking.
+    def ground(depth):
+        if depth == len(steps):
+            # Effect variables that no condition binds match anything.
+            for _, effect in effect_step.get_matches(binding):
+                yield effect, tuple(
+                    atom for atom in preconditions if atom is not None)
+            return
+        step = steps[depth]
+        for args, precondition in step.get_matches(binding):
+            for position, var in step.new_bindings:
+                binding[var] = args[position]
+            if any(binding[var] != args[position]
+                   for position, var in step.checks):
+                continue
+            preconditions[step.cond_index] = precondition
+            yield from ground(depth + 1)
+
+    return ground(0)
+
+def instantiate_for_relaxation_heuristic(prog: pddl_to_prolog.PrologProgram, model: Any, fact_membership: FactMembership):
+    # A dict keeps the operators in a deterministic order.
+    ground_operators = {}
+    with timers.timing("Indexing model"):
+        model_index = RelaxedModelIndex(model, fact_membership)
+    with timers.timing("Completing instantiation of rules"):
+        for rule in prog.rules:
+            if rule.effect.predicate == "@goal-reachable":
+                continue
+            for effect, preconditions in instantiate_rule(rule, model_index):
+                ground_operators[effect, preconditions, rule.weight] = None
+    return ground_operators
+
+def get_operators_for_relaxation_heuristic(task: pddl.Task, sas_task, relaxation_exploration=None):
+    """Return the relaxed operators as (effect, preconditions, cost)
+    triples, where the effect and the preconditions are atoms. The
+    operators are the keys of a dict, in the order of the rules that
+    produce them."""
+    # Pass the RelaxationExploration that was given to explore to reuse
+    # its model.
+    if relaxation_exploration is None:
+        relaxation_exploration = RelaxationExploration(task)
+    prog = relaxation_exploration.prog
+    model = relaxation_exploration.get_model()
+
+    with timers.timing("Building fact membership index"):
+        fact_membership = FactMembership(
+            sas_task.variables.value_names, task.init)
+    return instantiate_for_relaxation_heuristic(prog, model, fact_membership)
+
+def write_operators_for_relaxation_heuristic(ground_operators, sas_task, output_format="binary", filename=None):
+    with timers.timing("Writing operators to output file"):
+        if filename is None:
+            filename = RELAXED_OPERATORS_FILES[output_format]
+            # Without an explicit path, the search component reads
+            # whichever default file it finds, so remove stale files of
+            # the other formats.
+            for other_filename in RELAXED_OPERATORS_FILES.values():
+                if (other_filename != filename and
+                        os.path.exists(other_filename)):
+                    os.remove(other_filename)
+        if output_format == "binary":
+            with open(filename, "wb") as output_file:
+                output_binary(ground_operators,
+                              sas_task.variables.value_names, output_file)
+        else:
+            with open(filename, "w") as output_file:
+                output(ground_operators, output_file)
+
+def remove_operators_for_relaxation_heuristic(filename=None):
+    """Remove the relaxed operators of an earlier translator run, so that
+    the search component cannot read them for a task that was translated
+    without exporting its relaxed operators."""
+    if filename is None:
+        filenames = RELAXED_OPERATORS_FILES.values()
+    else:
+        filenames = [filename]
+    for filename in filenames:
+        if os.path.exists(filename):
+            os.remove(filename)
+
+def get_proposition_name(atom):
+    # Like str(atom), but with readable names for action and axiom
+    # predicates, whose default names contain memory addresses.
+    return "Atom %s" % pddl_to_prolog.get_atom_string(atom)
+
+def output(operators, output_file):
+    for operator in operators:
+        print(get_proposition_name(operator[0]), file=output_file)
+        for precondition in operator[1]:
+            print(get_proposition_name(precondition), file=output_file)
+        print("cost", file=output_file)
+        print(operator[2], file=output_file)
+    print("end_operators", file=output_file)
+
+def output_binary(operators, value_names, output_file):
+    """Write the operators in the binary format read by
+    RelaxationHeuristic::read_binary_operators. All numbers are
+    little-endian 32-bit integers:
+    - header: magic "RXOP", version, number of auxiliary propositions,
+      number of operators, total number of preconditions
+    - one (effect var, effect value, cost, number of preconditions)
+      record per operator
+    - the (var, value) pairs of the preconditions of all operators
+    Facts of the SAS task are resolved to their (var, value) pair here;
+    auxiliary propositions are numbered consecutively and written as
+    (-1, index)."""
+    fact_ids = {}
+    for var, values in enumerate(value_names):
+        for value, value_name in enumerate(values):
+            key = parse_value_name(value_name)
+            if key is not None:
+                # With the full encoding, the search component uses the
+                # first variable that represents the fact.
+                fact_ids.setdefault(key, (var, value))
+    auxiliary_ids = {}
+
+    def get_fact_id(atom):
+        if is_auxiliary_predicate(atom.predicate):
+            return -1, auxiliary_ids.setdefault(atom, len(auxiliary_ids))
+        return fact_ids[(atom.predicate, atom.args)]
+
+    operator_table = array.array("i")
+    precondition_table = array.array("i")
+    assert operator_table.itemsize == 4
+    for effect, preconditions, cost in operators:
+        operator_table.extend(get_fact_id(effect))
+        operator_table.extend((cost, len(preconditions)))
+        for precondition in preconditions:
+            precondition_table.extend(get_fact_id(precondition))
+    if sys.byteorder == "big":
+        operator_table.byteswap()
+        precondition_table.byteswap()
+    output_file.write(struct.pack(
+        "<4s4i", RELAXED_OPERATORS_MAGIC, RELAXED_OPERATORS_VERSION,
+        len(auxiliary_ids), len(operators), len(precondition_table) // 2))
+    operator_table.tofile(output_file)
+    precondition_table.tofile(output_file)
+
+if __name__ == "__main__":
+    import pddl_parser
+    task = pddl_parser.open()
+    relaxed_reachable, atoms, actions, goals, axioms, _ = explore(task)
+    print("goal relaxed reachable: %s" % relaxed_reachable)
+    print("%d atoms:" % len(atoms))
+    for atom in atoms:
+        print(" ", atom)
+    print()
+    print("%d actions:" % len(actions))
+    for action in actions:
+        action.dump()
+        print()
+    print("%d axioms:" % len(axioms))
+    for axiom in axioms:
+        axiom.dump()
+        print()
+    print()
+    if goals is None:
+        print("impossible goal")
+    else:
+        print("%d goals:" % len(goals))
+        for literal in goals:
+            literal.dump()
@@ -0,0 +1,164 @@
+import argparse
+import contextlib
+import sys
+
+
+def parse_args(args=None):
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument(
+        "domain", help="path to domain pddl file")
+    argparser.add_argument(
+        "task", help="path to task pddl file")
+    argparser.add_argument(
+        "--relaxed", dest="generate_relaxed_task", action="store_true",
+        help="output relaxed task (no delete effects)")
+    argparser.add_argument(
+        "--full-encoding",
+        dest="use_partial_encoding", action="store_false",
+        help="By default we represent facts that occur in multiple "
+        "mutex groups only in one variable. Using this parameter adds "
+        "these facts to multiple variables. This can make the meaning "
+        "of the variables clearer, but increases the number of facts.")
+    argparser.add_argument(
+        "--invariant-generation-max-candidates", default=100000, type=int,
+        help="max number of candidates for invariant generation "
+        "(default: %(default)d). Set to 0 to disable invariant "
+        "generation and obtain only binary variables. The limit is "
+        "needed for grounded input files that would otherwise produce "
+        "too many candidates.")
+    argparser.add_argument(
+        "--sas-file", default="output.sas",
+        help="path to the SAS output file (default: %(default)s)")
+    argparser.add_argument(
+        "--domain-cache-dir", default=None,
+        help="directory for caching the parsed and normalized domain, so "
+        "that translating further tasks of the same domain skips parsing and "
+        "normalizing it. Cache files are named after a hash of the domain "
+        "file and the translator sources. The directory also caches the "
+        "invariants of the domain, which tasks can share if the same pairs "
+        "of action parameters are never equal in reachable instantiations "
+        "(default: no caching)")
+    argparser.add_argument(
+        "--skip-relaxation-operators",
+        dest="export_relaxation_operators", action="store_false",
+        help="do not export the relaxed operators used by the relaxation "
+        "heuristics (add, ff, hmax). This saves exploring the additional "
+        "Datalog rules if the search does not use these heuristics.")
+    argparser.add_argument(
+        "--relaxation-operators-file", default=None,
+        help="path to the exported relaxed operators (default: "
+        "operators_relaxation_heuristic.bin for the binary format, "
+        "operators_relaxation_heuristic.txt for the text format)")
+    argparser.add_argument(
+        "--relaxation-operators-format", default="binary",
+        choices=["binary", "text"],
+        help="format of the relaxed operators exported for the relaxation "
+        "heuristics (default: %(default)s). The text format lists the names "
+        "of the propositions and is meant for debugging.")
+    argparser.add_argument(
+        "--model-computation", default="queue",
+        choices=["queue", "semi-naive"],
+        help="How to compute the model of the Datalog programs (default: "
+        "%(default)s). 'queue' processes one atom at a time, while "
+        "'semi-naive' fires each rule once per round for all new atoms of "
+        "its conditions. 'semi-naive' is usually faster and needs less "
+        "memory on tasks with many auxiliary atoms.")
+    argparser.add_argument(
+        "--model-profile-file", default=None,
+        help="record for each rule of the Datalog programs how often it "
+        "fired, how many atoms it pushed (and how many of them were "
+        "duplicates) and how much time it took during the model "
+        "computation. Print the rules that took the most time and write the "
+        "statistics of all rules, with the actions and axioms they were "
+        "built for, to this file as JSON (default: no profiling)")
+    argparser.add_argument(
+        "--join-order", default="greedy",
+        choices=["greedy", "cardinality"],
+        help="How to split the rules of the Datalog program for the "
+        "reachability analysis into binary joins (default: %(default)s). "
+        "'greedy' first joins the conditions with the fewest variables, "
+        "while 'cardinality' first joins the conditions that generate the "
+        "fewest auxiliary atoms, estimated from the initial facts and the "
+        "number of objects per type. The relaxed operators for the "
+        "relaxation heuristics always use the 'greedy' order.")
+    argparser.add_argument(
+        "--relevance-analysis", action="store_true",
+        help="only instantiate the actions and axioms that can contribute to "
+        "reaching the goal, found by a backward pass from the goal over the "
+        "relaxed model, and drop the facts that only irrelevant actions and "
+        "axioms use (default: instantiate all reachable actions and axioms)")
+    argparser.add_argument(
+        "--invariant-generation-max-time", default=300, type=int,
+        help="max time for invariant generation (default: %(default)ds)")
+    argparser.add_argument(
+        "--jobs", default=1, type=int,
+        help="number of processes for checking invariant candidates and "
+        "translating operators (default: %(default)d). The output does not "
+        "depend on the number of processes. With more than one process, the "
+        "time limit for invariant generation refers to the wall-clock time. "
+        "Requires support for forking processes.")
+    argparser.add_argument(
+        "--add-implied-preconditions", action="store_true",
+        help="infer additional preconditions. This setting can cause a "
+        "severe performance penalty due to weaker relevance analysis "
+        "(see issue7).")
+    argparser.add_argument(
+        "--keep-unreachable-facts",
+        dest="filter_unreachable_facts", action="store_false",
+        help="keep facts that can't be reached from the initial state")
+    argparser.add_argument(
+        "--skip-variable-reordering",
+        dest="reorder_variables", action="store_false",
+        help="do not reorder variables based on the causal graph. Do not use "
+        "this option with the causal graph heuristic!")
+    argparser.add_argument(
+        "--keep-unimportant-variables",
+        dest="filter_unimportant_vars", action="store_false",
+        help="keep variables that do not influence the goal in the causal graph")
+    argparser.add_argument(
+        "--dump-task", action="store_true",
+        help="dump human-readable SAS+ representation of the task")
+    argparser.add_argument(
+        "--layer-strategy", default="min", choices=["min", "max"],
+        help="How to assign layers to derived variables. 'min' attempts to put as "
+        "many variables into the same layer as possible, while 'max' puts each variable "
+        "into its own layer unless it is part of a cycle.")
+    return argparser.parse_args(args)
+
+
+def get_default_args():
+    """Return the default options with domain and task set to None."""
+    # The domain and task are required, so we parse placeholders for them.
+    args = parse_args(["domain", "task"])
+    args.domain = args.task = None
+    return args
+
+
+def copy_args_to_module(args):
+    module_dict = sys.modules[__name__].__dict__
+    for key, value in vars(args).items():
+        module_dict[key] = value
+
+
+def setup(args=None):
+    """Set the options from the command line (or the given arguments)."""
+    copy_args_to_module(parse_args(args))
+
+
+@contextlib.contextmanager
+def use_args(args):
+    """Set the options to args (see get_default_args) and restore the
+    previous options afterwards."""
+    module_dict = sys.modules[__name__].__dict__
+    previous_args = argparse.Namespace(
+        **{key: module_dict.get(key) for key in vars(args)})
+    copy_args_to_module(args)
+    try:
+        yield
+    finally:
+        copy_args_to_module(previous_args)
+
+
+# Importing this module only sets the default options, so that the
+# translator can be used as a library. The command-line scripts call setup.
+copy_args_to_module(get_default_args())
@@ -0,0 +1,496 @@
+from typing import List, Tuple
+
+SAS_FILE_VERSION = 3
+
+DEBUG = False
+
+# The output methods build the text of each element with str.join and
+# write the operators and axioms in chunks of this many elements, which
+# is much faster than printing each number separately.
+OUTPUT_CHUNK_SIZE = 1000
+
+VarValPair = Tuple[int, int]
+
+class SASTask:
+    """Planning task in finite-domain representation.
+
+    The user is responsible for making sure that the data fits a
+    number of structural restrictions. For example, conditions should
+    generally be sorted and mention each variable at most once. See
+    the validate methods for details."""
+
+    def __init__(self,
+                 variables: "SASTask",
+                 mutexes: List["SASMutexGroup"],
+                 init: "SASInit",
+                 goal: "SASGoal",
+                 operators: List["SASOperator"],
+                 axioms: List["SASAxiom"],
+                 metric: bool) -> None:
+        self.variables = variables
+        self.mutexes = mutexes
+        self.init = init
+        self.goal = goal
+        self.operators = sorted(operators, key=lambda op: (
+            op.name, op.prevail, op.pre_post))
+        self.axioms = sorted(axioms, key=lambda axiom: (
+            axiom.condition, axiom.effect))
+        self.metric = metric
+        if DEBUG:
+            self.validate()
+
+    def validate(self):
+        """Fail an assertion if the task is invalid.
+
+        A task is valid if all its components are valid. Valid tasks
+        are almost in a kind of "canonical form", but not quite. For
+        example, operators and axioms are permitted to be listed in
+        any order, even though it would be possible to require some
+        kind of canonical sorting.
+
+        Note that we require that all derived variables are binary.
+        This is stricter than what later parts of the planner are
+        supposed to handle, but some parts of the translator rely on
+        this. We might want to consider making this a general
+        requirement throughout the planner.
+
+        Note also that there is *no* general rule on what the init (=
+        fallback) value of a derived variable is. For example, in
+        PSR-Large #1, it can be either 0 or 1. While it is "usually"
+        1, code should not rely on this.
+        """
+        self.variables.validate()
+        for mutex in self.mutexes:
+            mutex.validate(self.variables)
+        self.init.validate(self.variables)
+        self.goal.validate(self.variables)
+        for op in self.operators:
+            op.validate(self.variables)
+        for axiom in self.axioms:
+            axiom.validate(self.variables, self.init)
+        assert self.metric is False or self.metric is True, self.metric
+
+    def dump(self):
+        print("variables:")
+        self.variables.dump()
+        print("%d mutex groups:" % len(self.mutexes))
+        for mutex in self.mutexes:
+            print("group:")
+            mutex.dump()
+        print("init:")
+        self.init.dump()
+        print("goal:")
+        self.goal.dump()
+        print("%d operators:" % len(self.operators))
+        for operator in self.operators:
+            operator.dump()
+        print("%d axioms:" % len(self.axioms))
+        for axiom in self.axioms:
+            axiom.dump()
+        print("metric: %s" % self.metric)
+
+    def output(self, stream):
+        stream.write("begin_version\n%d\nend_version\n" % SAS_FILE_VERSION)
+        stream.write("begin_metric\n%d\nend_metric\n" % int(self.metric))
+        self.variables.output(stream)
+        output_elements(self.mutexes, stream)
+        self.init.output(stream)
+        self.goal.output(stream)
+        output_elements(self.operators, stream)
+        output_elements(self.axioms, stream)
+
+    def get_encoding_size(self):
+        task_size = 0
+        task_size += self.variables.get_encoding_size()
+        for mutex in self.mutexes:
+            task_size += mutex.get_encoding_size()
+        task_size += self.goal.get_encoding_size()
+        for op in self.operators:
+            task_size += op.get_encoding_size()
+        for axiom in self.axioms:
+            task_size += axiom.get_encoding_size()
+        return task_size
+
+
+def output_elements(elements, stream):
+    """Write the number of elements followed by their output text."""
+    stream.write("%d\n" % len(elements))
+    for start in range(0, len(elements), OUTPUT_CHUNK_SIZE):
+        stream.write("".join(
+            element.get_output_text()
+            for element in elements[start:start + OUTPUT_CHUNK_SIZE]))
+
+
+class SASVariables:
+    def __init__(self, ranges: List[int], axiom_layers: List[int],
+                 value_names: List[List[str]]) -> None:
+        self.ranges = ranges
+        self.axiom_layers = axiom_layers
+        self.value_names = value_names
+
+    def validate(self):
+        """Validate variables.
+
+        All variables must have range at least 2, and derived
+        variables must have range exactly 2. See comment on derived
+        variables in the docstring of SASTask.validate.
+        """
+        assert len(self.ranges) == len(self.axiom_layers) == len(
+            self.value_names)
+        for (var_range, layer, var_value_names) in zip(
+                self.ranges, self.axiom_layers, self.value_names):
+            assert var_range == len(var_value_names)
+            assert var_range >= 2
+            assert layer == -1 or layer >= 0
+            if layer != -1:
+                assert var_range == 2
+
+    def validate_fact(self, fact):
+        """Assert that fact is a valid (var, value) pair."""
+        var, value = fact
+        assert 0 <= var < len(self.ranges)
+        assert 0 <= value < self.ranges[var]
+
+    def validate_condition(self, condition):
+        """Assert that the condition (list of facts) is sorted, mentions each
+        variable at most once, and only consists of valid facts."""
+        last_var = -1
+        for (var, value) in condition:
+            self.validate_fact((var, value))
+            assert var > last_var
+            last_var = var
+
+    def dump(self):
+        for var, (rang, axiom_layer) in enumerate(
+                zip(self.ranges, self.axiom_layers)):
+            if axiom_layer != -1:
+                axiom_str = " [axiom layer %d]" % axiom_layer
+            else:
+                axiom_str = ""
+            print("v%d in {%s}%s" % (var, list(range(rang)), axiom_str))
+
+    def output(self, stream):
+        lines = [str(len(self.ranges))]
+        for var, (rang, axiom_layer, values) in enumerate(zip(
+                self.ranges, self.axiom_layers, self.value_names)):
+            lines.append("begin_variable")
+            lines.append("var%d" % var)
+            lines.append(str(axiom_layer))
+            lines.append(str(rang))
+            assert rang == len(values), (rang, values)
+            lines.extend(map(str, values))
+            lines.append("end_variable")
+        lines.append("")
+        stream.write("\n".join(lines))
+
+    def get_encoding_size(self):
+        # A variable with range k has encoding size k + 1 to also give the
+        # variable itself some weight.
+        return len(self.ranges) + sum(self.ranges)
+
+
+class SASMutexGroup:
+    def __init__(self, facts: List[VarValPair]):
+        self.facts = sorted(facts)
+
+    def validate(self, variables):
+        """Assert that the facts in the mutex group are sorted and unique
+        and that they are all valid."""
+        for fact in self.facts:
+            variables.validate_fact(fact)
+        assert self.facts == sorted(set(self.facts))
+
+    def dump(self):
+        for var, val in self.facts:
+            print("v%d: %d" % (var, val))
+
+    def output(self, stream):
+        stream.write(self.get_output_text())
+
+    def get_output_text(self):
+        lines = ["begin_mutex_group", str(len(self.facts))]
+        lines.extend("%s %s" % (var, val) for var, val in self.facts)
+        lines.append("end_mutex_group\n")
+        return "\n".join(lines)
+
+    def get_encoding_size(self):
+        return len(self.facts)
+
+
+class SASInit:
+    def __init__(self, values):
+        self.values = values
+
+    def validate(self, variables):
+        """Validate initial state.
+
+        Assert that the initial state contains the correct number of
+        values and that all values are in range.
+        """
+
+        assert len(self.values) == len(variables.ranges)
+        for fact in enumerate(self.values):
+            variables.validate_fact(fact)
+
+    def dump(self):
+        for var, val in enumerate(self.values):
+            print("v%d: %d" % (var, val))
+
+    def output(self, stream):
+        lines = ["begin_state"]
+        lines.extend(map(str, self.values))
+        lines.append("end_state\n")
+        stream.write("\n".join(lines))
+
+
+class SASGoal:
+    def __init__(self, pairs: List[Tuple[int, int]]) -> None:
+        self.pairs = sorted(pairs)
+
+    def validate(self, variables):
+        """Assert that the goal is nonempty and a valid condition."""
+        assert self.pairs
+        variables.validate_condition(self.pairs)
+
+    def dump(self):
+        for var, val in self.pairs:
+            print("v%d: %d" % (var, val))
+
+    def output(self, stream):
+        lines = ["begin_goal", str(len(self.pairs))]
+        lines.extend("%s %s" % (var, val) for var, val in self.pairs)
+        lines.append("end_goal\n")
+        stream.write("\n".join(lines))
+
+    def get_encoding_size(self):
+        return len(self.pairs)
+
+
+class SASOperator:
+    def __init__(self, name: str, prevail: List[VarValPair], pre_post:
+            List[Tuple[int, int, int, List[VarValPair]]], cost: int) -> None:
+        self.name = name
+        self.prevail = sorted(prevail)
+        self.pre_post = self._canonical_pre_post(pre_post)
+        self.cost = cost
+
+    def _canonical_pre_post(self, pre_post):
+        # Return a sorted and uniquified version of pre_post. We would
+        # like to just use sorted(set(pre_post)), but this fails because
+        # the effect conditions are a list and hence not hashable.
+        def tuplify(entry):
+            var, pre, post, cond = entry
+            return var, pre, post, tuple(cond)
+        def listify(entry):
+            var, pre, post, cond = entry
+            return var, pre, post, list(cond)
+        pre_post = map(tuplify, pre_post)
+        pre_post = sorted(set(pre_post))
+        pre_post = list(map(listify, pre_post))
+        return pre_post
+
+    def validate(self, variables):
+        """Validate the operator.
+
+        Assert that
+        1. Prevail conditions are valid conditions (i.e., sorted and
+           all referring to different variables)
+        2. The pre_post list is sorted by (var, pre, post, cond), and the
+           same (var, pre, post, cond) 4-tuple is not repeated.
+        3. Effect conditions are valid conditions and do not contain variables
+           from the pre- or prevail conditions.
+        4. Variables occurring in pre_post rules do not have a prevail
+           condition.
+        5. Preconditions in pre_post are -1 or valid facts.
+        6. Effects are valid facts.
+        7. Effect variables are non-derived.
+        8. If a variable has multiple pre_post rules, then pre is
+           identical in all these rules.
+        9. There is at least one effect.
+        10. Costs are non-negative integers.
+
+        Odd things that are *not* illegal:
+        - The effect in a pre_post rule may be identical to the
+          precondition or to an effect condition of that effect.
+
+        TODO/open question:
+        - It is currently not very clear what the semantics of operators
+          should be when effects "conflict", i.e., when multiple effects
+          trigger and want to set a given variable to two different
+          values. In the case where both are unconditional effects, we
+          should make sure that our representation doesn't actually
+          contain two such effects, but when at least one of them is
+          conditional, things are not so easy.
+
+          To make our life simpler when generating SAS+ tasks from
+          PDDL tasks, it probably makes most sense to generalize the
+          PDDL rule in this case: there is a value order where certain
+          values "win" over others in this situation. It probably
+          makes sense to say the "highest" values should win in this
+          case, because that's consistent with the PDDL rules if we
+          say false = 0 and true = 1, and also with our sort order of
+          effects it means we get the right result if we just apply
+          effects in sequence.
+
+          But whatever we end up deciding, we need to be clear about it,
+          document it and make sure that all of our code knows the rules
+          and follows them.
+        """
+
+        variables.validate_condition(self.prevail)
+        assert self.pre_post == self._canonical_pre_post(self.pre_post)
+        prevail_vars = {var for (var, value) in self.prevail}
+        pre_values = {}
+        for var, pre, post, cond in self.pre_post:
+            variables.validate_condition(cond)
+            assert var not in prevail_vars
+            if pre != -1:
+                variables.validate_fact((var, pre))
+            variables.validate_fact((var, post))
+            assert variables.axiom_layers[var] == -1
+            if var in pre_values:
+                assert pre_values[var] == pre
+            else:
+                pre_values[var] = pre
+        for var, pre, post, cond in self.pre_post:
+            for cvar, cval in cond:
+                assert cvar not in pre_values or pre_values[cvar] == -1
+                assert cvar not in prevail_vars
+        assert self.pre_post
+        assert self.cost >= 0 and self.cost == int(self.cost)
+
+    def dump(self):
+        print(self.name)
+        print("Prevail:")
+        for var, val in self.prevail:
+            print("  v%d: %d" % (var, val))
+        print("Pre/Post:")
+        for var, pre, post, cond in self.pre_post:
+            if cond:
+                cond_str = " [%s]" % ", ".join(
+                    ["%d: %d" % tuple(c) for c in cond])
+            else:
+                cond_str = ""
+            print("  v%d: %d -> %d%s" % (var, pre, post, cond_str))
+
+    def output(self, stream):
+        stream.write(self.get_output_text())
+
+    def get_output_text(self):
+        lines = ["begin_operator", self.name[1:-1], str(len(self.prevail))]
+        lines.extend("%s %s" % (var, val) for var, val in self.prevail)
+        lines.append(str(len(self.pre_post)))
+        for var, pre, post, cond in self.pre_post:
+            cond_text = "".join(
+                "%s %s " % (cvar, cval) for cvar, cval in cond)
+            lines.append("%d %s%s %s %s" % (len(cond), cond_text, var, pre, post))
+        lines.append(str(self.cost))
+        lines.append("end_operator\n")
+        return "\n".join(lines)
+
+    def get_encoding_size(self):
+        size = 1 + len(self.prevail)
+        for var, pre, post, cond in self.pre_post:
+            size += 1 + len(cond)
+            if pre != -1:
+                size += 1
+        return size
+
+    def get_applicability_conditions(self):
+        """Return the combined applicability conditions
+        (prevail conditions and preconditions) of the operator.
+
+        Returns a sorted list of (var, value) pairs. This is
+        guaranteed to contain at most one fact per variable and
+        must hence be non-contradictory."""
+        conditions = {}
+        for var, val in self.prevail:
+            assert var not in conditions
+            conditions[var] = val
+        for var, pre, post, cond in self.pre_post:
+            if pre != -1:
+                assert var not in conditions or conditions[var] == pre
+                conditions[var] = pre
+        return sorted(conditions.items())
+
+
+class SASAxiom:
+    def __init__(self, condition: List[VarValPair], effect: VarValPair) -> None:
+        self.condition = sorted(condition)
+        self.effect = effect
+        assert self.effect[1] in (0, 1)
+
+        for _, val in condition:
+            assert val >= 0, condition
+
+    def validate(self, variables, init):
+
+        """Validate the axiom.
+
+        Assert that the axiom condition is a valid condition, that the
+        effect is a valid fact, that the effect variable is a derived
+        variable, and that the layering condition is satisfied.
+
+        See the docstring of SASTask.validate for information on the
+        restriction on derived variables. The layering condition boils
+        down to:
+
+        1. Axioms always set the "non-init" value of the derived
+           variable.
+        2. Derived variables in the condition must have a lower of
+           equal layer to derived variables appearing in the effect.
+        3. Conditions with equal layer are only allowed when the
+           condition uses the "non-init" value of that variable.
+
+        TODO/bug: rule #1 is currently disabled because we currently
+        have axioms that violate it. This is likely due to the
+        "extended domain transition graphs" described in the Fast
+        Downward paper, Section 5.1. However, we want to eventually
+        changes this. See issue454. For cases where rule #1 is violated,
+        "non-init" should be "init" in rule #3.
+        """
+
+        variables.validate_condition(self.condition)
+        variables.validate_fact(self.effect)
+        eff_var, eff_value = self.effect
+        eff_layer = variables.axiom_layers[eff_var]
+        assert eff_layer >= 0
+        eff_init_value = init.values[eff_var]
+        ## The following rule is currently commented out because of
+        ## the TODO/bug mentioned in the docstring.
+        # assert eff_value != eff_init_value
+        for cond_var, cond_value in self.condition:
+            cond_layer = variables.axiom_layers[cond_var]
+            if cond_layer != -1:
+                assert cond_layer <= eff_layer
+                if cond_layer == eff_layer:
+                    cond_init_value = init.values[cond_var]
+                    ## Once the TODO/bug above is addressed, the
+                    ## following four lines can be simplified because
+                    ## we are guaranteed to land in the "if" branch.
+                    if eff_value != eff_init_value:
+                        assert cond_value != cond_init_value
+                    else:
+                        assert cond_value == cond_init_value
+
+    def dump(self):
+        print("Condition:")
+        for var, val in self.condition:
+            print("  v%d: %d" % (var, val))
+        print("Effect:")
+        var, val = self.effect
+        print("  v%d: %d" % (var, val))
+
+    def output(self, stream):
+        stream.write(self.get_output_text())
+
+    def get_output_text(self):
+        lines = ["begin_rule", str(len(self.condition))]
+        lines.extend("%s %s" % (var, val) for var, val in self.condition)
+        var, val = self.effect
+        lines.append("%s %s %s" % (var, 1 - val, val))
+        lines.append("end_rule\n")
+        return "\n".join(lines)
+
+    def get_encoding_size(self):
+        return 1 + len(self.condition)
@@ -0,0 +1,26 @@
+import fact_groups
+import pddl
+
+
+def test_instantiate_groups():
+    reachable_facts = {
+        pddl.Atom("at", ["ball1", "rooma"]),
+        pddl.Atom("at", ["ball2", "rooma"]),
+        pddl.Atom("at", ["ball1", "roomb"]),
+        pddl.Atom("carry", ["ball1", "left"]),
+        pddl.Atom("free", ["left"]),
+    }
+    groups = [
+        [pddl.Atom("at", ["ball1", "?X"]),
+         pddl.Atom("carry", ["ball1", "?X"])],
+        [pddl.Atom("carry", ["?X", "left"]), pddl.Atom("free", ["left"])],
+        [pddl.Atom("at", ["ball3", "?X"]), pddl.Atom("free", ["right"])],
+    ]
+    result = fact_groups.instantiate_groups(groups, reachable_facts)
+    assert [sorted(group) for group in result] == [
+        [pddl.Atom("at", ["ball1", "rooma"]),
+         pddl.Atom("at", ["ball1", "roomb"]),
+         pddl.Atom("carry", ["ball1", "left"])],
+        [pddl.Atom("carry", ["ball1", "left"]), pddl.Atom("free", ["left"])],
+        [],
+    ]
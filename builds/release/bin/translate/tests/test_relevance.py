@@ -0,0 +1,54 @@
+import contextlib
+from io import StringIO
+
+import build_model
+import instantiate
+import normalize
+import options
+import pddl_parser
+import pddl_to_prolog
+
+DOMAIN = """
+(define (domain robots)
+  (:requirements :strips :typing)
+  (:types robot place)
+  (:predicates (at ?r - robot ?p - place)
+               (connected ?from ?to - place))
+  (:action move
+    :parameters (?r - robot ?from ?to - place)
+    :precondition (and (at ?r ?from) (connected ?from ?to))
+    :effect (and (at ?r ?to) (not (at ?r ?from)))))
+"""
+
+PROBLEM = """
+(define (problem two-robots)
+  (:domain robots)
+  (:objects r1 r2 - robot a b - place)
+  (:init (at r1 a) (at r2 a) (connected a b) (connected b a))
+  (:goal (at r1 b)))
+"""
+
+def instantiate_task(monkeypatch, relevance_analysis):
+    monkeypatch.setattr(options, "relevance_analysis", relevance_analysis)
+    task = pddl_parser.parse(DOMAIN, PROBLEM)
+    with contextlib.redirect_stdout(StringIO()):
+        normalize.normalize(task)
+        model = build_model.compute_model(pddl_to_prolog.translate(task))
+        return instantiate.instantiate(task, model)
+
+def test_relevance_analysis(monkeypatch):
+    _, fluent_facts, actions, _, _, reachable_action_parameters = \
+        instantiate_task(monkeypatch, False)
+    assert len(actions) == 4
+    assert len(fluent_facts) == 4
+
+    _, fluent_facts, actions, _, _, relevant_reachable_action_parameters = \
+        instantiate_task(monkeypatch, True)
+    # The second robot cannot contribute to the goal.
+    assert sorted(action.name for action in actions) == [
+        "(move r1 a b)", "(move r1 b a)"]
+    assert sorted(map(str, fluent_facts)) == [
+        "Atom at(r1, a)", "Atom at(r1, b)"]
+    # The invariant synthesis still sees all reachable actions.
+    assert (sum(map(len, relevant_reachable_action_parameters.values())) ==
+            sum(map(len, reachable_action_parameters.values())))
@@ -0,0 +1,185 @@
+#! /usr/bin/env python3
+
+"""Serve translator runs from a long-running process.
+
+Starting translate.py for each task pays for starting the interpreter and
+importing the translator, which dominates the translation time of small
+tasks. The worker imports the translator once and then listens on a UNIX
+socket. It forks a new process for each request, which parses the options of
+the request and runs the translator like translate.py does. The requests
+therefore do not share any translator state.
+
+Protocol: the client connects to the socket and sends a JSON object with the
+keys "args" (command-line arguments for translate.py), "cwd" (working
+directory), "time_limit" (seconds) and "memory_limit" (bytes), where the
+limits may be null. With the request, the client passes the file descriptors
+for the standard output and the standard error of the translator as
+SCM_RIGHTS ancillary data. Then it shuts down its sending side of the
+connection. The worker replies with a JSON object whose "returncode" is the
+exit code of the translator, or the negated signal number if a signal
+killed it (like subprocess.Popen.returncode).
+"""
+
+import argparse
+import array
+import json
+import os
+import signal
+import socket
+import sys
+import traceback
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+TRANSLATE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "translate.py")
+TRANSLATE_CRITICAL_ERROR = 30
+NUM_FDS = 2
+
+
+def parse_args():
+    argparser = argparse.ArgumentParser(
+        description="Run translator requests sent to a UNIX socket.")
+    argparser.add_argument(
+        "socket", help="path of the UNIX socket to listen on")
+    argparser.add_argument(
+        "--domain-cache-dir", default=None,
+        help="pass --domain-cache-dir with this directory to all requests "
+        "that do not specify it themselves")
+    return argparser.parse_args()
+
+
+def receive_request(connection):
+    fds = array.array("i")
+    data, ancdata, _, _ = connection.recvmsg(
+        4096, socket.CMSG_SPACE(NUM_FDS * fds.itemsize))
+    for level, type, fd_data in ancdata:
+        if level == socket.SOL_SOCKET and type == socket.SCM_RIGHTS:
+            fds.frombytes(
+                fd_data[:len(fd_data) - (len(fd_data) % fds.itemsize)])
+    chunks = [data]
+    while data:
+        data = connection.recv(4096)
+        chunks.append(data)
+    return json.loads(b"".join(chunks)), list(fds)
+
+
+def set_limits(time_limit, memory_limit):
+    # Like the limits the driver sets for the translator (see driver/limits.py).
+    if time_limit is not None:
+        try:
+            resource.setrlimit(
+                resource.RLIMIT_CPU, (time_limit, time_limit + 1))
+        except ValueError:
+            resource.setrlimit(resource.RLIMIT_CPU, (time_limit, time_limit))
+    if memory_limit is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+
+def get_exitcode(exit):
+    # Mirror how the interpreter handles an uncaught SystemExit.
+    if exit.code is None:
+        return 0
+    elif isinstance(exit.code, int):
+        return exit.code
+    else:
+        print(exit.code, file=sys.stderr)
+        return 1
+
+
+def run_translator(request, domain_cache_dir):
+    exitcode = 0
+    try:
+        os.chdir(request["cwd"])
+        set_limits(request["time_limit"], request["memory_limit"])
+        args = request["args"]
+        if domain_cache_dir is not None and not any(
+                arg.startswith("--domain-cache-dir") for arg in args):
+            args = args + ["--domain-cache-dir", domain_cache_dir]
+        sys.argv = [TRANSLATE] + args
+        import translate
+        translate.run()
+    except SystemExit as exit:
+        exitcode = get_exitcode(exit)
+    except BaseException:
+        traceback.print_exc()
+        exitcode = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(exitcode)
+
+
+def handle_connection(connection, domain_cache_dir):
+    try:
+        request, fds = receive_request(connection)
+        if len(fds) != NUM_FDS:
+            raise ValueError(
+                "expected %d file descriptors, got %d" % (NUM_FDS, len(fds)))
+        pid = os.fork()
+        if pid == 0:
+            connection.close()
+            os.dup2(fds[0], 1)
+            os.dup2(fds[1], 2)
+            for fd in fds:
+                os.close(fd)
+            run_translator(request, domain_cache_dir)
+        for fd in fds:
+            os.close(fd)
+        _, status = os.waitpid(pid, 0)
+        if os.WIFSIGNALED(status):
+            returncode = -os.WTERMSIG(status)
+        else:
+            returncode = os.WEXITSTATUS(status)
+        connection.sendall(json.dumps({"returncode": returncode}).encode())
+    except BaseException:
+        # The client notices that the connection closes without a reply.
+        traceback.print_exc()
+        os._exit(TRANSLATE_CRITICAL_ERROR)
+    os._exit(0)
+
+
+def handle_sigterm(signum, stackframe):
+    sys.exit(0)
+
+
+def serve(socket_path, domain_cache_dir):
+    # Let the kernel reap the processes handling the connections.
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, handle_sigterm)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(socket_path)
+        try:
+            server.listen()
+            print("Translator worker listening on %s" % socket_path,
+                  flush=True)
+            while True:
+                connection, _ = server.accept()
+                if os.fork() == 0:
+                    server.close()
+                    # The handler needs to wait for the translator process.
+                    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                    handle_connection(connection, domain_cache_dir)
+                connection.close()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(socket_path)
+
+
+def main():
+    args = parse_args()
+    if resource is None or not hasattr(socket, "AF_UNIX"):
+        sys.exit("Error: The translator worker is not supported on this "
+                 "platform.")
+    # Import the translator once for all requests.
+    import translate
+    serve(args.socket, args.domain_cache_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,467 @@
+file(REMOVE_RECURSE
+  "../bin/downward"
+  "../bin/downward.pdb"
+  "CMakeFiles/downward.dir/abstract_task.cc.o"
+  "CMakeFiles/downward.dir/abstract_task.cc.o.d"
+  "CMakeFiles/downward.dir/algorithms/equivalence_relation.cc.o"
+  "CMakeFiles/downward.dir/algorithms/equivalence_relation.cc.o.d"
+  "CMakeFiles/downward.dir/algorithms/int_packer.cc.o"
+  "CMakeFiles/downward.dir/algorithms/int_packer.cc.o.d"
+  "CMakeFiles/downward.dir/algorithms/max_cliques.cc.o"
+  "CMakeFiles/downward.dir/algorithms/max_cliques.cc.o.d"
+  "CMakeFiles/downward.dir/algorithms/sccs.cc.o"
+  "CMakeFiles/downward.dir/algorithms/sccs.cc.o.d"
+  "CMakeFiles/downward.dir/axioms.cc.o"
+  "CMakeFiles/downward.dir/axioms.cc.o.d"
+  "CMakeFiles/downward.dir/cartesian_abstractions/abstract_search.cc.o"
+  "CMakeFiles/downward.dir/cartesian_abstractions/abstract_search.cc.o.d"
+  "CMakeFiles/downward.dir/cartesian_abstractions/abstract_state.cc.o"
+  "CMakeFiles/downward.dir/cartesian_abstractions/abstract_state.cc.o.d"
+  "CMakeFiles/downward.dir/cartesian_abstractions/abstraction.cc.o"
+  "CMakeFiles/downward.dir/cartesian_abstractions/abstraction.cc.o.d"
+  "CMakeFiles/downward.dir/cartesian_abstractions/additive_cartesian_heuristic.cc.o"
+  "CMakeFiles/downward.dir/cartesian_abstractions/additive_cartesian_heuristic.cc.o.d"
+  "CMakeFiles/downward.dir/cartesian_abstractions/cartesian_heuristic_function.cc.o"
+  "CMakeFiles/downward.dir/cartesian_abstractions/cartesian_heuristic_function.cc.o.d"
+  "CMakeFiles/downward.dir/cartesian_abstractions/cartesian_set.cc.o"
+  "CMakeFiles/downward.dir/cartesian_abstractions/cartesian_set.cc.o.d"
+  "CMakeFiles/downward.dir/cartesian_abstractions/cegar.cc.o"
+  "CMakeFiles/downward.dir/cartesian_abstractions/cegar.cc.o.d"
+  "CMakeFiles/downward.dir/cartesian_abstractions/cost_saturation.cc.o"
+  "CMakeFiles/downward.dir/cartesian_abstractions/cost_saturation.cc.o.d"
+  "CMakeFiles/downward.dir/cartesian_abstractions/refinement_hierarchy.cc.o"
+  "CMakeFiles/downward.dir/cartesian_abstractions/refinement_hierarchy.cc.o.d"
+  "CMakeFiles/downward.dir/cartesian_abstractions/split_selector.cc.o"
+  "CMakeFiles/downward.dir/cartesian_abstractions/split_selector.cc.o.d"
+  "CMakeFiles/downward.dir/cartesian_abstractions/subtask_generators.cc.o"
+  "CMakeFiles/downward.dir/cartesian_abstractions/subtask_generators.cc.o.d"
+  "CMakeFiles/downward.dir/cartesian_abstractions/transition_system.cc.o"
+  "CMakeFiles/downward.dir/cartesian_abstractions/transition_system.cc.o.d"
+  "CMakeFiles/downward.dir/cartesian_abstractions/utils.cc.o"
+  "CMakeFiles/downward.dir/cartesian_abstractions/utils.cc.o.d"
+  "CMakeFiles/downward.dir/cartesian_abstractions/utils_landmarks.cc.o"
+  "CMakeFiles/downward.dir/cartesian_abstractions/utils_landmarks.cc.o.d"
+  "CMakeFiles/downward.dir/command_line.cc.o"
+  "CMakeFiles/downward.dir/command_line.cc.o.d"
+  "CMakeFiles/downward.dir/evaluation_context.cc.o"
+  "CMakeFiles/downward.dir/evaluation_context.cc.o.d"
+  "CMakeFiles/downward.dir/evaluation_result.cc.o"
+  "CMakeFiles/downward.dir/evaluation_result.cc.o.d"
+  "CMakeFiles/downward.dir/evaluator.cc.o"
+  "CMakeFiles/downward.dir/evaluator.cc.o.d"
+  "CMakeFiles/downward.dir/evaluator_cache.cc.o"
+  "CMakeFiles/downward.dir/evaluator_cache.cc.o.d"
+  "CMakeFiles/downward.dir/evaluators/combining_evaluator.cc.o"
+  "CMakeFiles/downward.dir/evaluators/combining_evaluator.cc.o.d"
+  "CMakeFiles/downward.dir/evaluators/const_evaluator.cc.o"
+  "CMakeFiles/downward.dir/evaluators/const_evaluator.cc.o.d"
+  "CMakeFiles/downward.dir/evaluators/g_evaluator.cc.o"
+  "CMakeFiles/downward.dir/evaluators/g_evaluator.cc.o.d"
+  "CMakeFiles/downward.dir/evaluators/max_evaluator.cc.o"
+  "CMakeFiles/downward.dir/evaluators/max_evaluator.cc.o.d"
+  "CMakeFiles/downward.dir/evaluators/pref_evaluator.cc.o"
+  "CMakeFiles/downward.dir/evaluators/pref_evaluator.cc.o.d"
+  "CMakeFiles/downward.dir/evaluators/subcategory.cc.o"
+  "CMakeFiles/downward.dir/evaluators/subcategory.cc.o.d"
+  "CMakeFiles/downward.dir/evaluators/sum_evaluator.cc.o"
+  "CMakeFiles/downward.dir/evaluators/sum_evaluator.cc.o.d"
+  "CMakeFiles/downward.dir/evaluators/weighted_evaluator.cc.o"
+  "CMakeFiles/downward.dir/evaluators/weighted_evaluator.cc.o.d"
+  "CMakeFiles/downward.dir/heuristic.cc.o"
+  "CMakeFiles/downward.dir/heuristic.cc.o.d"
+  "CMakeFiles/downward.dir/heuristics/additive_heuristic.cc.o"
+  "CMakeFiles/downward.dir/heuristics/additive_heuristic.cc.o.d"
+  "CMakeFiles/downward.dir/heuristics/blind_search_heuristic.cc.o"
+  "CMakeFiles/downward.dir/heuristics/blind_search_heuristic.cc.o.d"
+  "CMakeFiles/downward.dir/heuristics/cea_heuristic.cc.o"
+  "CMakeFiles/downward.dir/heuristics/cea_heuristic.cc.o.d"
+  "CMakeFiles/downward.dir/heuristics/cg_cache.cc.o"
+  "CMakeFiles/downward.dir/heuristics/cg_cache.cc.o.d"
+  "CMakeFiles/downward.dir/heuristics/cg_heuristic.cc.o"
+  "CMakeFiles/downward.dir/heuristics/cg_heuristic.cc.o.d"
+  "CMakeFiles/downward.dir/heuristics/domain_transition_graph.cc.o"
+  "CMakeFiles/downward.dir/heuristics/domain_transition_graph.cc.o.d"
+  "CMakeFiles/downward.dir/heuristics/ff_heuristic.cc.o"
+  "CMakeFiles/downward.dir/heuristics/ff_heuristic.cc.o.d"
+  "CMakeFiles/downward.dir/heuristics/goal_count_heuristic.cc.o"
+  "CMakeFiles/downward.dir/heuristics/goal_count_heuristic.cc.o.d"
+  "CMakeFiles/downward.dir/heuristics/hm_heuristic.cc.o"
+  "CMakeFiles/downward.dir/heuristics/hm_heuristic.cc.o.d"
+  "CMakeFiles/downward.dir/heuristics/lm_cut_heuristic.cc.o"
+  "CMakeFiles/downward.dir/heuristics/lm_cut_heuristic.cc.o.d"
+  "CMakeFiles/downward.dir/heuristics/lm_cut_landmarks.cc.o"
+  "CMakeFiles/downward.dir/heuristics/lm_cut_landmarks.cc.o.d"
+  "CMakeFiles/downward.dir/heuristics/max_heuristic.cc.o"
+  "CMakeFiles/downward.dir/heuristics/max_heuristic.cc.o.d"
+  "CMakeFiles/downward.dir/heuristics/relaxation_heuristic.cc.o"
+  "CMakeFiles/downward.dir/heuristics/relaxation_heuristic.cc.o.d"
+  "CMakeFiles/downward.dir/landmarks/exploration.cc.o"
+  "CMakeFiles/downward.dir/landmarks/exploration.cc.o.d"
+  "CMakeFiles/downward.dir/landmarks/landmark.cc.o"
+  "CMakeFiles/downward.dir/landmarks/landmark.cc.o.d"
+  "CMakeFiles/downward.dir/landmarks/landmark_cost_partitioning_algorithms.cc.o"
+  "CMakeFiles/downward.dir/landmarks/landmark_cost_partitioning_algorithms.cc.o.d"
+  "CMakeFiles/downward.dir/landmarks/landmark_cost_partitioning_heuristic.cc.o"
+  "CMakeFiles/downward.dir/landmarks/landmark_cost_partitioning_heuristic.cc.o.d"
+  "CMakeFiles/downward.dir/landmarks/landmark_factory.cc.o"
+  "CMakeFiles/downward.dir/landmarks/landmark_factory.cc.o.d"
+  "CMakeFiles/downward.dir/landmarks/landmark_factory_h_m.cc.o"
+  "CMakeFiles/downward.dir/landmarks/landmark_factory_h_m.cc.o.d"
+  "CMakeFiles/downward.dir/landmarks/landmark_factory_merged.cc.o"
+  "CMakeFiles/downward.dir/landmarks/landmark_factory_merged.cc.o.d"
+  "CMakeFiles/downward.dir/landmarks/landmark_factory_reasonable_orders_hps.cc.o"
+  "CMakeFiles/downward.dir/landmarks/landmark_factory_reasonable_orders_hps.cc.o.d"
+  "CMakeFiles/downward.dir/landmarks/landmark_factory_relaxation.cc.o"
+  "CMakeFiles/downward.dir/landmarks/landmark_factory_relaxation.cc.o.d"
+  "CMakeFiles/downward.dir/landmarks/landmark_factory_rpg_exhaust.cc.o"
+  "CMakeFiles/downward.dir/landmarks/landmark_factory_rpg_exhaust.cc.o.d"
+  "CMakeFiles/downward.dir/landmarks/landmark_factory_rpg_sasp.cc.o"
+  "CMakeFiles/downward.dir/landmarks/landmark_factory_rpg_sasp.cc.o.d"
+  "CMakeFiles/downward.dir/landmarks/landmark_factory_zhu_givan.cc.o"
+  "CMakeFiles/downward.dir/landmarks/landmark_factory_zhu_givan.cc.o.d"
+  "CMakeFiles/downward.dir/landmarks/landmark_graph.cc.o"
+  "CMakeFiles/downward.dir/landmarks/landmark_graph.cc.o.d"
+  "CMakeFiles/downward.dir/landmarks/landmark_heuristic.cc.o"
+  "CMakeFiles/downward.dir/landmarks/landmark_heuristic.cc.o.d"
+  "CMakeFiles/downward.dir/landmarks/landmark_status_manager.cc.o"
+  "CMakeFiles/downward.dir/landmarks/landmark_status_manager.cc.o.d"
+  "CMakeFiles/downward.dir/landmarks/landmark_sum_heuristic.cc.o"
+  "CMakeFiles/downward.dir/landmarks/landmark_sum_heuristic.cc.o.d"
+  "CMakeFiles/downward.dir/landmarks/util.cc.o"
+  "CMakeFiles/downward.dir/landmarks/util.cc.o.d"
+  "CMakeFiles/downward.dir/lp/lp_solver.cc.o"
+  "CMakeFiles/downward.dir/lp/lp_solver.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/distances.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/distances.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/factored_transition_system.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/factored_transition_system.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/fts_factory.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/fts_factory.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/label_reduction.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/label_reduction.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/labels.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/labels.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_and_shrink_algorithm.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_and_shrink_algorithm.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_and_shrink_heuristic.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_and_shrink_heuristic.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_and_shrink_representation.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_and_shrink_representation.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_scoring_function.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_scoring_function.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_scoring_function_dfp.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_scoring_function_dfp.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_scoring_function_goal_relevance.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_scoring_function_goal_relevance.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_scoring_function_miasm.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_scoring_function_miasm.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_scoring_function_miasm_utils.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_scoring_function_miasm_utils.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_scoring_function_single_random.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_scoring_function_single_random.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_scoring_function_total_order.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_scoring_function_total_order.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_selector.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_selector.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_selector_score_based_filtering.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_selector_score_based_filtering.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_strategy.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_strategy.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_strategy_factory.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_strategy_factory.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_strategy_factory_precomputed.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_strategy_factory_precomputed.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_strategy_factory_sccs.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_strategy_factory_sccs.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_strategy_factory_stateless.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_strategy_factory_stateless.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_strategy_precomputed.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_strategy_precomputed.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_strategy_sccs.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_strategy_sccs.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_strategy_stateless.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_strategy_stateless.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_tree.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_tree.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_tree_factory.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_tree_factory.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_tree_factory_linear.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/merge_tree_factory_linear.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/shrink_bisimulation.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/shrink_bisimulation.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/shrink_bucket_based.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/shrink_bucket_based.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/shrink_fh.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/shrink_fh.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/shrink_random.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/shrink_random.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/shrink_strategy.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/shrink_strategy.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/transition_system.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/transition_system.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/types.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/types.cc.o.d"
+  "CMakeFiles/downward.dir/merge_and_shrink/utils.cc.o"
+  "CMakeFiles/downward.dir/merge_and_shrink/utils.cc.o.d"
+  "CMakeFiles/downward.dir/open_list_factory.cc.o"
+  "CMakeFiles/downward.dir/open_list_factory.cc.o.d"
+  "CMakeFiles/downward.dir/open_lists/alternation_open_list.cc.o"
+  "CMakeFiles/downward.dir/open_lists/alternation_open_list.cc.o.d"
+  "CMakeFiles/downward.dir/open_lists/best_first_open_list.cc.o"
+  "CMakeFiles/downward.dir/open_lists/best_first_open_list.cc.o.d"
+  "CMakeFiles/downward.dir/open_lists/epsilon_greedy_open_list.cc.o"
+  "CMakeFiles/downward.dir/open_lists/epsilon_greedy_open_list.cc.o.d"
+  "CMakeFiles/downward.dir/open_lists/pareto_open_list.cc.o"
+  "CMakeFiles/downward.dir/open_lists/pareto_open_list.cc.o.d"
+  "CMakeFiles/downward.dir/open_lists/tiebreaking_open_list.cc.o"
+  "CMakeFiles/downward.dir/open_lists/tiebreaking_open_list.cc.o.d"
+  "CMakeFiles/downward.dir/open_lists/type_based_open_list.cc.o"
+  "CMakeFiles/downward.dir/open_lists/type_based_open_list.cc.o.d"
+  "CMakeFiles/downward.dir/operator_cost.cc.o"
+  "CMakeFiles/downward.dir/operator_cost.cc.o.d"
+  "CMakeFiles/downward.dir/operator_counting/constraint_generator.cc.o"
+  "CMakeFiles/downward.dir/operator_counting/constraint_generator.cc.o.d"
+  "CMakeFiles/downward.dir/operator_counting/delete_relaxation_constraints.cc.o"
+  "CMakeFiles/downward.dir/operator_counting/delete_relaxation_constraints.cc.o.d"
+  "CMakeFiles/downward.dir/operator_counting/lm_cut_constraints.cc.o"
+  "CMakeFiles/downward.dir/operator_counting/lm_cut_constraints.cc.o.d"
+  "CMakeFiles/downward.dir/operator_counting/operator_counting_heuristic.cc.o"
+  "CMakeFiles/downward.dir/operator_counting/operator_counting_heuristic.cc.o.d"
+  "CMakeFiles/downward.dir/operator_counting/pho_constraints.cc.o"
+  "CMakeFiles/downward.dir/operator_counting/pho_constraints.cc.o.d"
+  "CMakeFiles/downward.dir/operator_counting/state_equation_constraints.cc.o"
+  "CMakeFiles/downward.dir/operator_counting/state_equation_constraints.cc.o.d"
+  "CMakeFiles/downward.dir/operator_id.cc.o"
+  "CMakeFiles/downward.dir/operator_id.cc.o.d"
+  "CMakeFiles/downward.dir/parser/abstract_syntax_tree.cc.o"
+  "CMakeFiles/downward.dir/parser/abstract_syntax_tree.cc.o.d"
+  "CMakeFiles/downward.dir/parser/decorated_abstract_syntax_tree.cc.o"
+  "CMakeFiles/downward.dir/parser/decorated_abstract_syntax_tree.cc.o.d"
+  "CMakeFiles/downward.dir/parser/lexical_analyzer.cc.o"
+  "CMakeFiles/downward.dir/parser/lexical_analyzer.cc.o.d"
+  "CMakeFiles/downward.dir/parser/syntax_analyzer.cc.o"
+  "CMakeFiles/downward.dir/parser/syntax_analyzer.cc.o.d"
+  "CMakeFiles/downward.dir/parser/token_stream.cc.o"
+  "CMakeFiles/downward.dir/parser/token_stream.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/abstract_operator.cc.o"
+  "CMakeFiles/downward.dir/pdbs/abstract_operator.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/canonical_pdbs.cc.o"
+  "CMakeFiles/downward.dir/pdbs/canonical_pdbs.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/canonical_pdbs_heuristic.cc.o"
+  "CMakeFiles/downward.dir/pdbs/canonical_pdbs_heuristic.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/cegar.cc.o"
+  "CMakeFiles/downward.dir/pdbs/cegar.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/dominance_pruning.cc.o"
+  "CMakeFiles/downward.dir/pdbs/dominance_pruning.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/incremental_canonical_pdbs.cc.o"
+  "CMakeFiles/downward.dir/pdbs/incremental_canonical_pdbs.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/match_tree.cc.o"
+  "CMakeFiles/downward.dir/pdbs/match_tree.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/pattern_cliques.cc.o"
+  "CMakeFiles/downward.dir/pdbs/pattern_cliques.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/pattern_collection_generator_combo.cc.o"
+  "CMakeFiles/downward.dir/pdbs/pattern_collection_generator_combo.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/pattern_collection_generator_disjoint_cegar.cc.o"
+  "CMakeFiles/downward.dir/pdbs/pattern_collection_generator_disjoint_cegar.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/pattern_collection_generator_genetic.cc.o"
+  "CMakeFiles/downward.dir/pdbs/pattern_collection_generator_genetic.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/pattern_collection_generator_hillclimbing.cc.o"
+  "CMakeFiles/downward.dir/pdbs/pattern_collection_generator_hillclimbing.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/pattern_collection_generator_manual.cc.o"
+  "CMakeFiles/downward.dir/pdbs/pattern_collection_generator_manual.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/pattern_collection_generator_multiple.cc.o"
+  "CMakeFiles/downward.dir/pdbs/pattern_collection_generator_multiple.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/pattern_collection_generator_multiple_cegar.cc.o"
+  "CMakeFiles/downward.dir/pdbs/pattern_collection_generator_multiple_cegar.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/pattern_collection_generator_multiple_random.cc.o"
+  "CMakeFiles/downward.dir/pdbs/pattern_collection_generator_multiple_random.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/pattern_collection_generator_systematic.cc.o"
+  "CMakeFiles/downward.dir/pdbs/pattern_collection_generator_systematic.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/pattern_collection_information.cc.o"
+  "CMakeFiles/downward.dir/pdbs/pattern_collection_information.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/pattern_database.cc.o"
+  "CMakeFiles/downward.dir/pdbs/pattern_database.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/pattern_database_factory.cc.o"
+  "CMakeFiles/downward.dir/pdbs/pattern_database_factory.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/pattern_generator.cc.o"
+  "CMakeFiles/downward.dir/pdbs/pattern_generator.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/pattern_generator_cegar.cc.o"
+  "CMakeFiles/downward.dir/pdbs/pattern_generator_cegar.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/pattern_generator_greedy.cc.o"
+  "CMakeFiles/downward.dir/pdbs/pattern_generator_greedy.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/pattern_generator_manual.cc.o"
+  "CMakeFiles/downward.dir/pdbs/pattern_generator_manual.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/pattern_generator_random.cc.o"
+  "CMakeFiles/downward.dir/pdbs/pattern_generator_random.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/pattern_information.cc.o"
+  "CMakeFiles/downward.dir/pdbs/pattern_information.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/pdb_heuristic.cc.o"
+  "CMakeFiles/downward.dir/pdbs/pdb_heuristic.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/random_pattern.cc.o"
+  "CMakeFiles/downward.dir/pdbs/random_pattern.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/subcategory.cc.o"
+  "CMakeFiles/downward.dir/pdbs/subcategory.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/utils.cc.o"
+  "CMakeFiles/downward.dir/pdbs/utils.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/validation.cc.o"
+  "CMakeFiles/downward.dir/pdbs/validation.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/zero_one_pdbs.cc.o"
+  "CMakeFiles/downward.dir/pdbs/zero_one_pdbs.cc.o.d"
+  "CMakeFiles/downward.dir/pdbs/zero_one_pdbs_heuristic.cc.o"
+  "CMakeFiles/downward.dir/pdbs/zero_one_pdbs_heuristic.cc.o.d"
+  "CMakeFiles/downward.dir/per_state_bitset.cc.o"
+  "CMakeFiles/downward.dir/per_state_bitset.cc.o.d"
+  "CMakeFiles/downward.dir/plan_manager.cc.o"
+  "CMakeFiles/downward.dir/plan_manager.cc.o.d"
+  "CMakeFiles/downward.dir/planner.cc.o"
+  "CMakeFiles/downward.dir/planner.cc.o.d"
+  "CMakeFiles/downward.dir/plugins/bounds.cc.o"
+  "CMakeFiles/downward.dir/plugins/bounds.cc.o.d"
+  "CMakeFiles/downward.dir/plugins/doc_printer.cc.o"
+  "CMakeFiles/downward.dir/plugins/doc_printer.cc.o.d"
+  "CMakeFiles/downward.dir/plugins/options.cc.o"
+  "CMakeFiles/downward.dir/plugins/options.cc.o.d"
+  "CMakeFiles/downward.dir/plugins/plugin.cc.o"
+  "CMakeFiles/downward.dir/plugins/plugin.cc.o.d"
+  "CMakeFiles/downward.dir/plugins/plugin_info.cc.o"
+  "CMakeFiles/downward.dir/plugins/plugin_info.cc.o.d"
+  "CMakeFiles/downward.dir/plugins/raw_registry.cc.o"
+  "CMakeFiles/downward.dir/plugins/raw_registry.cc.o.d"
+  "CMakeFiles/downward.dir/plugins/registry.cc.o"
+  "CMakeFiles/downward.dir/plugins/registry.cc.o.d"
+  "CMakeFiles/downward.dir/plugins/types.cc.o"
+  "CMakeFiles/downward.dir/plugins/types.cc.o.d"
+  "CMakeFiles/downward.dir/potentials/diverse_potential_heuristics.cc.o"
+  "CMakeFiles/downward.dir/potentials/diverse_potential_heuristics.cc.o.d"
+  "CMakeFiles/downward.dir/potentials/potential_function.cc.o"
+  "CMakeFiles/downward.dir/potentials/potential_function.cc.o.d"
+  "CMakeFiles/downward.dir/potentials/potential_heuristic.cc.o"
+  "CMakeFiles/downward.dir/potentials/potential_heuristic.cc.o.d"
+  "CMakeFiles/downward.dir/potentials/potential_max_heuristic.cc.o"
+  "CMakeFiles/downward.dir/potentials/potential_max_heuristic.cc.o.d"
+  "CMakeFiles/downward.dir/potentials/potential_optimizer.cc.o"
+  "CMakeFiles/downward.dir/potentials/potential_optimizer.cc.o.d"
+  "CMakeFiles/downward.dir/potentials/sample_based_potential_heuristics.cc.o"
+  "CMakeFiles/downward.dir/potentials/sample_based_potential_heuristics.cc.o.d"
+  "CMakeFiles/downward.dir/potentials/single_potential_heuristics.cc.o"
+  "CMakeFiles/downward.dir/potentials/single_potential_heuristics.cc.o.d"
+  "CMakeFiles/downward.dir/potentials/subcategory.cc.o"
+  "CMakeFiles/downward.dir/potentials/subcategory.cc.o.d"
+  "CMakeFiles/downward.dir/potentials/util.cc.o"
+  "CMakeFiles/downward.dir/potentials/util.cc.o.d"
+  "CMakeFiles/downward.dir/pruning/limited_pruning.cc.o"
+  "CMakeFiles/downward.dir/pruning/limited_pruning.cc.o.d"
+  "CMakeFiles/downward.dir/pruning/null_pruning_method.cc.o"
+  "CMakeFiles/downward.dir/pruning/null_pruning_method.cc.o.d"
+  "CMakeFiles/downward.dir/pruning/stubborn_sets.cc.o"
+  "CMakeFiles/downward.dir/pruning/stubborn_sets.cc.o.d"
+  "CMakeFiles/downward.dir/pruning/stubborn_sets_action_centric.cc.o"
+  "CMakeFiles/downward.dir/pruning/stubborn_sets_action_centric.cc.o.d"
+  "CMakeFiles/downward.dir/pruning/stubborn_sets_atom_centric.cc.o"
+  "CMakeFiles/downward.dir/pruning/stubborn_sets_atom_centric.cc.o.d"
+  "CMakeFiles/downward.dir/pruning/stubborn_sets_ec.cc.o"
+  "CMakeFiles/downward.dir/pruning/stubborn_sets_ec.cc.o.d"
+  "CMakeFiles/downward.dir/pruning/stubborn_sets_simple.cc.o"
+  "CMakeFiles/downward.dir/pruning/stubborn_sets_simple.cc.o.d"
+  "CMakeFiles/downward.dir/pruning_method.cc.o"
+  "CMakeFiles/downward.dir/pruning_method.cc.o.d"
+  "CMakeFiles/downward.dir/search_algorithm.cc.o"
+  "CMakeFiles/downward.dir/search_algorithm.cc.o.d"
+  "CMakeFiles/downward.dir/search_algorithms/eager_search.cc.o"
+  "CMakeFiles/downward.dir/search_algorithms/eager_search.cc.o.d"
+  "CMakeFiles/downward.dir/search_algorithms/enforced_hill_climbing_search.cc.o"
+  "CMakeFiles/downward.dir/search_algorithms/enforced_hill_climbing_search.cc.o.d"
+  "CMakeFiles/downward.dir/search_algorithms/iterated_search.cc.o"
+  "CMakeFiles/downward.dir/search_algorithms/iterated_search.cc.o.d"
+  "CMakeFiles/downward.dir/search_algorithms/lazy_search.cc.o"
+  "CMakeFiles/downward.dir/search_algorithms/lazy_search.cc.o.d"
+  "CMakeFiles/downward.dir/search_algorithms/plugin_astar.cc.o"
+  "CMakeFiles/downward.dir/search_algorithms/plugin_astar.cc.o.d"
+  "CMakeFiles/downward.dir/search_algorithms/plugin_eager.cc.o"
+  "CMakeFiles/downward.dir/search_algorithms/plugin_eager.cc.o.d"
+  "CMakeFiles/downward.dir/search_algorithms/plugin_eager_greedy.cc.o"
+  "CMakeFiles/downward.dir/search_algorithms/plugin_eager_greedy.cc.o.d"
+  "CMakeFiles/downward.dir/search_algorithms/plugin_eager_wastar.cc.o"
+  "CMakeFiles/downward.dir/search_algorithms/plugin_eager_wastar.cc.o.d"
+  "CMakeFiles/downward.dir/search_algorithms/plugin_lazy.cc.o"
+  "CMakeFiles/downward.dir/search_algorithms/plugin_lazy.cc.o.d"
+  "CMakeFiles/downward.dir/search_algorithms/plugin_lazy_greedy.cc.o"
+  "CMakeFiles/downward.dir/search_algorithms/plugin_lazy_greedy.cc.o.d"
+  "CMakeFiles/downward.dir/search_algorithms/plugin_lazy_wastar.cc.o"
+  "CMakeFiles/downward.dir/search_algorithms/plugin_lazy_wastar.cc.o.d"
+  "CMakeFiles/downward.dir/search_algorithms/search_common.cc.o"
+  "CMakeFiles/downward.dir/search_algorithms/search_common.cc.o.d"
+  "CMakeFiles/downward.dir/search_node_info.cc.o"
+  "CMakeFiles/downward.dir/search_node_info.cc.o.d"
+  "CMakeFiles/downward.dir/search_progress.cc.o"
+  "CMakeFiles/downward.dir/search_progress.cc.o.d"
+  "CMakeFiles/downward.dir/search_space.cc.o"
+  "CMakeFiles/downward.dir/search_space.cc.o.d"
+  "CMakeFiles/downward.dir/search_statistics.cc.o"
+  "CMakeFiles/downward.dir/search_statistics.cc.o.d"
+  "CMakeFiles/downward.dir/state_id.cc.o"
+  "CMakeFiles/downward.dir/state_id.cc.o.d"
+  "CMakeFiles/downward.dir/state_registry.cc.o"
+  "CMakeFiles/downward.dir/state_registry.cc.o.d"
+  "CMakeFiles/downward.dir/task_proxy.cc.o"
+  "CMakeFiles/downward.dir/task_proxy.cc.o.d"
+  "CMakeFiles/downward.dir/task_utils/causal_graph.cc.o"
+  "CMakeFiles/downward.dir/task_utils/causal_graph.cc.o.d"
+  "CMakeFiles/downward.dir/task_utils/sampling.cc.o"
+  "CMakeFiles/downward.dir/task_utils/sampling.cc.o.d"
+  "CMakeFiles/downward.dir/task_utils/successor_generator.cc.o"
+  "CMakeFiles/downward.dir/task_utils/successor_generator.cc.o.d"
+  "CMakeFiles/downward.dir/task_utils/successor_generator_factory.cc.o"
+  "CMakeFiles/downward.dir/task_utils/successor_generator_factory.cc.o.d"
+  "CMakeFiles/downward.dir/task_utils/successor_generator_internals.cc.o"
+  "CMakeFiles/downward.dir/task_utils/successor_generator_internals.cc.o.d"
+  "CMakeFiles/downward.dir/task_utils/task_properties.cc.o"
+  "CMakeFiles/downward.dir/task_utils/task_properties.cc.o.d"
+  "CMakeFiles/downward.dir/task_utils/variable_order_finder.cc.o"
+  "CMakeFiles/downward.dir/task_utils/variable_order_finder.cc.o.d"
+  "CMakeFiles/downward.dir/tasks/cost_adapted_task.cc.o"
+  "CMakeFiles/downward.dir/tasks/cost_adapted_task.cc.o.d"
+  "CMakeFiles/downward.dir/tasks/delegating_task.cc.o"
+  "CMakeFiles/downward.dir/tasks/delegating_task.cc.o.d"
+  "CMakeFiles/downward.dir/tasks/domain_abstracted_task.cc.o"
+  "CMakeFiles/downward.dir/tasks/domain_abstracted_task.cc.o.d"
+  "CMakeFiles/downward.dir/tasks/domain_abstracted_task_factory.cc.o"
+  "CMakeFiles/downward.dir/tasks/domain_abstracted_task_factory.cc.o.d"
+  "CMakeFiles/downward.dir/tasks/modified_goals_task.cc.o"
+  "CMakeFiles/downward.dir/tasks/modified_goals_task.cc.o.d"
+  "CMakeFiles/downward.dir/tasks/modified_operator_costs_task.cc.o"
+  "CMakeFiles/downward.dir/tasks/modified_operator_costs_task.cc.o.d"
+  "CMakeFiles/downward.dir/tasks/root_task.cc.o"
+  "CMakeFiles/downward.dir/tasks/root_task.cc.o.d"
+  "CMakeFiles/downward.dir/utils/countdown_timer.cc.o"
+  "CMakeFiles/downward.dir/utils/countdown_timer.cc.o.d"
+  "CMakeFiles/downward.dir/utils/exceptions.cc.o"
+  "CMakeFiles/downward.dir/utils/exceptions.cc.o.d"
+  "CMakeFiles/downward.dir/utils/logging.cc.o"
+  "CMakeFiles/downward.dir/utils/logging.cc.o.d"
+  "CMakeFiles/downward.dir/utils/markup.cc.o"
+  "CMakeFiles/downward.dir/utils/markup.cc.o.d"
+  "CMakeFiles/downward.dir/utils/math.cc.o"
+  "CMakeFiles/downward.dir/utils/math.cc.o.d"
+  "CMakeFiles/downward.dir/utils/memory.cc.o"
+  "CMakeFiles/downward.dir/utils/memory.cc.o.d"
+  "CMakeFiles/downward.dir/utils/rng.cc.o"
+  "CMakeFiles/downward.dir/utils/rng.cc.o.d"
+  "CMakeFiles/downward.dir/utils/rng_options.cc.o"
+  "CMakeFiles/downward.dir/utils/rng_options.cc.o.d"
+  "CMakeFiles/downward.dir/utils/strings.cc.o"
+  "CMakeFiles/downward.dir/utils/strings.cc.o.d"
+  "CMakeFiles/downward.dir/utils/system.cc.o"
+  "CMakeFiles/downward.dir/utils/system.cc.o.d"
+  "CMakeFiles/downward.dir/utils/system_unix.cc.o"
+  "CMakeFiles/downward.dir/utils/system_unix.cc.o.d"
+  "CMakeFiles/downward.dir/utils/system_windows.cc.o"
+  "CMakeFiles/downward.dir/utils/system_windows.cc.o.d"
+  "CMakeFiles/downward.dir/utils/timer.cc.o"
+  "CMakeFiles/downward.dir/utils/timer.cc.o.d"
+)
+
+# Per-language clean rules from dependency scanning.
+foreach(lang CXX)
+  include(CMakeFiles/downward.dir/cmake_clean_${lang}.cmake OPTIONAL)
+endforeach()
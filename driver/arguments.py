@@ -1,6 +1,7 @@
 import argparse
 import os.path
 import re
+import socket
 import sys
 
 from . import aliases
@@ -94,6 +95,7 @@ Examples:
 
 COMPONENTS_PLUS_OVERALL = ["translate", "search", "validate", "overall"]
 DEFAULT_SAS_FILE = "output.sas"
+DEFAULT_RELAXATION_OPERATORS_FILE = "output.relaxed"
 
 
 """
@@ -274,8 +276,34 @@ def _set_translator_output_options(parser, args):
             parser, "Cannot pass the \"--sas-file\" option to translate.py from the "
                     "fast-downward.py script. Pass it directly to fast-downward.py instead.")
 
-    args.search_input = args.sas_file
-    args.translate_options += ["--sas-file", args.search_input]
+    # With --sas-in-memory, run_components.run_translate sets the
+    # translator output and search input when it creates the in-memory file.
+    if not args.sas_in_memory:
+        args.search_input = args.sas_file
+        args.translate_options += ["--sas-file", args.search_input]
+
+    if any("--relaxation-operators-file" in opt for opt in args.translate_options):
+        print_usage_and_exit_with_driver_input_error(
+            parser, "Cannot pass the \"--relaxation-operators-file\" option to "
+                    "translate.py from the fast-downward.py script. Pass it "
+                    "directly to fast-downward.py instead.")
+    args.translate_options += [
+        "--relaxation-operators-file", args.relaxation_operators_file]
+
+
+def _skips_relaxation_operators(args):
+    return "--skip-relaxation-operators" in args.translate_options
+
+
+def _is_exported_for_search_input(args):
+    """Check if the default relaxed operators file belongs to the search
+    input. The translator writes it after the SAS file and removes it if it
+    skips the export, so an older file stems from a different task."""
+    return (args.search_input is not None and
+            os.path.exists(args.relaxation_operators_file) and
+            os.path.exists(args.search_input) and
+            os.path.getmtime(args.relaxation_operators_file) >=
+            os.path.getmtime(args.search_input))
 
 
 def _get_time_limit_in_seconds(limit, parser):
@@ -408,6 +436,30 @@ def parse_args():
         "--keep-sas-file", action="store_true",
         help="keep translator output file (implied by --sas-file, default: "
             "delete file if translator and search component are active)")
+    driver_other.add_argument(
+        "--sas-in-memory", action="store_true",
+        help="pass the translator output to the search component in an "
+            "anonymous in-memory file instead of writing it to disk (needs "
+            "the translator and search component, only supported on Linux, "
+            "not compatible with --sas-file and --keep-sas-file)")
+    driver_other.add_argument(
+        "--translate-worker", metavar="SOCKET",
+        help="let the translator worker listening on the UNIX socket SOCKET "
+            "run the translator instead of starting a new translator process. "
+            "This saves starting the interpreter and importing the translator "
+            "for each task. Start the worker with "
+            "'translate/translate_worker.py SOCKET' in the directory of a "
+            "build. The worker uses its own translator regardless of --build "
+            "(only supported on Unix, not compatible with --sas-in-memory)")
+
+    driver_other.add_argument(
+        "--relaxation-operators-file", metavar="FILE",
+        help="intermediate file for storing the relaxed operators that the "
+            "translator exports for the relaxation heuristics (implies "
+            "keeping this file, default: {}). Without the translator "
+            "component, the search reads the default file if it exists and "
+            "is not older than the SAS file".format(
+                DEFAULT_RELAXATION_OPERATORS_FILE))
 
     driver_other.add_argument(
         "--portfolio", metavar="FILE",
@@ -436,11 +488,33 @@ def parse_args():
 
     args = parser.parse_args()
 
+    if args.sas_in_memory and (args.sas_file or args.keep_sas_file):
+        print_usage_and_exit_with_driver_input_error(
+            parser, "--sas-in-memory cannot be combined with --sas-file "
+                    "or --keep-sas-file.")
+
+    if args.sas_in_memory and args.translate_worker:
+        print_usage_and_exit_with_driver_input_error(
+            parser, "--sas-in-memory cannot be combined with "
+                    "--translate-worker.")
+    if args.translate_worker and not hasattr(socket, "AF_UNIX"):
+        returncodes.exit_with_driver_unsupported_error(
+            "--translate-worker is not supported on this system.")
+
     if args.sas_file:
         args.keep_sas_file = True
     else:
         args.sas_file = DEFAULT_SAS_FILE
 
+    # If the path is given explicitly, the search component reads the
+    # relaxed operators from it even if the translator does not run.
+    args.search_relaxation_operators_file = args.relaxation_operators_file
+    if args.relaxation_operators_file:
+        args.keep_relaxation_operators_file = True
+    else:
+        args.relaxation_operators_file = DEFAULT_RELAXATION_OPERATORS_FILE
+        args.keep_relaxation_operators_file = False
+
     if args.build and args.debug:
         print_usage_and_exit_with_driver_input_error(
             parser, "The option --debug is an alias for --build=debug "
@@ -481,7 +555,29 @@ def parse_args():
 
     if not args.version and not args.show_aliases and not args.cleanup:
         _set_components_and_inputs(parser, args)
+        if args.sas_in_memory:
+            if ("translate" not in args.components or
+                    "search" not in args.components):
+                print_usage_and_exit_with_driver_input_error(
+                    parser, "--sas-in-memory needs the translator and "
+                            "search component.")
+            if not hasattr(os, "memfd_create"):
+                returncodes.exit_with_driver_unsupported_error(
+                    "--sas-in-memory is not supported on this system.")
         if "translate" not in args.components or "search" not in args.components:
             args.keep_sas_file = True
+        if args.keep_sas_file:
+            args.keep_relaxation_operators_file = True
+        if "translate" in args.components:
+            if _skips_relaxation_operators(args):
+                # The translator exports nothing and removes the file.
+                args.search_relaxation_operators_file = None
+            else:
+                args.search_relaxation_operators_file = args.relaxation_operators_file
+        elif (not args.search_relaxation_operators_file and
+                _is_exported_for_search_input(args)):
+            # Use the relaxed operators of a previous translator run
+            # without the search component.
+            args.search_relaxation_operators_file = args.relaxation_operators_file
 
     return args
@@ -3,9 +3,12 @@
 from . import limits
 from . import returncodes
 
+import array
+import json
 import logging
 import os
 import shlex
+import socket
 import subprocess
 import sys
 
@@ -59,12 +62,59 @@ def check_call(nick, cmd, stdin=None, time_limit=None, memory_limit=None):
         return subprocess.check_call(cmd, **kwargs)
 
 
-def get_error_output_and_returncode(nick, cmd, time_limit=None, memory_limit=None):
+def get_error_output_and_returncode(nick, cmd, time_limit=None, memory_limit=None,
+                                    pass_fds=()):
     print_call_settings(nick, cmd, None, time_limit, memory_limit)
 
     preexec_fn = _get_preexec_function(time_limit, memory_limit)
 
     sys.stdout.flush()
-    p = subprocess.Popen(cmd, preexec_fn=preexec_fn, stderr=subprocess.PIPE)
+    p = subprocess.Popen(cmd, preexec_fn=preexec_fn, stderr=subprocess.PIPE,
+                         pass_fds=pass_fds)
     (stdout, stderr) = p.communicate()
     return stderr, p.returncode
+
+
+def get_error_output_and_returncode_from_worker(nick, worker_socket, args,
+                                                time_limit=None,
+                                                memory_limit=None):
+    """Run the translator in the translator worker listening on
+    worker_socket instead of starting a new process. See
+    src/translate/translate_worker.py for the protocol."""
+    logging.info("{} worker: {}".format(nick, worker_socket))
+    limits.print_limits(nick, time_limit, memory_limit)
+    logging.info("{} arguments: {}".format(
+        nick, " ".join(shlex.quote(x) for x in args)))
+
+    request = json.dumps({
+        "args": args,
+        "cwd": os.getcwd(),
+        "time_limit": time_limit,
+        "memory_limit": memory_limit}).encode()
+    sys.stdout.flush()
+    stderr_read_fd, stderr_write_fd = os.pipe()
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.connect(worker_socket)
+            fds = array.array("i", [sys.stdout.fileno(), stderr_write_fd])
+            connection.sendmsg(
+                [request], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, fds)])
+            connection.shutdown(socket.SHUT_WR)
+            # Only the translator may keep the pipe open, so that reading
+            # from it ends when the translator terminates.
+            os.close(stderr_write_fd)
+            with os.fdopen(stderr_read_fd, "rb") as stderr_file:
+                stderr = stderr_file.read()
+            reply = b""
+            data = connection.recv(4096)
+            while data:
+                reply += data
+                data = connection.recv(4096)
+    except OSError as err:
+        returncodes.exit_with_driver_critical_error(
+            "Could not use the translator worker at {}: {}".format(
+                worker_socket, err))
+    if not reply:
+        returncodes.exit_with_driver_critical_error(
+            "The translator worker at {} did not reply.".format(worker_socket))
+    return stderr, json.loads(reply)["returncode"]
@@ -10,6 +10,7 @@ def _try_remove(f):
 
 def cleanup_temporary_files(args):
     _try_remove(args.sas_file)
+    _try_remove(args.relaxation_operators_file)
     _try_remove(args.plan_file)
 
     for i in count(1):
@@ -39,9 +39,16 @@ def main():
             (exitcode, continue_execution) = run_components.run_translate(args)
         elif component == "search":
             (exitcode, continue_execution) = run_components.run_search(args)
-            if not args.keep_sas_file:
+            if args.sas_in_memory:
+                os.close(args.sas_fd)
+            elif not args.keep_sas_file:
                 print("Remove intermediate file {}".format(args.sas_file))
                 os.remove(args.sas_file)
+            if (not args.keep_relaxation_operators_file and
+                    os.path.exists(args.relaxation_operators_file)):
+                print("Remove intermediate file {}".format(
+                    args.relaxation_operators_file))
+                os.remove(args.relaxation_operators_file)
         elif component == "validate":
             (exitcode, continue_execution) = run_components.run_validate(args)
         else:
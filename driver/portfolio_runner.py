@@ -62,8 +62,9 @@ def adapt_args(args, search_cost_type, heuristic_cost_type, plan_manager):
             break
 
 
-def run_search(executable, args, sas_file, plan_manager, time, memory):
-    complete_args = [executable] + args + [
+def run_search(executable, args, sas_file, plan_manager, time, memory,
+               extra_options):
+    complete_args = [executable] + extra_options + args + [
         "--internal-plan-file", plan_manager.get_plan_prefix()]
     print("args: %s" % complete_args)
 
@@ -90,7 +91,8 @@ def compute_run_time(timeout, configs, pos):
 
 
 def run_sat_config(configs, pos, search_cost_type, heuristic_cost_type,
-                   executable, sas_file, plan_manager, timeout, memory):
+                   executable, sas_file, plan_manager, timeout, memory,
+                   extra_options):
     run_time = compute_run_time(timeout, configs, pos)
     if run_time <= 0:
         return None
@@ -101,13 +103,14 @@ def run_sat_config(configs, pos, search_cost_type, heuristic_cost_type,
         args.extend([
             "--internal-previous-portfolio-plans",
             str(plan_manager.get_plan_counter())])
-    result = run_search(executable, args, sas_file, plan_manager, run_time, memory)
+    result = run_search(executable, args, sas_file, plan_manager, run_time,
+                        memory, extra_options)
     plan_manager.process_new_plans()
     return result
 
 
 def run_sat(configs, executable, sas_file, plan_manager, final_config,
-            final_config_builder, timeout, memory):
+            final_config_builder, timeout, memory, extra_options):
     # If the configuration contains S_COST_TYPE or H_COST_TRANSFORM and the task
     # has non-unit costs, we start by treating all costs as one. When we find
     # a solution, we rerun the successful config with real costs.
@@ -119,7 +122,8 @@ def run_sat(configs, executable, sas_file, plan_manager, final_config,
         for pos, (relative_time, args) in enumerate(configs):
             exitcode = run_sat_config(
                 configs, pos, search_cost_type, heuristic_cost_type,
-                executable, sas_file, plan_manager, timeout, memory)
+                executable, sas_file, plan_manager, timeout, memory,
+                extra_options)
             if exitcode is None:
                 continue
 
@@ -139,7 +143,8 @@ def run_sat(configs, executable, sas_file, plan_manager, final_config,
                     heuristic_cost_type = "plusone"
                     exitcode = run_sat_config(
                         configs, pos, search_cost_type, heuristic_cost_type,
-                        executable, sas_file, plan_manager, timeout, memory)
+                        executable, sas_file, plan_manager, timeout, memory,
+                        extra_options)
                     if exitcode is None:
                         return
 
@@ -162,18 +167,19 @@ def run_sat(configs, executable, sas_file, plan_manager, final_config,
         exitcode = run_sat_config(
             [(1, final_config)], 0, search_cost_type,
             heuristic_cost_type, executable, sas_file, plan_manager,
-            timeout, memory)
+            timeout, memory, extra_options)
         if exitcode is not None:
             yield exitcode
 
 
-def run_opt(configs, executable, sas_file, plan_manager, timeout, memory):
+def run_opt(configs, executable, sas_file, plan_manager, timeout, memory,
+            extra_options):
     for pos, (relative_time, args) in enumerate(configs):
         run_time = compute_run_time(timeout, configs, pos)
         if run_time <= 0:
             return
         exitcode = run_search(executable, args, sas_file, plan_manager,
-                              run_time, memory)
+                              run_time, memory, extra_options)
         yield exitcode
 
         if exitcode in [returncodes.SUCCESS, returncodes.SEARCH_UNSOLVABLE]:
@@ -202,13 +208,16 @@ def get_portfolio_attributes(portfolio):
     return attributes
 
 
-def run(portfolio, executable, sas_file, plan_manager, time, memory):
+def run(portfolio, executable, sas_file, plan_manager, time, memory,
+        extra_options=()):
     """
     Run the configs in the given portfolio file.
 
     The portfolio is allowed to run for at most *time* seconds and may
-    use a maximum of *memory* bytes.
+    use a maximum of *memory* bytes. *extra_options* are passed to the
+    search component before the options of each config.
     """
+    extra_options = list(extra_options)
     attributes = get_portfolio_attributes(portfolio)
     configs = attributes["CONFIGS"]
     optimal = attributes["OPTIMAL"]
@@ -231,9 +240,10 @@ def run(portfolio, executable, sas_file, plan_manager, time, memory):
 
     if optimal:
         exitcodes = run_opt(
-            configs, executable, sas_file, plan_manager, timeout, memory)
+            configs, executable, sas_file, plan_manager, timeout, memory,
+            extra_options)
     else:
         exitcodes = run_sat(
             configs, executable, sas_file, plan_manager, final_config,
-            final_config_builder, timeout, memory)
+            final_config_builder, timeout, memory, extra_options)
     return returncodes.generate_portfolio_exitcode(list(exitcodes))
@@ -59,15 +59,35 @@ def run_translate(args):
         args.translate_time_limit, args.overall_time_limit)
     memory_limit = limits.get_memory_limit(
         args.translate_memory_limit, args.overall_memory_limit)
-    translate = get_executable(args.build, REL_TRANSLATE_PATH)
-    assert sys.executable, "Path to interpreter could not be found"
-    cmd = [sys.executable] + [translate] + args.translate_inputs + args.translate_options
-
-    stderr, returncode = call.get_error_output_and_returncode(
-        "translator",
-        cmd,
-        time_limit=time_limit,
-        memory_limit=memory_limit)
+    if args.translate_worker:
+        stderr, returncode = call.get_error_output_and_returncode_from_worker(
+            "translator",
+            args.translate_worker,
+            args.translate_inputs + args.translate_options,
+            time_limit=time_limit,
+            memory_limit=memory_limit)
+    else:
+        translate = get_executable(args.build, REL_TRANSLATE_PATH)
+        assert sys.executable, "Path to interpreter could not be found"
+        cmd = [sys.executable] + [translate] + args.translate_inputs + args.translate_options
+
+        pass_fds = []
+        if args.sas_in_memory:
+            # The translator writes its output to an anonymous in-memory file
+            # through an inherited file descriptor. The search component (and
+            # every configuration of a portfolio) reads it from the start by
+            # reopening the descriptor of the driver process.
+            args.sas_fd = os.memfd_create(args.sas_file)
+            args.search_input = "/proc/self/fd/{}".format(args.sas_fd)
+            cmd += ["--sas-file", "/dev/fd/{}".format(args.sas_fd)]
+            pass_fds.append(args.sas_fd)
+
+        stderr, returncode = call.get_error_output_and_returncode(
+            "translator",
+            cmd,
+            time_limit=time_limit,
+            memory_limit=memory_limit,
+            pass_fds=pass_fds)
 
     # We collect stderr of the translator and print it here, unless
     # the translator ran out of memory and all output in stderr is
@@ -113,12 +133,21 @@ def run_search(args):
         single_plan=args.portfolio_single_plan)
     plan_manager.delete_existing_plans()
 
+    # The relaxation heuristics read the relaxed operators while the
+    # search options are parsed, so this option has to come first.
+    if args.search_relaxation_operators_file:
+        relaxation_operators_options = [
+            "--internal-relaxation-operators-file",
+            args.search_relaxation_operators_file]
+    else:
+        relaxation_operators_options = []
+
     if args.portfolio:
         assert not args.search_options
         logging.info("search portfolio: %s" % args.portfolio)
         return portfolio_runner.run(
             args.portfolio, executable, args.search_input, plan_manager,
-            time_limit, memory_limit)
+            time_limit, memory_limit, relaxation_operators_options)
     else:
         if not args.search_options:
             returncodes.exit_with_driver_input_error(
@@ -128,7 +157,8 @@ def run_search(args):
         try:
             call.check_call(
                 "search",
-                [executable] + args.search_options,
+                [executable] + relaxation_operators_options +
+                args.search_options,
                 stdin=args.search_input,
                 time_limit=time_limit,
                 memory_limit=memory_limit)
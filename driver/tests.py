@@ -6,6 +6,7 @@ Test module for Fast Downward driver script. Run with
 
 import os
 from pathlib import Path
+import socket
 import subprocess
 import sys
 import traceback
@@ -13,11 +14,12 @@ import traceback
 import pytest
 
 from .aliases import ALIASES, PORTFOLIOS
-from .arguments import EXAMPLES
+from .arguments import (
+    DEFAULT_RELAXATION_OPERATORS_FILE, EXAMPLE_PORTFOLIO, EXAMPLES)
 from .call import check_call
 from . import limits
 from . import returncodes
-from .run_components import get_executable, REL_SEARCH_PATH
+from .run_components import get_executable, REL_SEARCH_PATH, REL_TRANSLATE_PATH
 from .util import REPO_ROOT_DIR, find_domain_filename
 
 
@@ -58,6 +60,108 @@ def test_portfolios():
         run_driver(parameters)
 
 
+@pytest.mark.skipif(not hasattr(os, "memfd_create"),
+                    reason="In-memory files are not supported on this system")
+def test_sas_in_memory(tmp_path):
+    # Run in a temporary directory to keep the output.sas of the other tests.
+    driver = [sys.executable, os.path.join(REPO_ROOT_DIR, "fast-downward.py"),
+              "--sas-in-memory"]
+    task = os.path.join(
+        REPO_ROOT_DIR, "misc", "tests", "benchmarks", "gripper", "prob01.pddl")
+    subprocess.check_call(
+        driver + [task, "--search", "astar(lmcut())"], cwd=tmp_path)
+    # All configurations of the portfolio read the task from the same file.
+    subprocess.check_call(
+        driver + ["--portfolio", os.path.join(REPO_ROOT_DIR, EXAMPLE_PORTFOLIO),
+                  "--search-time-limit", "30m", task], cwd=tmp_path)
+
+    with pytest.raises(subprocess.CalledProcessError) as exception_info:
+        subprocess.check_call(
+            driver + ["--keep-sas-file", task, "--search", "astar(lmcut())"],
+            cwd=tmp_path)
+    assert exception_info.value.returncode == returncodes.DRIVER_INPUT_ERROR
+
+
+def test_skip_relaxation_operators(tmp_path):
+    driver = [sys.executable, os.path.join(REPO_ROOT_DIR, "fast-downward.py"),
+              "--keep-sas-file"]
+    benchmarks = os.path.join(REPO_ROOT_DIR, "misc", "tests", "benchmarks")
+    search = ["--search-options", "--search", "astar(hmax())"]
+    subprocess.check_call(
+        driver + [os.path.join(benchmarks, "gripper", "prob01.pddl")] + search,
+        cwd=tmp_path)
+    relaxed_operators_file = tmp_path / "output.relaxed"
+    assert relaxed_operators_file.exists()
+
+    # The search must not read the relaxed operators of the gripper task.
+    with pytest.raises(subprocess.CalledProcessError) as exception_info:
+        subprocess.check_call(
+            driver + [os.path.join(benchmarks, "miconic", "s1-0.pddl"),
+                      "--translate-options", "--skip-relaxation-operators"] +
+            search, cwd=tmp_path)
+    assert exception_info.value.returncode == returncodes.SEARCH_INPUT_ERROR
+    assert not relaxed_operators_file.exists()
+
+    # Without the translator, the search does not read relaxed operators
+    # that are older than the SAS file.
+    subprocess.check_call(
+        driver + ["--translate",
+                  os.path.join(benchmarks, "gripper", "prob01.pddl")],
+        cwd=tmp_path)
+    os.utime(relaxed_operators_file, (0, 0))
+    with pytest.raises(subprocess.CalledProcessError) as exception_info:
+        subprocess.check_call(driver + ["output.sas"] + search, cwd=tmp_path)
+    assert exception_info.value.returncode == returncodes.SEARCH_INPUT_ERROR
+    os.utime(relaxed_operators_file)
+    subprocess.check_call(driver + ["output.sas"] + search, cwd=tmp_path)
+
+
+@pytest.mark.parametrize("task", [
+    "miconic-simpleadl/s1-0.pddl", "philosophers/p01-phil2.pddl"])
+def test_relaxation_heuristics_solvable_tasks(task, tmp_path):
+    # The relaxed operators must cover conditional effects and axioms, or
+    # the relaxation heuristics consider solvable tasks unsolvable.
+    task = os.path.join(REPO_ROOT_DIR, "misc", "tests", "benchmarks", task)
+    for heuristic in ["hmax()", "add()", "ff()"]:
+        output = subprocess.check_output(
+            [sys.executable, os.path.join(REPO_ROOT_DIR, "fast-downward.py"),
+             task, "--search", "eager_greedy([{}])".format(heuristic)],
+            cwd=tmp_path, text=True)
+        prefix = "Initial heuristic value for {}: ".format(heuristic)
+        initial_values = [line.partition(prefix)[2]
+                          for line in output.splitlines() if prefix in line]
+        assert initial_values and "infinity" not in initial_values
+        assert "Solution found." in output
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"),
+                    reason="UNIX sockets are not supported on this system")
+def test_translate_worker(tmp_path):
+    translate_dir = os.path.dirname(get_executable("release", REL_TRANSLATE_PATH))
+    socket_path = str(tmp_path / "worker.socket")
+    worker = subprocess.Popen(
+        [sys.executable, os.path.join(translate_dir, "translate_worker.py"),
+         socket_path],
+        stdout=subprocess.PIPE, text=True)
+    try:
+        # The worker prints a line once it listens on the socket.
+        worker.stdout.readline()
+        task = os.path.join(REPO_ROOT_DIR, "misc", "tests", "benchmarks",
+                            "gripper", "prob01.pddl")
+        # Run in a temporary directory to keep the output.sas of the other
+        # tests.
+        for _ in range(2):
+            subprocess.check_call(
+                [sys.executable, os.path.join(REPO_ROOT_DIR, "fast-downward.py"),
+                 "--translate-worker", socket_path, task,
+                 "--search", "astar(lmcut())"],
+                cwd=tmp_path)
+    finally:
+        worker.terminate()
+        worker.wait()
+    assert not os.path.exists(socket_path)
+
+
 def _get_portfolio_configs(portfolio: Path):
     content = portfolio.read_text()
     attributes = {}
@@ -86,9 +190,12 @@ def _convert_to_standalone_config(config):
 
 
 def _run_search(config):
+    # Use the relaxed operators that the driver exported with output.sas.
     check_call(
         "search",
-        [get_executable("release", REL_SEARCH_PATH)] + list(config),
+        [get_executable("release", REL_SEARCH_PATH),
+         "--internal-relaxation-operators-file",
+         DEFAULT_RELAXATION_OPERATORS_FILE] + list(config),
         stdin="output.sas")
 
 
@@ -0,0 +1,86 @@
+#! /usr/bin/env python3
+
+
+HELP = """\
+Micro-benchmark for firing the product rules of the Datalog model computation.
+Feed the atoms of a product rule with the given number of conditions to the
+rule one at a time, like build_model.compute_model does, and print the minimum
+time of several runs. The atoms of the conditions arrive interleaved, so that
+every atom fires the rule. Run the script on two revisions to compare them.
+"""
+
+import argparse
+import itertools
+from pathlib import Path
+import sys
+import time
+
+
+DIR = Path(__file__).resolve().parent
+REPO = DIR.parents[1]
+sys.path.insert(0, str(REPO / "src" / "translate"))
+
+import build_model
+import pddl
+import pddl_to_prolog
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=HELP)
+    parser.add_argument(
+        "--conditions", type=int, nargs="+", default=[2, 3],
+        help="numbers of conditions of the benchmarked rules "
+             "(default: %(default)s)")
+    parser.add_argument(
+        "--atoms", type=int, default=None,
+        help="number of atoms per condition (default: so that the rule "
+             "derives about 10^6 atoms)")
+    parser.add_argument(
+        "--runs", type=int, default=3,
+        help="run each benchmark this many times (default: %(default)d)")
+    return parser.parse_args()
+
+
+def get_product_rule(num_conditions):
+    conditions = [pddl.Atom("p%d" % i, ["?x%d" % i, "?y%d" % i])
+                  for i in range(num_conditions)]
+    effect = pddl.Atom("goal", pddl_to_prolog.get_variables(conditions))
+    rule = pddl_to_prolog.Rule(conditions, pddl.Atom(
+        effect.predicate, sorted(effect.args)))
+    rule.type = "product"
+    prog = pddl_to_prolog.PrologProgram()
+    prog.add_rule(rule)
+    rule, = build_model.convert_rules(prog)
+    return rule
+
+
+def run(num_conditions, num_atoms):
+    rule = get_product_rule(num_conditions)
+    num_enqueued = 0
+    def enqueue(predicate, args):
+        nonlocal num_enqueued
+        num_enqueued += 1
+    start = time.perf_counter()
+    for i, cond_index in itertools.product(
+            range(num_atoms), range(num_conditions)):
+        atom = pddl.Atom("p%d" % cond_index, ["a%d" % i, "b%d" % i])
+        rule.update_index(atom, cond_index)
+        rule.fire(atom, cond_index, enqueue)
+    return time.perf_counter() - start, num_enqueued
+
+
+def main():
+    args = parse_args()
+    for num_conditions in args.conditions:
+        num_atoms = args.atoms or round(10 ** (6 / num_conditions))
+        times = []
+        for _ in range(args.runs):
+            elapsed, num_enqueued = run(num_conditions, num_atoms)
+            times.append(elapsed)
+        print(f"{num_conditions} conditions, {num_atoms} atoms each: "
+              f"{num_enqueued} enqueued atoms in {min(times):.3f}s",
+              flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#! /usr/bin/env python3
+
+
+HELP = """\
+Report the time spent in each translator phase.
+Translate each task several times and print the minimum CPU time of every
+phase reported by the translator timers, together with the peak memory.
+Run the script on two revisions (or with different translator options) to
+compare them.
+"""
+
+import argparse
+from collections import defaultdict
+from pathlib import Path
+import re
+import subprocess
+import sys
+import tempfile
+
+
+DIR = Path(__file__).resolve().parent
+REPO = DIR.parents[1]
+TRANSLATOR = REPO / "src" / "translate" / "translate.py"
+
+TIMING_REGEX = re.compile(
+    r"^(?P<phase>.+?)(?:\.\.\.|:) \[(?P<cpu>\d+\.\d+)s CPU, "
+    r"(?P<wall>\d+\.\d+)s wall-clock\]$", re.M)
+PEAK_MEMORY_REGEX = re.compile(r"^Translator peak memory: (\d+) KB$", re.M)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=HELP)
+    parser.add_argument(
+        "--benchmarks-dir", default=str(DIR / "benchmarks"),
+        help="path to benchmark directory (default: %(default)s)")
+    parser.add_argument(
+        "suite", nargs="*", default=["first"],
+        help='Use "first" to benchmark the first task of each domain '
+             '(default) or "<domain>:<problem>" to benchmark individual tasks')
+    parser.add_argument(
+        "--runs-per-task", type=int, default=3,
+        help="translate each task this many times (default: %(default)d)")
+    parser.add_argument(
+        "--phases", nargs="*", default=None,
+        help="only report these phases (default: all phases)")
+    parser.add_argument(
+        "--translate-options", nargs=argparse.REMAINDER, default=[],
+        help="options passed on to the translator")
+    args = parser.parse_args()
+    args.benchmarks_dir = Path(args.benchmarks_dir).resolve()
+    return args
+
+
+def get_tasks(args):
+    tasks = []
+    for task in args.suite:
+        if task == "first":
+            for domain_dir in sorted(args.benchmarks_dir.iterdir()):
+                if domain_dir.is_dir():
+                    problems = sorted(
+                        f for f in domain_dir.iterdir()
+                        if "domain" not in f.name)
+                    tasks.append(problems[0])
+        else:
+            tasks.append(args.benchmarks_dir / task.replace(":", "/"))
+    return tasks
+
+
+def get_task_name(path):
+    return "-".join(str(path).split("/")[-2:])
+
+
+def translate_task(task_file, translate_options):
+    domain_file = task_file.parent / "domain.pddl"
+    cmd = [sys.executable, str(TRANSLATOR), str(domain_file), str(task_file)]
+    cmd += translate_options
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        try:
+            return subprocess.check_output(
+                cmd, cwd=tmp_dir, stderr=subprocess.STDOUT,
+                encoding=sys.getfilesystemencoding())
+        except subprocess.CalledProcessError as err:
+            sys.exit(f"Call failed: {' '.join(cmd)}\n{err.output}")
+
+
+def parse_log(log):
+    cpu_times = defaultdict(float)
+    for match in TIMING_REGEX.finditer(log):
+        cpu_times[match.group("phase")] += float(match.group("cpu"))
+    memory = PEAK_MEMORY_REGEX.search(log)
+    return cpu_times, int(memory.group(1)) if memory else None
+
+
+def main():
+    args = parse_args()
+    for task in get_tasks(args):
+        print(f"{get_task_name(task)}:", flush=True)
+        best_times = {}
+        peak_memory = None
+        for _ in range(args.runs_per_task):
+            cpu_times, memory = parse_log(
+                translate_task(task, args.translate_options))
+            for phase, cpu_time in cpu_times.items():
+                best_times[phase] = min(
+                    cpu_time, best_times.get(phase, cpu_time))
+            if memory is not None:
+                peak_memory = min(memory, peak_memory or memory)
+        phases = [phase for phase in best_times
+                  if args.phases is None or phase in args.phases]
+        width = max(map(len, phases + ["Translator peak memory"]))
+        for phase in phases:
+            print(f"  {phase:<{width}} {best_times[phase]:8.3f}s")
+        if peak_memory is not None:
+            print(f"  {'Translator peak memory':<{width}} {peak_memory:8d} KB")
+        print(flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#! /usr/bin/env python3
+
+
+HELP = """\
+Compare the number of auxiliary atoms in the Datalog model for the join orders
+of the translator (see the translator option --join-order). Translate each
+task with every join order and print the number of auxiliary atoms reported by
+the model computation together with the time for computing the model.
+"""
+
+import argparse
+from pathlib import Path
+import re
+import subprocess
+import sys
+import tempfile
+
+
+DIR = Path(__file__).resolve().parent
+REPO = DIR.parents[1]
+TRANSLATOR = REPO / "src" / "translate" / "translate.py"
+
+JOIN_ORDERS = ["greedy", "cardinality"]
+AUXILIARY_ATOMS_REGEX = re.compile(r"^(\d+) auxiliary atoms$", re.M)
+MODEL_TIME_REGEX = re.compile(
+    r"^Computing model\.\.\. \[(\d+\.\d+)s CPU, \d+\.\d+s wall-clock\]$",
+    re.M)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=HELP)
+    parser.add_argument(
+        "--benchmarks-dir", default=str(DIR / "benchmarks"),
+        help="path to benchmark directory (default: %(default)s)")
+    parser.add_argument(
+        "suite", nargs="*", default=["first"],
+        help='Use "first" to compare the first task of each domain '
+             '(default) or "<domain>:<problem>" to compare individual tasks')
+    parser.add_argument(
+        "--translate-options", nargs=argparse.REMAINDER, default=[],
+        help="options passed on to the translator")
+    args = parser.parse_args()
+    args.benchmarks_dir = Path(args.benchmarks_dir).resolve()
+    return args
+
+
+def get_tasks(args):
+    tasks = []
+    for task in args.suite:
+        if task == "first":
+            for domain_dir in sorted(args.benchmarks_dir.iterdir()):
+                if domain_dir.is_dir():
+                    problems = sorted(
+                        f for f in domain_dir.iterdir()
+                        if "domain" not in f.name)
+                    tasks.append(problems[0])
+        else:
+            tasks.append(args.benchmarks_dir / task.replace(":", "/"))
+    return tasks
+
+
+def get_task_name(path):
+    return "-".join(str(path).split("/")[-2:])
+
+
+def translate_task(task_file, translate_options):
+    domain_file = task_file.parent / "domain.pddl"
+    cmd = [sys.executable, str(TRANSLATOR), str(domain_file), str(task_file)]
+    cmd += translate_options
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        try:
+            return subprocess.check_output(
+                cmd, cwd=tmp_dir, stderr=subprocess.STDOUT,
+                encoding=sys.getfilesystemencoding())
+        except subprocess.CalledProcessError as err:
+            sys.exit(f"Call failed: {' '.join(cmd)}\n{err.output}")
+
+
+def parse_log(log):
+    # The translator computes one model for all Datalog programs.
+    auxiliary_atoms = sum(
+        int(match) for match in AUXILIARY_ATOMS_REGEX.findall(log))
+    model_time = sum(float(match) for match in MODEL_TIME_REGEX.findall(log))
+    return auxiliary_atoms, model_time
+
+
+def main():
+    args = parse_args()
+    tasks = get_tasks(args)
+    width = max(len(get_task_name(task)) for task in tasks)
+    header = "".join(f" {order:>12} {'time':>7}" for order in JOIN_ORDERS)
+    print(f"{'task':<{width}}{header} {'change':>7}", flush=True)
+    for task in tasks:
+        results = [
+            parse_log(translate_task(
+                task, args.translate_options + ["--join-order", order]))
+            for order in JOIN_ORDERS]
+        columns = "".join(f" {atoms:12d} {time:6.3f}s"
+                          for atoms, time in results)
+        baseline = results[0][0]
+        change = (results[-1][0] - baseline) / baseline if baseline else 0
+        print(f"{get_task_name(task):<{width}}{columns} {change:+7.1%}",
+              flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,8 @@
 
 using namespace std;
 
+static string relaxed_operators_filename;
+
 NO_RETURN
 static void input_error(const string &msg) {
     cerr << msg << endl;
@@ -170,7 +172,17 @@ shared_ptr<SearchAlgorithm> parse_cmd_line(
     for (int i = 1; i < argc; ++i) {
         string arg = argv[i];
 
-        if (arg == "--if-unit-cost") {
+        if (arg == "--internal-relaxation-operators-file") {
+            /*
+              Handled here rather than in parse_cmd_line_aux because the
+              relaxation heuristics read the file while the search
+              arguments are parsed.
+            */
+            if (i + 1 == argc)
+                input_error("missing argument after --internal-relaxation-operators-file");
+            ++i;
+            relaxed_operators_filename = argv[i];
+        } else if (arg == "--if-unit-cost") {
             active = is_unit_cost;
         } else if (arg == "--if-non-unit-cost") {
             active = !is_unit_cost;
@@ -185,6 +197,10 @@ shared_ptr<SearchAlgorithm> parse_cmd_line(
 }
 
 
+const string &get_relaxed_operators_filename() {
+    return relaxed_operators_filename;
+}
+
 string usage(const string &progname) {
     return "usage: \n" +
            progname + " [OPTIONS] --search SEARCH < OUTPUT\n\n"
@@ -200,5 +216,8 @@ string usage(const string &progname) {
            "    This planner call is part of a portfolio which already created\n"
            "    plan files FILENAME.1 up to FILENAME.COUNTER.\n"
            "    Start enumerating plan files with COUNTER+1, i.e. FILENAME.COUNTER+1\n\n"
+           "--internal-relaxation-operators-file FILENAME\n"
+           "    Relaxation heuristics read the relaxed operators exported by the\n"
+           "    translator from FILENAME\n\n"
            "See https://www.fast-downward.org for details.";
 }
@@ -11,4 +11,10 @@ extern std::shared_ptr<SearchAlgorithm> parse_cmd_line(
 
 extern std::string usage(const std::string &progname);
 
+/*
+  Path of the relaxed operators exported by the translator, as given by
+  --internal-relaxation-operators-file, or the empty string.
+*/
+extern const std::string &get_relaxed_operators_filename();
+
 #endif
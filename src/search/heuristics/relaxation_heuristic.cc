@@ -1,13 +1,17 @@
 #include "relaxation_heuristic.h"
 
+#include "../command_line.h"
+
 #include "../task_utils/task_properties.h"
 #include "../utils/collections.h"
 #include "../utils/logging.h"
+#include "../utils/system.h"
 #include "../utils/timer.h"
 
 #include <algorithm>
 #include <cassert>
 #include <cstddef>
+#include <cstdint>
 #include <unordered_map>
 #include <vector>
 #include <fstream>
@@ -16,6 +20,11 @@
 using namespace std;
 
 namespace relaxation_heuristic {
+static const string BINARY_OPERATORS_FILENAME = "operators_relaxation_heuristic.bin";
+static const string TEXT_OPERATORS_FILENAME = "operators_relaxation_heuristic.txt";
+static const char BINARY_OPERATORS_MAGIC[4] = {'R', 'X', 'O', 'P'};
+static const int32_t BINARY_OPERATORS_VERSION = 1;
+
 Proposition::Proposition()
     : cost(-1),
       reached_by(NO_OP),
@@ -40,7 +49,7 @@ UnaryOperator::UnaryOperator(
 RelaxationHeuristic::RelaxationHeuristic(const plugins::Options &opts)
     : Heuristic(opts) {
     num_existing_facts = task_properties::get_num_facts(task_proxy);
-    parse_operators();
+    num_auxiliary_propositions = 0;
 
     // Build proposition offsets.
     VariablesProxy variables = task_proxy.get_variables();
@@ -52,12 +61,10 @@ RelaxationHeuristic::RelaxationHeuristic(const plugins::Options &opts)
     }
 
     // Build unary operators.
-    unary_operators.reserve(parsed_operators.size());
-    for (ParsedOperator op : parsed_operators)
-        build_unary_operators(op);
+    read_operators();
 
     // Build propositions.
-    propositions.resize(num_existing_facts + new_propositions.size());
+    propositions.resize(num_existing_facts + num_auxiliary_propositions);
 
     // Build goal propositions.
     GoalsProxy goals = task_proxy.get_goals();
@@ -105,21 +112,14 @@ PropID RelaxationHeuristic::get_prop_id(const FactProxy &fact) const {
     return get_prop_id(fact.get_variable().get_id(), fact.get_value());
 }
 
-PropID RelaxationHeuristic::get_prop_id(ParsedProposition &prop, bool set_id) {
-    auto iter = std::find(new_propositions.begin(), new_propositions.end(), prop);
-    if (iter != new_propositions.end()) {
-        ptrdiff_t pos = iter - new_propositions.begin();
-        prop.prop_id = new_propositions[pos].prop_id;
-        return prop.prop_id;
-    } else {
-        if (set_id) {
-            prop.prop_id = num_existing_facts + new_propositions.size();
-            new_propositions.push_back(prop);
-            return prop.prop_id;
-        } else {
-            return -1;
-        }
-    }
+PropID RelaxationHeuristic::get_prop_id_of_parsed_proposition(
+    const ParsedProposition &prop) {
+    auto fact_iter = fact_prop_ids.find(prop.prop_name);
+    if (fact_iter != fact_prop_ids.end())
+        return fact_iter->second;
+    // Auxiliary propositions get consecutive IDs after the task facts.
+    PropID next_id = num_existing_facts + auxiliary_prop_ids.size();
+    return auxiliary_prop_ids.emplace(prop.prop_name, next_id).first->second;
 }
 
 const Proposition *RelaxationHeuristic::get_proposition(
@@ -135,82 +135,222 @@ Proposition *RelaxationHeuristic::get_proposition(const FactProxy &fact) {
     return get_proposition(fact.get_variable().get_id(), fact.get_value());
 }
 
-void RelaxationHeuristic::parse_operators() {
-    std::ifstream operators_file;
-    operators_file.open("operators_relaxation_heuristic.txt");
+void RelaxationHeuristic::read_operators() {
+    /*
+      The translator exports the relaxed operators either in the binary
+      format (default) or in the text format (for debugging). The driver
+      passes the path of the export; without it, we look for the
+      translator's default file names. The translator removes a stale
+      default file of the other format whenever it writes one of them.
+      The format is detected from the magic number of the file.
+    */
+    string filename = get_relaxed_operators_filename();
+    if (filename.empty()) {
+        filename = ifstream(BINARY_OPERATORS_FILENAME).is_open() ?
+            BINARY_OPERATORS_FILENAME : TEXT_OPERATORS_FILENAME;
+    }
+
+    ifstream binary_file(filename, ios::binary);
+    if (!binary_file.is_open()) {
+        cerr << "Couldn't open file " << filename << ". The relaxation "
+             << "heuristics need the relaxed operators exported by the "
+             << "translator." << endl;
+        utils::exit_with(utils::ExitCode::SEARCH_INPUT_ERROR);
+    }
+    char magic[4];
+    binary_file.read(magic, sizeof(magic));
+    if (binary_file &&
+        equal(begin(magic), end(magic), begin(BINARY_OPERATORS_MAGIC))) {
+        read_binary_operators(binary_file, filename);
+        return;
+    }
+    binary_file.close();
+
+    ifstream text_file(filename);
+    parse_operators(text_file);
+
+    /*
+      If several facts have the same name (e.g. "<none of those>"), the
+      name refers to the first of them.
+    */
+    fact_prop_ids.reserve(num_existing_facts);
+    for (FactProxy fact : FactsProxy(*task))
+        fact_prop_ids.emplace(fact.get_name(), get_prop_id(fact));
+
+    unary_operators.reserve(parsed_operators.size());
+    for (const ParsedOperator &op : parsed_operators)
+        build_unary_operators(op);
+    num_auxiliary_propositions = auxiliary_prop_ids.size();
+
+    unordered_map<string, PropID>().swap(fact_prop_ids);
+    unordered_map<string, PropID>().swap(auxiliary_prop_ids);
+    vector<ParsedOperator>().swap(parsed_operators);
+}
+
+static void exit_with_invalid_binary_operators(
+    const string &filename, const string &reason) {
+    cerr << "Invalid relaxed operators file " << filename << ": " << reason
+         << "." << endl;
+    utils::exit_with(utils::ExitCode::SEARCH_INPUT_ERROR);
+}
+
+PropID RelaxationHeuristic::get_prop_id_of_binary_fact(
+    int var, int value, const string &filename) const {
+    // Auxiliary propositions are encoded with variable -1.
+    if (var == -1) {
+        if (value < 0 || value >= num_auxiliary_propositions) {
+            exit_with_invalid_binary_operators(
+                filename, "auxiliary proposition " + to_string(value) +
+                " out of range");
+        }
+        return num_existing_facts + value;
+    }
+    VariablesProxy variables = task_proxy.get_variables();
+    if (var < 0 || var >= static_cast<int>(variables.size())) {
+        exit_with_invalid_binary_operators(
+            filename, "variable " + to_string(var) + " out of range");
+    }
+    if (value < 0 || value >= variables[var].get_domain_size()) {
+        exit_with_invalid_binary_operators(
+            filename, "value " + to_string(value) + " of variable " +
+            to_string(var) + " out of range");
+    }
+    return get_prop_id(var, value);
+}
+
+void RelaxationHeuristic::read_binary_operators(
+    istream &in, const string &filename) {
+    /*
+      Binary format (all numbers are little-endian 32-bit integers):
+      - header: magic "RXOP", version, number of auxiliary propositions,
+        number of operators, total number of preconditions
+      - operator table: one record (effect var, effect value, cost,
+        number of preconditions) per operator
+      - precondition table: (var, value) pairs of all operators, in the
+        order of the operator table
+      Facts of the task are given as (var, value); auxiliary
+      propositions as (-1, index). No names are stored in the file.
+
+      The file may stem from a different task, so we check all numbers
+      before using them.
+    */
+    // The magic number has already been read.
+    int32_t header[4];
+    in.read(reinterpret_cast<char *>(header), sizeof(header));
+    if (!in) {
+        exit_with_invalid_binary_operators(filename, "file is truncated");
+    } else if (header[0] != BINARY_OPERATORS_VERSION) {
+        exit_with_invalid_binary_operators(filename, "unknown version");
+    }
+    num_auxiliary_propositions = header[1];
+    int num_operators = header[2];
+    int num_preconditions = header[3];
+    if (num_auxiliary_propositions < 0 || num_operators < 0 ||
+        num_preconditions < 0) {
+        exit_with_invalid_binary_operators(filename, "negative count");
+    }
+
+    // Check the counts against the file size before allocating the tables.
+    streampos tables_start = in.tellg();
+    in.seekg(0, ios::end);
+    int64_t tables_size = static_cast<int64_t>(in.tellg() - tables_start);
+    in.seekg(tables_start);
+    int64_t expected_size = (4 * static_cast<int64_t>(num_operators) +
+                             2 * static_cast<int64_t>(num_preconditions)) *
+        static_cast<int64_t>(sizeof(int32_t));
+    if (!in || tables_size != expected_size) {
+        exit_with_invalid_binary_operators(
+            filename, "file size does not match the header");
+    }
+
+    vector<int32_t> operator_table(4 * num_operators);
+    vector<int32_t> precondition_table(2 * num_preconditions);
+    in.read(reinterpret_cast<char *>(operator_table.data()),
+            operator_table.size() * sizeof(int32_t));
+    in.read(reinterpret_cast<char *>(precondition_table.data()),
+            precondition_table.size() * sizeof(int32_t));
+    if (!in) {
+        exit_with_invalid_binary_operators(filename, "file is truncated");
+    }
+
+    unary_operators.reserve(num_operators);
+    vector<PropID> precondition_props;
+    const int32_t *precondition = precondition_table.data();
+    int num_remaining_preconditions = num_preconditions;
+    for (int op_no = 0; op_no < num_operators; ++op_no) {
+        const int32_t *record = &operator_table[4 * op_no];
+        PropID effect_prop = get_prop_id_of_binary_fact(
+            record[0], record[1], filename);
+        int base_cost = record[2];
+        int num_op_preconditions = record[3];
+        if (num_op_preconditions < 0 ||
+            num_op_preconditions > num_remaining_preconditions) {
+            exit_with_invalid_binary_operators(
+                filename, "precondition count of operator " +
+                to_string(op_no) + " out of range");
+        }
+        num_remaining_preconditions -= num_op_preconditions;
+        precondition_props.clear();
+        for (int i = 0; i < num_op_preconditions; ++i) {
+            precondition_props.push_back(get_prop_id_of_binary_fact(
+                precondition[0], precondition[1], filename));
+            precondition += 2;
+        }
+        // The sort-unique can eventually go away. See issue497.
+        utils::sort_unique(precondition_props);
+        array_pool::ArrayPoolIndex precond_index =
+            preconditions_pool.append(precondition_props);
+        unary_operators.emplace_back(
+            precondition_props.size(), precond_index, effect_prop, NO_OP,
+            base_cost);
+    }
+    if (num_remaining_preconditions != 0) {
+        exit_with_invalid_binary_operators(
+            filename, "unused preconditions");
+    }
+}
+
+void RelaxationHeuristic::parse_operators(istream &operators_file) {
     std::string line;
-    if (operators_file.is_open()) {
+    std::getline(operators_file, line);
+    while (line != "end_operators") {
+        ParsedOperator o = ParsedOperator();
+        ParsedProposition effect;
+        ParsedProposition precondition;
+        effect = ParsedProposition();
+        effect.prop_name = line;
+        o.effect = effect;
         std::getline(operators_file, line);
-        while (line != "end_operators") {
-            ParsedOperator o = ParsedOperator();
-            ParsedProposition effect;
-            ParsedProposition precondition;
-            effect = ParsedProposition();
-            effect.prop_name = line;
-            o.effect = effect;
-            std::getline(operators_file, line);
-            while (line != "cost") {
-                precondition = ParsedProposition();
-                precondition.prop_name = line;
-                o.preconditions.push_back(move(precondition));
-                std::getline(operators_file, line);
-            }
-            operators_file >> o.cost;
-            parsed_operators.push_back(move(o));
-            std::getline(operators_file, line);
+        while (line != "cost") {
+            precondition = ParsedProposition();
+            precondition.prop_name = line;
+            o.preconditions.push_back(move(precondition));
             std::getline(operators_file, line);
         }
-    } else {
-        std::cout << "Couldn't open file operators_relaxation_heuristic.txt" << std::endl;
+        operators_file >> o.cost;
+        parsed_operators.push_back(move(o));
+        std::getline(operators_file, line);
+        std::getline(operators_file, line);
     }
 }
 
 void RelaxationHeuristic::build_unary_operators(const ParsedOperator &op) {
     int op_no = NO_OP;
     int base_cost = op.cost;
-    bool use_original_fact = false;
     vector<PropID> precondition_props;
     precondition_props.reserve(op.preconditions.size());
-    for (ParsedProposition precondition : op.preconditions) {
-        for (FactProxy fact : FactsProxy(*task)) {
-            if (fact.get_name() == precondition.prop_name) {
-                precondition_props.push_back(get_prop_id(fact));
-                use_original_fact = true;
-                break;
-            }
-        }
-        if (!use_original_fact) {
-            if (get_prop_id(precondition, false) == -1) {
-                precondition.prop_id = get_prop_id(precondition, true);
-            }
-            precondition_props.push_back(precondition.prop_id);
-        }
-        use_original_fact = false;
-    }
-    PropID effect_prop;
-    ParsedProposition effect = op.effect;
-    for (FactProxy fact : FactsProxy(*task)) {
-        if (fact.get_name() == op.effect.prop_name) {
-            effect_prop = get_prop_id(fact);
-            use_original_fact = true;
-            break;
-        }
-    }
-    if (!use_original_fact) {
-        if (get_prop_id(effect, false) == -1) {
-            effect.prop_id = get_prop_id(effect, true);
-        }
-        effect_prop = effect.prop_id;
+    for (const ParsedProposition &precondition : op.preconditions) {
+        precondition_props.push_back(
+            get_prop_id_of_parsed_proposition(precondition));
     }
+    PropID effect_prop = get_prop_id_of_parsed_proposition(op.effect);
 
     // The sort-unique can eventually go away. See issue497.
-    vector<PropID> preconditions_copy(precondition_props);
-    utils::sort_unique(preconditions_copy);
+    utils::sort_unique(precondition_props);
     array_pool::ArrayPoolIndex precond_index =
-        preconditions_pool.append(preconditions_copy);
+        preconditions_pool.append(precondition_props);
     unary_operators.emplace_back(
-        preconditions_copy.size(), precond_index, effect_prop, op_no, base_cost);
-    precondition_props.clear();
+        precondition_props.size(), precond_index, effect_prop, op_no, base_cost);
 }
 
 void RelaxationHeuristic::simplify() {
@@ -8,6 +8,8 @@
 #include "../utils/collections.h"
 
 #include <cassert>
+#include <string>
+#include <unordered_map>
 #include <vector>
 
 class FactProxy;
@@ -57,11 +59,7 @@ struct UnaryOperator {
 static_assert(sizeof(UnaryOperator) == 28, "UnaryOperator has wrong size");
 
 struct ParsedProposition {
-    PropID prop_id;
     std::string prop_name;
-    bool operator==(const ParsedProposition &other) const {
-        return prop_name == other.prop_name;
-    }
 };
 
 struct ParsedOperator {
@@ -71,18 +69,30 @@ struct ParsedOperator {
 };
 
 class RelaxationHeuristic : public Heuristic {
-    void parse_operators();
+    void read_operators();
+    void read_binary_operators(std::istream &in, const std::string &filename);
+    void parse_operators(std::istream &in);
     void build_unary_operators(const ParsedOperator &op);
+    PropID get_prop_id_of_parsed_proposition(const ParsedProposition &prop);
+    PropID get_prop_id_of_binary_fact(
+        int var, int value, const std::string &filename) const;
     void simplify();
 
     // proposition_offsets[var_no]: first PropID related to variable var_no
     std::vector<PropID> proposition_offsets;
+
+    /*
+      Map the proposition names of the text format to PropIDs. Only
+      used while the operators are parsed.
+    */
+    std::unordered_map<std::string, PropID> fact_prop_ids;
+    std::unordered_map<std::string, PropID> auxiliary_prop_ids;
 protected:
     int num_existing_facts;
+    int num_auxiliary_propositions;
     std::vector<ParsedOperator> parsed_operators;
     std::vector<UnaryOperator> unary_operators;
     std::vector<Proposition> propositions;
-    std::vector<ParsedProposition> new_propositions;
     std::vector<PropID> goal_propositions;
 
     array_pool::ArrayPool preconditions_pool;
@@ -118,7 +128,6 @@ protected:
 
     PropID get_prop_id(int var, int value) const;
     PropID get_prop_id(const FactProxy &fact) const;
-    PropID get_prop_id(ParsedProposition &prop, bool set_id);
 
     Proposition *get_proposition(PropID prop_id) {
         return &propositions[prop_id];
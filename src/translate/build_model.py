@@ -3,7 +3,11 @@
 
 import sys
 import itertools
+import json
+import operator
+import time
 
+import options
 import pddl
 import timers
 from functools import reduce
@@ -113,7 +117,10 @@ class ProductRule(BuildRule):
     def __init__(self, effect, conditions):
         self.effect = effect
         self.conditions = conditions
-        self.atoms_by_index = [[] for c in self.conditions]
+        # For each condition, the bindings of the atoms seen so far. We
+        # compute them once when an atom arrives, so that firing only needs
+        # to combine the new atom with the stored bindings.
+        self.bindings_by_index = [[] for c in self.conditions]
         self.empty_atom_list_no = len(self.conditions)
     def validate(self):
         assert len(self.conditions) >= 2, self
@@ -126,10 +133,11 @@ class ProductRule(BuildRule):
         assert len(all_cond_vars) == len(eff_vars), self
         assert len(all_cond_vars) == sum([len(c) for c in cond_vars])
     def update_index(self, new_atom, cond_index):
-        atom_list = self.atoms_by_index[cond_index]
-        if not atom_list:
+        bindings_list = self.bindings_by_index[cond_index]
+        if not bindings_list:
             self.empty_atom_list_no -= 1
-        atom_list.append(new_atom)
+        bindings_list.append(
+            self._get_bindings(new_atom, self.conditions[cond_index]))
 
     def _get_bindings(self, atom, cond):
         return [(var_no, obj) for var_no, obj in zip(cond.args, atom.args)
@@ -143,22 +151,19 @@ class ProductRule(BuildRule):
         # Bindings: List-of(Binding)
         # BindingsFactor: List-of(Bindings)
         # BindingsFactors: List-of(BindingsFactor)
-        bindings_factors = []
-        for pos, cond in enumerate(self.conditions):
-            if pos == cond_index:
-                continue
-            atoms = self.atoms_by_index[pos]
-            assert atoms, "if we have no atoms, this should never be called"
-            factor = [self._get_bindings(atom, cond) for atom in atoms]
-            bindings_factors.append(factor)
+        bindings_factors = [
+            bindings_list
+            for pos, bindings_list in enumerate(self.bindings_by_index)
+            if pos != cond_index]
 
         eff_args = self.prepare_effect(new_atom, cond_index)
+        predicate = self.effect.predicate
 
-        for bindings_list in itertools.product(*bindings_factors):
-            bindings = itertools.chain(*bindings_list)
-            for var_no, obj in bindings:
-                eff_args[var_no] = obj
-            enqueue_func(self.effect.predicate, eff_args)
+        for bindings_tuple in itertools.product(*bindings_factors):
+            for bindings in bindings_tuple:
+                for var_no, obj in bindings:
+                    eff_args[var_no] = obj
+            enqueue_func(predicate, eff_args)
 
 
 class ProjectRule(BuildRule):
@@ -296,13 +301,324 @@ class Queue:
         self.queue_pos += 1
         return result
 
+# The batched semi-naive evaluation (see compute_model_semi_naive) interns
+# all objects as integers and represents the atoms of each predicate as
+# tuples of object numbers. Rules are fired once per round for all new
+# tuples of their condition predicates (the delta), and pddl.Atom objects
+# are only created for the final model.
+
+class ObjectInterner:
+    def __init__(self):
+        self.object_ids = {}
+        self.objects = []
+    def get_id(self, obj):
+        object_id = self.object_ids.get(obj)
+        if object_id is None:
+            object_id = len(self.objects)
+            self.object_ids[obj] = object_id
+            self.objects.append(obj)
+        return object_id
+    def get_ids(self, objects):
+        return tuple(self.get_id(obj) for obj in objects)
+
+def make_projection(positions):
+    # Like operator.itemgetter, but always returns a tuple.
+    if not positions:
+        return lambda row: ()
+    elif len(positions) == 1:
+        position = positions[0]
+        return lambda row: (row[position],)
+    return operator.itemgetter(*positions)
+
+class BatchedCondition:
+    def __init__(self, condition, interner):
+        self.predicate = condition.predicate
+        self.arity = len(condition.args)
+        self.checks = [
+            (position, interner.get_id(arg))
+            for position, arg in enumerate(condition.args)
+            if not isinstance(arg, int) and arg[0] != "?"]
+    def get_delta(self, delta):
+        tuples = delta.get(self.predicate, ())
+        if self.checks and tuples:
+            checks = self.checks
+            tuples = [args for args in tuples
+                      if all(args[position] == obj
+                             for position, obj in checks)]
+        return tuples
+
+class BatchedRule:
+    """Batched counterpart of a JoinRule, ProductRule or ProjectRule.
+
+    The effect arguments are computed from the concatenated tuples of
+    the conditions followed by the constant effect arguments."""
+    def __init__(self, rule, interner):
+        self.predicate = rule.effect.predicate
+        self.conditions = [BatchedCondition(cond, interner)
+                           for cond in rule.conditions]
+        offsets = list(itertools.accumulate(
+            [0] + [cond.arity for cond in self.conditions]))
+        var_positions = {}
+        for cond, offset in zip(rule.conditions, offsets):
+            for position, arg in enumerate(cond.args):
+                if isinstance(arg, int):
+                    var_positions.setdefault(arg, offset + position)
+        constants = []
+        effect_positions = []
+        for arg in rule.effect.args:
+            if isinstance(arg, int):
+                effect_positions.append(var_positions[arg])
+            else:
+                effect_positions.append(offsets[-1] + len(constants))
+                constants.append(interner.get_id(arg))
+        self.constants = tuple(constants)
+        self.get_effect_args = make_projection(effect_positions)
+
+class BatchedJoinRule(BatchedRule):
+    def __init__(self, rule, interner):
+        super().__init__(rule, interner)
+        # Like JoinRule, index the tuples of both conditions by the
+        # values of their common variables.
+        self.get_keys = [make_projection(positions)
+                         for positions in rule.common_var_positions]
+        self.tuples_by_key = ({}, {})
+    def fire(self, delta, result):
+        constants = self.constants
+        get_effect_args = self.get_effect_args
+        # The delta of the first condition is joined with the old tuples
+        # of the second condition, the delta of the second condition with
+        # all tuples of the first condition.
+        for cond_index, cond in enumerate(self.conditions):
+            tuples = cond.get_delta(delta)
+            if not tuples:
+                continue
+            get_key = self.get_keys[cond_index]
+            other_tuples_by_key = self.tuples_by_key[1 - cond_index]
+            for args in tuples:
+                matches = other_tuples_by_key.get(get_key(args))
+                if matches:
+                    if cond_index == 0:
+                        for other_args in matches:
+                            result.append(get_effect_args(
+                                args + other_args + constants))
+                    else:
+                        for other_args in matches:
+                            result.append(get_effect_args(
+                                other_args + args + constants))
+            tuples_by_key = self.tuples_by_key[cond_index]
+            for args in tuples:
+                tuples_by_key.setdefault(get_key(args), []).append(args)
+
+class BatchedProductRule(BatchedRule):
+    def __init__(self, rule, interner):
+        super().__init__(rule, interner)
+        self.tuples_by_index = [[] for c in self.conditions]
+    def fire(self, delta, result):
+        constants = self.constants
+        get_effect_args = self.get_effect_args
+        chain = itertools.chain.from_iterable
+        # The delta of each condition is combined with all tuples of the
+        # previous conditions and the old tuples of the following ones.
+        for cond_index, cond in enumerate(self.conditions):
+            tuples = cond.get_delta(delta)
+            if not tuples:
+                continue
+            factors = list(self.tuples_by_index)
+            factors[cond_index] = tuples
+            if all(factors):
+                for combination in itertools.product(*factors):
+                    result.append(get_effect_args(
+                        tuple(chain(combination)) + constants))
+            self.tuples_by_index[cond_index].extend(tuples)
+
+class BatchedProjectRule(BatchedRule):
+    def fire(self, delta, result):
+        constants = self.constants
+        get_effect_args = self.get_effect_args
+        for args in self.conditions[0].get_delta(delta):
+            result.append(get_effect_args(args + constants))
+
+class RuleProfile:
+    """Statistics about firing a rule in the model computation (see
+    options.model_profile_file)."""
+    def __init__(self, rule):
+        self.rule = rule
+        self.fires = 0
+        self.pushes = 0
+        self.duplicate_pushes = 0
+        self.time = 0.0
+    def add(self, other):
+        self.fires += other.fires
+        self.pushes += other.pushes
+        self.duplicate_pushes += other.duplicate_pushes
+        self.time += other.time
+    def get_statistics(self):
+        return {
+            "fires": self.fires,
+            "pushes": self.pushes,
+            "duplicate_pushes": self.duplicate_pushes,
+            "time": round(self.time, 6),
+            }
+
+def get_rule_profiles(prog, rules):
+    # The rules are converted from the rules of prog in the same order.
+    assert len(rules) == len(prog.rules)
+    return {rule: RuleProfile(prolog_rule)
+            for rule, prolog_rule in zip(rules, prog.rules)}
+
+def report_rule_profiles(profiles, filename, num_reported_rules=10):
+    import pddl_to_prolog
+    profiles = sorted(profiles, key=lambda profile: -profile.time)
+    origin_profiles = {}
+    for profile in profiles:
+        origin = profile.rule.origin
+        if origin not in origin_profiles:
+            origin_profiles[origin] = RuleProfile(None)
+        origin_profiles[origin].add(profile)
+    print("Rules that took the most time in the model computation:")
+    for profile in profiles[:num_reported_rules]:
+        print("%.3fs, %d fires, %d pushes (%d duplicates), from %s: %s" % (
+            profile.time, profile.fires, profile.pushes,
+            profile.duplicate_pushes, profile.rule.origin,
+            pddl_to_prolog.get_rule_string(profile.rule)))
+    data = {
+        "rules": [
+            dict(rule=pddl_to_prolog.get_rule_string(profile.rule),
+                 type=profile.rule.type, origin=profile.rule.origin,
+                 **profile.get_statistics())
+            for profile in profiles],
+        "origins": [
+            dict(origin=origin, **profile.get_statistics())
+            for origin, profile in sorted(
+                origin_profiles.items(), key=lambda item: -item[1].time)],
+        }
+    with open(filename, "w") as profile_file:
+        json.dump(data, profile_file, indent=2)
+    print("Wrote model computation profile to %s" % filename)
+
+def fire_profiled(matches, next_atom, queue, profiles):
+    for rule, cond_index in matches:
+        profile = profiles[rule]
+        num_pushes = queue.num_pushes
+        queue_length = len(queue.queue)
+        start_time = time.perf_counter()
+        rule.update_index(next_atom, cond_index)
+        rule.fire(next_atom, cond_index, queue.push)
+        profile.time += time.perf_counter() - start_time
+        profile.fires += 1
+        pushes = queue.num_pushes - num_pushes
+        profile.pushes += pushes
+        profile.duplicate_pushes += pushes - (len(queue.queue) - queue_length)
+
+def fire_batched_profiled(rules, delta, relations, new_tuples, profiles):
+    new_tuple_sets = {}
+    for rule in rules:
+        profile = profiles[rule]
+        tuples = []
+        start_time = time.perf_counter()
+        rule.fire(delta, tuples)
+        profile.time += time.perf_counter() - start_time
+        profile.fires += 1
+        profile.pushes += len(tuples)
+        relation = relations.get(rule.predicate, ())
+        seen_tuples = new_tuple_sets.setdefault(rule.predicate, set())
+        for args in tuples:
+            if args in relation or args in seen_tuples:
+                profile.duplicate_pushes += 1
+            else:
+                seen_tuples.add(args)
+        new_tuples.setdefault(rule.predicate, []).extend(tuples)
+
+def compute_model_semi_naive(prog):
+    BATCHED_RULE_TYPES = {
+        JoinRule: BatchedJoinRule,
+        ProductRule: BatchedProductRule,
+        ProjectRule: BatchedProjectRule,
+        }
+    with timers.timing("Preparing model"):
+        interner = ObjectInterner()
+        rules = []
+        rules_by_predicate = {}
+        for rule in convert_rules(prog):
+            batched_rule = BATCHED_RULE_TYPES[type(rule)](rule, interner)
+            rules.append(batched_rule)
+            for cond in batched_rule.conditions:
+                predicate_rules = rules_by_predicate.setdefault(
+                    cond.predicate, [])
+                if batched_rule not in predicate_rules:
+                    predicate_rules.append(batched_rule)
+        relations = {}
+        delta = {}
+        for fact in sorted(fact.atom for fact in prog.facts):
+            args = interner.get_ids(fact.args)
+            relation = relations.setdefault(fact.predicate, set())
+            if args not in relation:
+                relation.add(args)
+                delta.setdefault(fact.predicate, []).append(args)
+
+        if options.model_profile_file:
+            profiles = get_rule_profiles(prog, rules)
+        else:
+            profiles = None
+
+    print("Generated %d rules." % len(rules))
+    with timers.timing("Computing model"):
+        num_pushes = sum(len(tuples) for tuples in delta.values())
+        derived = list(delta.items())
+        while delta:
+            fired_rules = {}
+            for predicate in delta:
+                for rule in rules_by_predicate.get(predicate, ()):
+                    fired_rules[rule] = None
+            new_tuples = {}
+            if profiles is None:
+                for rule in fired_rules:
+                    rule.fire(delta, new_tuples.setdefault(rule.predicate, []))
+            else:
+                fire_batched_profiled(
+                    fired_rules, delta, relations, new_tuples, profiles)
+            delta = {}
+            for predicate, tuples in new_tuples.items():
+                num_pushes += len(tuples)
+                relation = relations.setdefault(predicate, set())
+                new_relation_tuples = set(tuples) - relation
+                if new_relation_tuples:
+                    relation |= new_relation_tuples
+                    delta[predicate] = list(new_relation_tuples)
+                    derived.append((predicate, delta[predicate]))
+        relevant_atoms = 0
+        auxiliary_atoms = 0
+        for predicate, tuples in derived:
+            if isinstance(predicate, str) and "$" in predicate:
+                auxiliary_atoms += len(tuples)
+            else:
+                relevant_atoms += len(tuples)
+    with timers.timing("Creating model atoms"):
+        get_object = interner.objects.__getitem__
+        model = [pddl.Atom(predicate, list(map(get_object, args)))
+                 for predicate, tuples in derived
+                 for args in tuples]
+    print("%d relevant atoms" % relevant_atoms)
+    print("%d auxiliary atoms" % auxiliary_atoms)
+    print("%d final queue length" % len(model))
+    print("%d total queue pushes" % num_pushes)
+    if profiles is not None:
+        report_rule_profiles(profiles.values(), options.model_profile_file)
+    return model
+
 def compute_model(prog):
+    if options.model_computation == "semi-naive":
+        return compute_model_semi_naive(prog)
     with timers.timing("Preparing model"):
         rules = convert_rules(prog)
         unifier = Unifier(rules)
         # unifier.dump()
         fact_atoms = sorted(fact.atom for fact in prog.facts)
         queue = Queue(fact_atoms)
+        if options.model_profile_file:
+            profiles = get_rule_profiles(prog, rules)
+        else:
+            profiles = None
 
     print("Generated %d rules." % len(rules))
     with timers.timing("Computing model"):
@@ -316,13 +632,18 @@ def compute_model(prog):
             else:
                 relevant_atoms += 1
             matches = unifier.unify(next_atom)
-            for rule, cond_index in matches:
-                rule.update_index(next_atom, cond_index)
-                rule.fire(next_atom, cond_index, queue.push)
+            if profiles is None:
+                for rule, cond_index in matches:
+                    rule.update_index(next_atom, cond_index)
+                    rule.fire(next_atom, cond_index, queue.push)
+            else:
+                fire_profiled(matches, next_atom, queue, profiles)
     print("%d relevant atoms" % relevant_atoms)
     print("%d auxiliary atoms" % auxiliary_atoms)
     print("%d final queue length" % len(queue.queue))
     print("%d total queue pushes" % queue.num_pushes)
+    if profiles is not None:
+        report_rule_profiles(profiles.values(), options.model_profile_file)
     return queue.queue
 
 if __name__ == "__main__":
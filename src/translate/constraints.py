@@ -1,5 +1,4 @@
-import itertools
-from typing import Iterable, List, Tuple
+from typing import List, Tuple
 
 class InequalityDisjunction:
     def __init__(self, parts: List[Tuple[str, str]]):
@@ -124,12 +123,6 @@ class ConstraintSystem:
         ineq_part = " and ".join(ineq_disjunctions)
         return f"{eq_part} ({ineq_part}) (not constant {self.not_constant}"
 
-    def _combine_equality_conjunctions(self, eq_conjunctions:
-                                       Iterable[EqualityConjunction]) -> None:
-        all_eq = itertools.chain.from_iterable(c.equalities
-                                               for c in eq_conjunctions)
-        return EqualityConjunction(list(all_eq))
-
     def add_equality_conjunction(self, eq_conjunction: EqualityConjunction):
         self.add_equality_DNF([eq_conjunction])
 
@@ -149,29 +142,109 @@ class ConstraintSystem:
 
     def is_solvable(self):
         # cf. top of class for explanation
-        def inequality_disjunction_ok(ineq_disj, representative):
-            for inequality in ineq_disj.parts:
-                a, b = inequality
-                if representative.get(a, a) != representative.get(b, b):
+        # We pick one EqualityConjunction from each DNF at a time, starting
+        # with the shortest DNFs, and backtrack when the equivalence
+        # relation induced by the chosen conjunctions violates a constraint.
+        # This is sound because merging equivalence classes never repairs a
+        # violated constraint.
+        union_find = BacktrackingUnionFind()
+        equality_DNFs = sorted(self.equality_DNFs, key=len)
+
+        def is_violated():
+            # check whether an element of not_constant is in the same
+            # equivalence class as a constant or whether all inequalities of
+            # some inequality disjunction have both terms in the same
+            # equivalence class.
+            if any(union_find.has_object(s) for s in self.not_constant):
+                return True
+            find = union_find.find
+            for ineq_disj in self.ineq_disjunctions:
+                for a, b in ineq_disj.parts:
+                    if find(a) != find(b):
+                        break
+                else:
                     return True
             return False
 
-        for eq_conjunction in itertools.product(*self.equality_DNFs):
-            combined = self._combine_equality_conjunctions(eq_conjunction)
-            if not combined.is_consistent():
-                continue
-            # check whether with the finest equivalence relation induced by the
-            # combined equality conjunction there is no element of not_constant
-            # in the same equivalence class as a constant and that in each
-            # inequality disjunction there is an inequality where the two terms
-            # are in different equivalence classes.
-            representative = combined.get_representative()
-            if any(not isinstance(representative.get(s, s), int) and
-                   representative.get(s, s)[0] != "?"
-                   for s in self.not_constant):
-                continue
-            if any(not inequality_disjunction_ok(d, representative)
-                   for d in self.ineq_disjunctions):
-                continue
+        def solve(index):
+            # Only check the constraints before we branch and when all
+            # conjunctions are chosen.
+            if index == len(equality_DNFs) or len(equality_DNFs[index]) > 1:
+                if is_violated():
+                    return False
+            if index == len(equality_DNFs):
+                return True
+            for eq_conjunction in equality_DNFs[index]:
+                checkpoint = union_find.checkpoint()
+                if (all(union_find.union(v1, v2)
+                        for v1, v2 in eq_conjunction.equalities) and
+                        solve(index + 1)):
+                    return True
+                union_find.undo(checkpoint)
+            return False
+
+        return solve(0)
+
+
+def is_object(term):
+    return not isinstance(term, int) and not term.startswith("?")
+
+
+class BacktrackingUnionFind:
+    """Equivalence classes of the strings and ints of a ConstraintSystem,
+    where each class contains at most one object for the relation to be
+    consistent. Merges can be undone in reverse order (see checkpoint and
+    undo), so we use union by size but no path compression."""
+    def __init__(self):
+        self.parent = {}
+        self.size = {}
+        # The object of the equivalence class of each root, or None.
+        self.object = {}
+        self.trail = []
+
+    def find(self, term):
+        parent = self.parent.get(term, term)
+        while parent != term:
+            term = parent
+            parent = self.parent[term]
+        return term
+
+    def has_object(self, term):
+        root = self.find(term)
+        if root in self.object:
+            return self.object[root] is not None
+        return is_object(root)
+
+    def union(self, v1, v2):
+        """Merge the equivalence classes of v1 and v2. Return False if the
+        merged class contains two objects."""
+        for term in (v1, v2):
+            if term not in self.parent:
+                self.parent[term] = term
+                self.size[term] = 1
+                self.object[term] = term if is_object(term) else None
+        root1 = self.find(v1)
+        root2 = self.find(v2)
+        if root1 == root2:
             return True
-        return False
+        if self.size[root1] < self.size[root2]:
+            root1, root2 = root2, root1
+        object1 = self.object[root1]
+        object2 = self.object[root2]
+        self.trail.append((root1, root2, object1))
+        self.parent[root2] = root1
+        self.size[root1] += self.size[root2]
+        if object1 is None:
+            self.object[root1] = object2
+        return object1 is None or object2 is None
+
+    def checkpoint(self):
+        return len(self.trail)
+
+    def undo(self, checkpoint):
+        """Undo the merges since the given checkpoint."""
+        while len(self.trail) > checkpoint:
+            root1, root2, object1 = self.trail.pop()
+            self.parent[root2] = root2
+            self.size[root1] -= self.size[root2]
+            self.object[root1] = object1
@@ -0,0 +1,96 @@
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+
+import normalize
+from pddl_parser import parsing_functions
+from pddl_parser.pddl_file import parse_pddl_file
+
+# Translating many tasks of the same domain parses and normalizes the same
+# domain over and over again. With a cache directory, we store the parsed and
+# normalized domain in a pickle file named after a hash of the domain file and
+# of the translator, so that later runs for the same domain only need to parse
+# the task file and normalize its goal. The invariant synthesis stores its
+# results in the same directory (see invariant_finder.py).
+
+TRANSLATOR_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def get_translator_version():
+    # Any change to the translator sources (or to the Python version, which
+    # determines the pickle format) invalidates the cached domains.
+    digest = hashlib.sha256(sys.version.encode())
+    for dirpath, dirnames, filenames in os.walk(TRANSLATOR_DIR):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.endswith(".py"):
+                path = os.path.join(dirpath, filename)
+                digest.update(os.path.relpath(path, TRANSLATOR_DIR).encode())
+                with open(path, "rb") as source_file:
+                    digest.update(source_file.read())
+    return digest.hexdigest()
+
+
+def get_cache_file(cache_dir, domain_filename):
+    digest = hashlib.sha256(get_translator_version().encode())
+    try:
+        with open(domain_filename, "rb") as domain_file:
+            digest.update(domain_file.read())
+    except OSError as e:
+        raise SystemExit("Error: Could not read file: %s\nReason: %s" %
+                         (e.filename, e))
+    return os.path.join(cache_dir, "domain-%s.pickle" % digest.hexdigest())
+
+
+def load_cache_file(cache_file):
+    try:
+        with open(cache_file, "rb") as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, pickle.UnpicklingError) as e:
+        print("Ignoring unreadable cache file %s: %s" % (cache_file, e))
+        return None
+
+
+def save_cache_file(cache_file, cached_object):
+    cache_dir = os.path.dirname(cache_file)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write to a temporary file and rename it afterwards, so that
+        # concurrent translator runs never read a partially written file.
+        fd, tmp_file = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(cached_object, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, cache_file)
+        except BaseException:
+            os.remove(tmp_file)
+            raise
+    except OSError as e:
+        print("Could not write cache file %s: %s" % (cache_file, e))
+
+
+def parse_task(domain_filename, task_filename, cache_dir):
+    """Parse the task, using the cached domain if possible. Return the task
+    with normalized actions and axioms, and the DomainNormalization needed
+    for normalizing the rest of the task (see normalize.normalize)."""
+    cache_file = get_cache_file(cache_dir, domain_filename)
+    cached_domain = load_cache_file(cache_file)
+    if cached_domain is None:
+        domain_pddl = parse_pddl_file("domain", domain_filename)
+        domain, type_dict, predicate_dict = parsing_functions.parse_domain(
+            domain_pddl)
+        domain_normalization = normalize.normalize_domain(domain)
+        cached_domain = (domain, type_dict, predicate_dict,
+                         domain_normalization)
+        save_cache_file(cache_file, cached_domain)
+    else:
+        print("Using cached domain %s" % cache_file)
+    domain, type_dict, predicate_dict, domain_normalization = cached_domain
+    task_pddl = parse_pddl_file("task", task_filename)
+    task = parsing_functions.parse_task_with_domain(
+        domain, type_dict, predicate_dict, task_pddl)
+    return task, domain_normalization
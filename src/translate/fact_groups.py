@@ -1,3 +1,5 @@
+from collections import defaultdict
+
 import invariant_finder
 import options
 import pddl
@@ -8,29 +10,47 @@ from typing import Dict, List, Set, Tuple
 DEBUG = False
 
 
-def expand_group(group, task, reachable_facts):
+class ReachableFactIndex:
+    """Index of the reachable facts by predicate, position of the counted
+    argument and the remaining arguments. The index for a predicate and
+    position is built when a group first needs it."""
+    def __init__(self, reachable_facts):
+        self.reachable_facts = reachable_facts
+        self.facts_by_predicate = defaultdict(list)
+        for fact in reachable_facts:
+            self.facts_by_predicate[fact.predicate].append(fact)
+        self.indexes = {}
+
+    def get_matching_facts(self, fact, pos):
+        """Return the reachable facts that agree with fact on all arguments
+        except the one at position pos."""
+        index = self.indexes.get((fact.predicate, pos))
+        if index is None:
+            index = {}
+            for reachable_fact in self.facts_by_predicate.get(
+                    fact.predicate, []):
+                args = reachable_fact.args
+                index.setdefault(args[:pos] + args[pos + 1:], []).append(
+                    reachable_fact)
+            self.indexes[(fact.predicate, pos)] = index
+        return index.get(fact.args[:pos] + fact.args[pos + 1:], [])
+
+
+def expand_group(group, fact_index):
     result = []
     for fact in group:
         try:
             pos = list(fact.args).index("?X")
         except ValueError:
-            if fact in reachable_facts:
+            if fact in fact_index.reachable_facts:
                 result.append(fact)
         else:
-            # NOTE: This could be optimized by only trying objects of the correct
-            #       type, or by using a unifier which directly generates the
-            #       applicable objects. It is not worth optimizing this at this stage,
-            #       though.
-            for obj in task.objects:
-                newargs = list(fact.args)
-                newargs[pos] = obj.name
-                atom = pddl.Atom(fact.predicate, newargs)
-                if atom in reachable_facts:
-                    result.append(atom)
+            result += fact_index.get_matching_facts(fact, pos)
     return result
 
-def instantiate_groups(groups, task, reachable_facts):
-    return [expand_group(group, task, reachable_facts) for group in groups]
+def instantiate_groups(groups, reachable_facts):
+    fact_index = ReachableFactIndex(reachable_facts)
+    return [expand_group(group, fact_index) for group in groups]
 
 class GroupCoverQueue:
     def __init__(self, groups):
@@ -123,7 +143,7 @@ def compute_groups(task: pddl.Task, atoms: Set[pddl.Literal],
     groups = invariant_finder.get_groups(task, reachable_action_params)
 
     with timers.timing("Instantiating groups"):
-        groups = instantiate_groups(groups, task, atoms)
+        groups = instantiate_groups(groups, atoms)
 
     # Sort here already to get deterministic mutex groups.
     groups = sort_groups(groups)
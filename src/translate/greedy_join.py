@@ -1,8 +1,13 @@
-import sys
+import heapq
+import itertools
+import math
 
 import pddl
 import pddl_to_prolog
 
+# We cap the size estimates, so that their products cannot overflow.
+MAX_SIZE_ESTIMATE = float(2 ** 53)
+
 class OccurrencesTracker:
     """Keeps track of the number of times each variable appears
     in a list of symbolic atoms."""
@@ -22,41 +27,136 @@ class OccurrencesTracker:
                     del self.occurrences[var]
     def variables(self):
         return set(self.occurrences)
+    def variables_outside(self, symatoms):
+        """Return the variables of the given symbolic atoms that also
+        occur in other atoms."""
+        counts = {}
+        for symatom in symatoms:
+            for var in symatom.args:
+                if var[0] == "?":
+                    counts[var] = counts.get(var, 0) + 1
+        return {var for var, count in counts.items()
+                if self.occurrences[var] > count}
+
+def get_product(sizes):
+    return min(math.prod(sizes), MAX_SIZE_ESTIMATE)
+
+class RelationSizes:
+    """Estimates the number of atoms of each predicate in the model of a
+    normalized Datalog program.
+
+    Predicates that occur in no rule effect are static, so we count their
+    facts; this includes the type predicates. The atoms of the other
+    predicates are bounded by the static conditions (e.g. the types of the
+    parameters) of the rules that derive them."""
+    def __init__(self, prog):
+        self.num_objects = max(len(prog.objects), 1)
+        self.matching_facts = {}
+        self.static_facts = {}
+        for fact in prog.facts:
+            self.static_facts.setdefault(
+                fact.atom.predicate, set()).add(tuple(fact.atom.args))
+        self.sizes = {}
+        for rule in prog.rules:
+            self.static_facts.pop(rule.effect.predicate, None)
+        for predicate, facts in self.static_facts.items():
+            self.sizes[predicate] = float(len(facts))
+        num_initial_facts = {}
+        for fact in prog.facts:
+            predicate = fact.atom.predicate
+            num_initial_facts[predicate] = num_initial_facts.get(
+                predicate, 0) + 1
+        for rule in prog.rules:
+            static_conditions = [cond for cond in rule.conditions
+                                 if cond.predicate in self.static_facts]
+            domains = self.get_variable_domains(static_conditions)
+            predicate = rule.effect.predicate
+            size = get_product(domains.get(arg, self.num_objects)
+                               for arg in rule.effect.args if arg[0] == "?")
+            self.sizes[predicate] = max(
+                size, self.sizes.get(predicate, 0.0),
+                float(num_initial_facts.get(predicate, 0)))
+    def get_size(self, atom):
+        """Estimate the number of atoms in the model that match atom."""
+        constants = tuple((index, arg) for index, arg in enumerate(atom.args)
+                          if arg[0] != "?")
+        size = self.sizes.get(atom.predicate, 0.0)
+        if not constants:
+            return size
+        elif atom.predicate in self.static_facts:
+            key = (atom.predicate, constants)
+            if key not in self.matching_facts:
+                self.matching_facts[key] = float(sum(
+                    all(args[index] == arg for index, arg in constants)
+                    for args in self.static_facts[atom.predicate]))
+            return self.matching_facts[key]
+        else:
+            # Assume that every constant selects the same share of atoms.
+            return max(size / self.num_objects ** len(constants), 1.0)
+    def get_variable_domains(self, conditions):
+        """Estimate the number of values of each variable in the conditions.
+        A variable cannot take more values than there are atoms matching any
+        condition that contains it."""
+        domains = {}
+        for cond in conditions:
+            size = self.get_size(cond)
+            for var in cond.args:
+                if var[0] == "?":
+                    domains[var] = min(
+                        size, domains.get(var, float(self.num_objects)))
+        return domains
 
 class CostMatrix:
+    """Keeps the join costs of all pairs of joinees in a heap.
+
+    Each joinee gets a consecutive number when it is added. Among the pairs
+    with minimal cost, the heap returns the pair whose later joinee was added
+    first and, among those, whose earlier joinee was added first. Instead of
+    removing the pairs of joined joinees from the heap, we skip them when
+    they reach the top, and we filter them out when they make up most of the
+    heap."""
     def __init__(self, joinees):
-        self.joinees = []
-        self.cost_matrix = []
+        self.joinee_numbers = itertools.count()
+        self.joinees = {}
+        self.variables = {}
+        self.heap = []
         for joinee in joinees:
             self.add_entry(joinee)
     def add_entry(self, joinee):
-        new_row = [self.compute_join_cost(joinee, other) for other in self.joinees]
-        self.cost_matrix.append(new_row)
-        self.joinees.append(joinee)
-    def delete_entry(self, index):
-        for row in self.cost_matrix[index + 1:]:
-            del row[index]
-        del self.cost_matrix[index]
-        del self.joinees[index]
+        number = next(self.joinee_numbers)
+        for other_number, other in self.joinees.items():
+            heapq.heappush(self.heap, (
+                self.compute_join_cost(joinee, other), number, other_number))
+        self.joinees[number] = joinee
     def find_min_pair(self):
         assert len(self.joinees) >= 2
-        min_cost = (sys.maxsize, sys.maxsize)
-        for i, row in enumerate(self.cost_matrix):
-            for j, entry in enumerate(row):
-                if entry < min_cost:
-                    min_cost = entry
-                    left_index, right_index = i, j
-        return left_index, right_index
+        while True:
+            _, left_number, right_number = self.heap[0]
+            if left_number in self.joinees and right_number in self.joinees:
+                return left_number, right_number
+            heapq.heappop(self.heap)
     def remove_min_pair(self):
-        left_index, right_index = self.find_min_pair()
-        left, right = self.joinees[left_index], self.joinees[right_index]
-        assert left_index > right_index
-        self.delete_entry(left_index)
-        self.delete_entry(right_index)
-        return (left, right)
+        left_number, right_number = self.find_min_pair()
+        heapq.heappop(self.heap)
+        assert left_number > right_number
+        result = (self.joinees.pop(left_number),
+                  self.joinees.pop(right_number))
+        num_joinees = len(self.joinees)
+        if len(self.heap) > num_joinees * (num_joinees - 1):
+            self.heap = [entry for entry in self.heap
+                         if entry[1] in self.joinees and
+                         entry[2] in self.joinees]
+            heapq.heapify(self.heap)
+        return result
+    def get_variables(self, joinee):
+        variables = self.variables.get(joinee)
+        if variables is None:
+            variables = pddl_to_prolog.get_variables([joinee])
+            self.variables[joinee] = variables
+        return variables
     def compute_join_cost(self, left_joinee, right_joinee):
-        left_vars = pddl_to_prolog.get_variables([left_joinee])
-        right_vars = pddl_to_prolog.get_variables([right_joinee])
+        left_vars = self.get_variables(left_joinee)
+        right_vars = self.get_variables(right_joinee)
         if len(left_vars) > len(right_vars):
             left_vars, right_vars = right_vars, left_vars
         common_vars = left_vars & right_vars
@@ -65,6 +165,91 @@ class CostMatrix:
                 -len(common_vars))
     def can_join(self):
         return len(self.joinees) >= 2
+    def add_projection(self, projection, joinee):
+        """Called when greedy_join projects joinee to a new atom."""
+        pass
+    def add_join(self, joint_condition, left, right):
+        """Called when greedy_join joins two joinees into a new atom."""
+        pass
+
+class CardinalityCostMatrix(CostMatrix):
+    """Orders the joins by the estimated number of auxiliary atoms they
+    generate, i.e., the atoms of the joined and projected joinees, but avoids
+    Cartesian products. Ties are broken by the variable counts of
+    CostMatrix.
+
+    Unlike the variable counts, the cost of a pair depends on the other
+    joinees, because it includes projecting away the variables that no
+    other joinee needs. We therefore recompute all costs after each join."""
+    def __init__(self, rule, occurrences, relation_sizes):
+        self.occurrences = occurrences
+        self.domains = relation_sizes.get_variable_domains(rule.conditions)
+        self.sizes = {cond: relation_sizes.get_size(cond)
+                      for cond in rule.conditions}
+        self.costs = {}
+        self.variables = {}
+        self.joinee_numbers = itertools.count()
+        self.joinees = {next(self.joinee_numbers): cond
+                        for cond in rule.conditions}
+        self.update_costs()
+    def add_entry(self, joinee):
+        self.joinees[next(self.joinee_numbers)] = joinee
+        self.update_costs()
+    def update_costs(self):
+        joinees = list(self.joinees.items())
+        self.heap = [
+            (self.compute_join_cost(joinee, other), number, other_number)
+            for index, (number, joinee) in enumerate(joinees)
+            for other_number, other in joinees[:index]]
+        heapq.heapify(self.heap)
+    def get_domain_size(self, args):
+        return get_product(self.domains[arg] for arg in args if arg[0] == "?")
+    def get_projection_size(self, joinee, variables):
+        return min(self.sizes[joinee], self.get_domain_size(variables))
+    def get_join_size(self, left_size, right_size, common_vars, variables):
+        # Assume that the values of the common variables are independent and
+        # uniformly distributed.
+        join_size = min(left_size * right_size, MAX_SIZE_ESTIMATE)
+        join_size /= max(self.get_domain_size(common_vars), 1.0)
+        return min(join_size, self.get_domain_size(variables))
+    def compute_join_cost(self, left_joinee, right_joinee):
+        # Mirror how greedy_join projects the joinees and the join.
+        effect_vars = frozenset(self.occurrences.variables_outside(
+            [left_joinee, right_joinee]))
+        key = (left_joinee, right_joinee, effect_vars)
+        if key not in self.costs:
+            self.costs[key] = self._compute_join_cost(
+                left_joinee, right_joinee, effect_vars)
+        return self.costs[key]
+    def _compute_join_cost(self, left_joinee, right_joinee, effect_vars):
+        left_vars = self.get_variables(left_joinee)
+        right_vars = self.get_variables(right_joinee)
+        common_vars = left_vars & right_vars
+        num_auxiliary_atoms = 0.0
+        joinee_sizes = []
+        for joinee, joinee_vars in [(left_joinee, left_vars),
+                                    (right_joinee, right_vars)]:
+            size = self.sizes[joinee]
+            retained_vars = joinee_vars & (effect_vars | common_vars)
+            if retained_vars != joinee_vars:
+                size = self.get_projection_size(joinee, retained_vars)
+                num_auxiliary_atoms += size
+            joinee_sizes.append(size)
+        num_auxiliary_atoms += self.get_join_size(
+            *joinee_sizes, common_vars, effect_vars)
+        # The size estimates of fluent predicates are often much too large,
+        # which can make Cartesian products look cheap. Like the variable
+        # counts, we therefore join conditions with common variables first.
+        return ((not common_vars, min(num_auxiliary_atoms, MAX_SIZE_ESTIMATE)) +
+                super().compute_join_cost(left_joinee, right_joinee))
+    def add_projection(self, projection, joinee):
+        self.sizes[projection] = self.get_projection_size(
+            joinee, projection.args)
+    def add_join(self, joint_condition, left, right):
+        common_vars = set(left.args) & set(right.args)
+        self.sizes[joint_condition] = self.get_join_size(
+            self.sizes[left], self.sizes[right], common_vars,
+            joint_condition.args)
 
 class ResultList:
     def __init__(self, rule, name_generator):
@@ -81,10 +266,16 @@ class ResultList:
         self.result.append(rule)
         return rule.effect
 
-def greedy_join(rule, name_generator):
+def greedy_join(rule, name_generator, relation_sizes=None):
+    """Split the rule into binary joins. With relation_sizes (see
+    RelationSizes), choose the joins that generate the fewest estimated
+    auxiliary atoms instead of the joins with the fewest variables."""
     assert len(rule.conditions) >= 2
-    cost_matrix = CostMatrix(rule.conditions)
     occurrences = OccurrencesTracker(rule)
+    if relation_sizes is None:
+        cost_matrix = CostMatrix(rule.conditions)
+    else:
+        cost_matrix = CardinalityCostMatrix(rule, occurrences, relation_sizes)
     result = ResultList(rule, name_generator)
 
     while cost_matrix.can_join():
@@ -100,9 +291,11 @@ def greedy_join(rule, name_generator):
             retained_vars = joinee_vars & (effect_vars | common_vars)
             if retained_vars != joinee_vars:
                 joinees[i] = result.add_rule("project", [joinee], sorted(retained_vars))
+                cost_matrix.add_projection(joinees[i], joinee)
         joint_condition = result.add_rule("join", joinees, sorted(effect_vars))
-        cost_matrix.add_entry(joint_condition)
+        cost_matrix.add_join(joint_condition, *joinees)
         occurrences.update(joint_condition, +1)
+        cost_matrix.add_entry(joint_condition)
 
     # assert occurrences.variables() == set(rule.effect.args)
     # for var in set(rule.effect.args):
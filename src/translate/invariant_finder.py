@@ -2,11 +2,15 @@
 
 
 from collections import deque, defaultdict
+import hashlib
 import itertools
+import multiprocessing
+import os
 import random
 import time
 from typing import List
 
+import domain_cache
 import invariants
 import options
 import pddl
@@ -17,8 +21,14 @@ class BalanceChecker:
         self.predicates_to_add_actions = defaultdict(list)
         self.random = random.Random(314159)
         self.action_to_heavy_action = {}
+        # The pairs of parameters of each action of the task that are
+        # never equal in reachable instantiations.
+        self.inequal_params = []
         for act in task.actions:
-            action = self.add_inequality_preconds(act, reachable_action_params)
+            inequal_params = self.get_inequal_params(
+                act, reachable_action_params)
+            self.inequal_params.append(inequal_params)
+            action = self.add_inequality_preconds(act, inequal_params)
             too_heavy_effects = []
             create_heavy_act = False
             heavy_act = action
@@ -47,9 +57,9 @@ class BalanceChecker:
     def get_heavy_action(self, action):
         return self.action_to_heavy_action[action]
 
-    def add_inequality_preconds(self, action, reachable_action_params):
+    def get_inequal_params(self, action, reachable_action_params):
         if reachable_action_params is None or len(action.parameters) < 2:
-            return action
+            return []
         inequal_params = []
         combs = itertools.combinations(range(len(action.parameters)), 2)
         for pos1, pos2 in combs:
@@ -58,7 +68,9 @@ class BalanceChecker:
                     break
             else:
                 inequal_params.append((pos1, pos2))
+        return inequal_params
 
+    def add_inequality_preconds(self, action, inequal_params):
         if inequal_params:
             precond_parts = [action.precondition]
             for pos1, pos2 in inequal_params:
@@ -91,27 +103,149 @@ def get_initial_invariants(task):
             part = invariants.InvariantPart(predicate.name, inv_args, omitted)
             yield invariants.Invariant((part,))
 
+def get_condition_key(condition):
+    if isinstance(condition, pddl.Literal):
+        return str(condition)
+    parameters = [str(par) for par in getattr(condition, "parameters", ())]
+    return (condition.__class__.__name__, parameters,
+            [get_condition_key(part) for part in condition.parts])
+
+def get_invariant_cache_file(task, balance_checker):
+    """Return the cache file for the invariants of the task. Besides the
+    version of the translator, the invariants only depend on the fluent
+    predicates and the normalized actions of the task, the candidate limit
+    and the parameters that are never equal in reachable action
+    instantiations. The latter are the only part that depends on the
+    problem rather than the domain."""
+    actions = []
+    for action, inequal_params in zip(task.actions,
+                                      balance_checker.inequal_params):
+        effects = [([str(par) for par in eff.parameters],
+                    get_condition_key(eff.condition), str(eff.literal))
+                   for eff in action.effects]
+        actions.append((action.name, [str(par) for par in action.parameters],
+                        action.num_external_parameters,
+                        get_condition_key(action.precondition), effects,
+                        inequal_params))
+    predicates = [str(predicate) for predicate in get_fluents(task)]
+    key = repr((domain_cache.get_translator_version(), predicates, actions,
+                options.invariant_generation_max_candidates))
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return os.path.join(options.domain_cache_dir,
+                        "invariants-%s.pickle" % digest)
+
 def find_invariants(task, reachable_action_params):
+    balance_checker = BalanceChecker(task, reachable_action_params)
+    if options.domain_cache_dir is None:
+        cache_file = None
+    else:
+        cache_file = get_invariant_cache_file(task, balance_checker)
+        cached_invariants = domain_cache.load_cache_file(cache_file)
+        if cached_invariants is not None:
+            print("Using cached invariants %s" % cache_file)
+            yield from cached_invariants
+            return
+
     limit = options.invariant_generation_max_candidates
     candidates = deque(itertools.islice(get_initial_invariants(task), 0, limit))
     print(len(candidates), "initial candidates")
     seen_candidates = set(candidates)
 
-    balance_checker = BalanceChecker(task, reachable_action_params)
-
     def enqueue_func(invariant):
         if len(seen_candidates) < limit and invariant not in seen_candidates:
             candidates.append(invariant)
             seen_candidates.add(invariant)
 
+    if options.jobs > 1 and "fork" in multiprocessing.get_all_start_methods():
+        found_invariants = check_candidates_in_parallel(
+            candidates, balance_checker, enqueue_func, options.jobs)
+    else:
+        found_invariants = check_candidates(
+            candidates, balance_checker, enqueue_func)
+    invariants_to_cache = []
+    # The generators return whether they checked all candidates.
+    completed = yield from record(found_invariants, invariants_to_cache)
+    # If the time limit cuts the synthesis short, the invariants depend on
+    # the machine, so we do not cache them.
+    if cache_file is not None and completed:
+        domain_cache.save_cache_file(cache_file, invariants_to_cache)
+
+def record(generator, result):
+    """Yield the items of the generator and append them to result. Return
+    the return value of the generator."""
+    while True:
+        try:
+            item = next(generator)
+        except StopIteration as stop:
+            return stop.value
+        result.append(item)
+        yield item
+
+def check_candidates(candidates, balance_checker, enqueue_func):
     start_time = time.process_time()
     while candidates:
         candidate = candidates.popleft()
         if time.process_time() - start_time > options.invariant_generation_max_time:
             print("Time limit reached, aborting invariant generation")
-            return
+            return False
         if candidate.check_balance(balance_checker, enqueue_func):
             yield candidate
+    return True
+
+def init_worker(balance_checker):
+    global worker_balance_checker
+    worker_balance_checker = balance_checker
+
+def check_all_threats(candidate):
+    """Check the candidate against all threatening actions. For each
+    action, return None if it is balanced and the list of refined candidates
+    otherwise."""
+    results = []
+    for action in candidate.get_threats(worker_balance_checker):
+        refined_candidates = []
+        if candidate.check_action(worker_balance_checker, action,
+                                  refined_candidates.append):
+            results.append(None)
+        else:
+            results.append(refined_candidates)
+    return results
+
+def check_candidates_in_parallel(candidates, balance_checker, enqueue_func,
+                                 jobs):
+    """Check the queued candidates like find_invariants does, but check
+    each batch of candidates in a pool of processes.
+
+    In the serial check, the order in which check_balance draws the
+    actions from the random number generator determines which unbalanced
+    action refines the candidate. To find the same invariants, the workers
+    check all threatening actions and we replay the random order of the
+    serial check on their results. We merge the refined candidates back in
+    the order of the candidates."""
+    print("Checking invariant candidates with %d processes" % jobs)
+    start_time = time.perf_counter()
+    context = multiprocessing.get_context("fork")
+    with context.Pool(jobs, initializer=init_worker,
+                      initargs=(balance_checker,)) as pool:
+        while candidates:
+            batch = list(candidates)
+            candidates.clear()
+            chunksize = max(1, len(batch) // (4 * jobs))
+            for candidate, results in zip(
+                    batch, pool.imap(check_all_threats, batch, chunksize)):
+                if time.perf_counter() - start_time > options.invariant_generation_max_time:
+                    print("Time limit reached, aborting invariant generation")
+                    return False
+                indices = list(range(len(results)))
+                for index in invariants.draw_randomly(
+                        indices, balance_checker.random):
+                    refined_candidates = results[index]
+                    if refined_candidates is not None:
+                        for refined_candidate in refined_candidates:
+                            enqueue_func(refined_candidate)
+                        break
+                else:
+                    yield candidate
+    return True
 
 def useful_groups(invariants, initial_facts):
     predicate_to_invariants = defaultdict(list)
@@ -109,6 +109,20 @@ def ensure_inequality(system, literal1, literal2):
         system.add_inequality_disjunction(constraints.InequalityDisjunction(parts))
 
 
+def draw_randomly(items, rng):
+    """Yield the items of the list in random order, consuming it.
+
+    For a better expected perfomance, we want to randomize the order in
+    which actions are checked. Since candidates are often already
+    discarded by an early check, we do not want to shuffle the order but
+    instead always draw the next action randomly from those we did not yet
+    consider."""
+    while items:
+        pos = rng.randrange(len(items))
+        items[pos], items[-1] = items[-1], items[pos]
+        yield items.pop()
+
+
 class InvariantPart:
     def __init__(self, predicate, args, omitted_pos=None):
         """There is one InvariantPart for every predicate mentioned in the
@@ -318,6 +332,14 @@ class Invariant:
 
     def check_balance(self, balance_checker, enqueue_func):
         # Check balance for this hypothesis.
+        actions = self.get_threats(balance_checker)
+        for action in draw_randomly(actions, balance_checker.random):
+            if not self.check_action(balance_checker, action, enqueue_func):
+                return False
+        return True
+
+    def get_threats(self, balance_checker):
+        """Return the actions that add an atom of this invariant."""
         actions_to_check = dict()
         # We will only use the keys of the dictionary. We do not use a set
         # because it's not stable and introduces non-determinism in the
@@ -325,22 +347,16 @@ class Invariant:
         for part in sorted(self.parts):
             for a in balance_checker.get_threats(part.predicate):
                 actions_to_check[a] = True
+        return list(actions_to_check.keys())
 
-        actions = list(actions_to_check.keys())
-        while actions:
-            # For a better expected perfomance, we want to randomize the order
-            # in which actions are checked. Since candidates are often already
-            # discarded by an early check, we do not want to shuffle the order
-            # but instead always draw the next action randomly from those we
-            # did not yet consider.
-            pos = balance_checker.random.randrange(len(actions))
-            actions[pos], actions[-1] = actions[-1], actions[pos]
-            action = actions.pop()
-            heavy_action = balance_checker.get_heavy_action(action)
-            if self._operator_too_heavy(heavy_action):
-                return False
-            if self._operator_unbalanced(action, enqueue_func):
-                return False
+    def check_action(self, balance_checker, action, enqueue_func):
+        """Return whether the action is balanced for this hypothesis. If
+           it is not, pass the refined candidates to enqueue_func."""
+        heavy_action = balance_checker.get_heavy_action(action)
+        if self._operator_too_heavy(heavy_action):
+            return False
+        if self._operator_unbalanced(action, enqueue_func):
+            return False
         return True
 
     def _operator_too_heavy(self, h_action):
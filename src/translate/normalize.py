@@ -151,7 +151,7 @@ def all_conditions(task):
 # translated to NNF. The parameters of the new axioms are exactly the free
 # variables of <forall(vars, phi)>.
 
-def remove_universal_quantifiers(task):
+def remove_universal_quantifiers(task, new_axioms_by_condition):
     def recurse(condition):
         # Uses new_axioms_by_condition and type_map from surrounding scope.
         if isinstance(condition, pddl.UniversalCondition):
@@ -168,7 +168,6 @@ def remove_universal_quantifiers(task):
             new_parts = [recurse(part) for part in condition.parts]
             return condition.change_parts(new_parts)
 
-    new_axioms_by_condition = {}
     for proxy in tuple(all_conditions(task)):
         # Cannot use generator because we add new axioms on the fly.
         if proxy.condition.has_universal_part():
@@ -339,18 +338,62 @@ def substitute_complicated_goal(task):
 
 # Combine Steps [1], [2], [3], [4], [5] and do some additional verification
 # that the task makes sense.
+#
+# The actions and axioms of the domain can be normalized without knowing the
+# goal (see normalize_domain), which allows caching the normalized domain
+# (see domain_cache.py). Normalizing the goal afterwards (see normalize_goal)
+# yields the same task as normalizing everything at once.
+
+class DomainNormalization:
+    def __init__(self, new_axioms_by_condition, num_unsplit_axioms):
+        # Axioms for universal conditions, which the goal can reuse.
+        self.new_axioms_by_condition = new_axioms_by_condition
+        # Number of axioms before the ones added by splitting disjunctions.
+        self.num_unsplit_axioms = num_unsplit_axioms
+
+def normalize(task, domain_normalization=None):
+    if domain_normalization is None:
+        domain_normalization = normalize_domain(task)
+    normalize_goal(task, domain_normalization)
+    verify_axiom_predicates(task)
 
-def normalize(task):
-    remove_universal_quantifiers(task)
+def normalize_domain(task):
+    goal = task.goal
+    task.goal = pddl.Conjunction([])
+    new_axioms_by_condition = {}
+    num_unsplit_axioms = normalize_conditions(task, new_axioms_by_condition)
+    task.goal = goal
+    return DomainNormalization(new_axioms_by_condition, num_unsplit_axioms)
+
+def normalize_goal(task, domain_normalization):
+    # Only the goal and the axioms added for it need to be normalized.
+    actions, axioms = task.actions, task.axioms
+    task.actions, task.axioms = [], []
+    num_unsplit_axioms = normalize_conditions(
+        task, domain_normalization.new_axioms_by_condition)
+    # Normalizing everything at once would split all disjunctive axioms
+    # after adding the new axioms, so we restore that order.
+    goal_axioms = task.axioms
+    num_unsplit_domain_axioms = domain_normalization.num_unsplit_axioms
+    task.actions = actions
+    task.axioms = (axioms[:num_unsplit_domain_axioms] +
+                   goal_axioms[:num_unsplit_axioms] +
+                   axioms[num_unsplit_domain_axioms:] +
+                   goal_axioms[num_unsplit_axioms:])
+
+def normalize_conditions(task, new_axioms_by_condition):
+    remove_universal_quantifiers(task, new_axioms_by_condition)
     substitute_complicated_goal(task)
     build_DNF(task)
+    num_unsplit_axioms = sum(
+        not isinstance(axiom.condition, pddl.Disjunction)
+        for axiom in task.axioms)
     split_disjunctions(task)
     move_existential_quantifiers(task)
     eliminate_existential_quantifiers_from_axioms(task)
     eliminate_existential_quantifiers_from_preconditions(task)
     eliminate_existential_quantifiers_from_conditional_effects(task)
-
-    verify_axiom_predicates(task)
+    return num_unsplit_axioms
 
 def verify_axiom_predicates(task):
     # Verify that derived predicates are not used in :init or
@@ -108,6 +108,7 @@ class Action:
 
 
 class PropositionalAction:
+    __slots__ = ["name", "precondition", "add_effects", "del_effects", "cost"]
     def __init__(self, name: str, precondition: List[Literal], effects:
             List[Tuple[List[Literal], Literal]], cost: int):
         self.name = name
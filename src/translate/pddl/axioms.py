@@ -47,6 +47,7 @@ class Axiom:
 
 
 class PropositionalAxiom:
+    __slots__ = ["name", "condition", "effect"]
     def __init__(self, name: str, condition: List[Literal], effect: Atom):
         self.name = name
         self.condition = condition
@@ -7,11 +7,23 @@ from .pddl_types import TypedObject
 # based on a precomputed hash value.
 #
 # Careful: Most other classes (e.g. Effects, Axioms, Actions) are not!
+#
+# The translator keeps many literals alive at once (e.g. the model atoms
+# and the conditions and effects of the ground actions), so Literal and its
+# subclasses use __slots__ instead of an instance __dict__. This requires
+# empty __slots__ in Condition; the other conditions still have a __dict__.
+#
+# The precomputed hash values depend on the hash seed of the process, so
+# conditions are pickled by their constructor arguments (see __reduce__),
+# which recomputes the hash values when they are unpickled.
 
 class Condition:
+    __slots__ = []
     def __init__(self, parts: List["Condition"]):
         self.parts = tuple(parts)
         self.hash = hash((self.__class__, self.parts))
+    def __reduce__(self):
+        return (self.__class__, (self.parts,))
     def __hash__(self):
         return self.hash
     def __ne__(self, other):
@@ -79,6 +91,8 @@ class ConstantCondition(Condition):
     parts = ()
     def __init__(self):
         self.hash = hash(self.__class__)
+    def __reduce__(self):
+        return (self.__class__, ())
     def change_parts(self, parts):
         return self
     def __eq__(self, other):
@@ -168,6 +182,8 @@ class QuantifiedCondition(Condition):
         self.parameters = tuple(parameters)
         self.parts = tuple(parts)
         self.hash = hash((self.__class__, self.parameters, self.parts))
+    def __reduce__(self):
+        return (self.__class__, (self.parameters, self.parts))
     def __eq__(self, other):
         # Compare hash first for speed reasons.
         return (self.hash == other.hash and
@@ -230,6 +246,8 @@ class Literal(Condition):
         self.predicate = predicate
         self.args = tuple(args)
         self.hash = hash((self.__class__, self.predicate, self.args))
+    def __reduce__(self):
+        return (self.__class__, (self.predicate, self.args))
     def __eq__(self, other):
         # Compare hash first for speed reasons.
         return (self.hash == other.hash and
@@ -267,6 +285,7 @@ class Literal(Condition):
         return {arg for arg in self.args if arg[0] == "?"}
 
 class Atom(Literal):
+    __slots__ = []
     negated = False
     def to_untyped_strips(self):
         return [self]
@@ -283,6 +302,7 @@ class Atom(Literal):
         return self
 
 class NegatedAtom(Literal):
+    __slots__ = []
     negated = True
     def _relaxed(self, parts):
         return Truth()
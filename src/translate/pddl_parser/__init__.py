@@ -1,2 +1,2 @@
 from .parse_error import ParseError
-from .pddl_file import open
+from .pddl_file import open, parse
@@ -1,41 +1,55 @@
 __all__ = ["parse_nested_list"]
 
+import io
+import re
+import sys
+
 from .parse_error import ParseError
 
+COMMENT_REGEX = re.compile(r";.*")
+
 # Basic functions for parsing PDDL (Lisp) files.
 def parse_nested_list(input_file):
-    tokens = tokenize(input_file)
-    next_token = next(tokens)
+    tokens = iter(tokenize(input_file))
+    next_token = next(tokens, None)
+    if next_token is None:
+        raise ParseError("Expected '(', got end of file.")
     if next_token != "(":
         raise ParseError(f"Expected '(', got '{next_token}'.")
-    result = list(parse_list_aux(tokens))
-    remaining_tokens = list(tokens)
-    if remaining_tokens:
-        raise ParseError(f"Tokens remaining after parsing: "
-                         f"{' '.join(remaining_tokens)}")
-    return result
-
-def tokenize(input):
-    for line in input:
-        line = line.split(";", 1)[0]  # Strip comments.
-        try:
-            line.encode("ascii")
-        except UnicodeEncodeError:
-            raise ParseError(f"Non-ASCII character outside comment: {line[0:-1]}")
-        line = line.replace("(", " ( ").replace(")", " ) ").replace("?", " ?")
-        for token in line.split():
-            yield token.lower()
-
-def parse_list_aux(tokenstream):
-    # Leading "(" has already been swallowed.
-    while True:
-        try:
-            token = next(tokenstream)
-        except StopIteration:
-            raise ParseError("Missing ')'")
-        if token == ")":
-            return
-        elif token == "(":
-            yield list(parse_list_aux(tokenstream))
+    # Build the nested list iteratively with an explicit stack of the
+    # enclosing lists, so that deep nesting cannot exceed the recursion limit.
+    stack = []
+    current = []
+    for token in tokens:
+        if token == "(":
+            sublist = []
+            current.append(sublist)
+            stack.append(current)
+            current = sublist
+        elif token == ")":
+            if not stack:
+                remaining_tokens = list(tokens)
+                if remaining_tokens:
+                    raise ParseError(f"Tokens remaining after parsing: "
+                                     f"{' '.join(remaining_tokens)}")
+                return current
+            current = stack.pop()
         else:
-            yield token
+            current.append(token)
+    raise ParseError("Missing ')'")
+
+def tokenize(input_file):
+    # Tokenize the whole file at once: stripping the comments and splitting
+    # the complete text is much faster than processing it line by line.
+    text = COMMENT_REGEX.sub("", input_file.read())
+    if not text.isascii():
+        for line in io.StringIO(text):
+            if not line.isascii():
+                raise ParseError(
+                    f"Non-ASCII character outside comment: {line[0:-1]}")
+    text = text.lower().replace("(", " ( ").replace(")", " ) ").replace("?", " ?")
+    # Intern all names, so that the many occurrences of the same
+    # object or predicate share one string. Comparing and hashing
+    # tuples of them (e.g. when building the model) then mostly
+    # reduces to identity checks and cached string hashes.
+    return list(map(sys.intern, text.split()))
@@ -624,24 +624,41 @@ def parse_init(context, alist):
 
 
 def parse_task(domain_pddl, task_pddl):
+    domain, type_dict, predicate_dict = parse_domain(domain_pddl)
+    return parse_task_with_domain(domain, type_dict, predicate_dict, task_pddl)
+
+
+def parse_domain(domain_pddl):
+    """Return the domain as a task with the constants as objects, an empty
+    initial state and an empty goal, together with the type and predicate
+    dictionaries needed for parsing tasks of the domain."""
     context = Context()
     if not isinstance(domain_pddl, list):
         context.error("Invalid definition of a PDDL domain.")
-    domain_name, domain_requirements, types, type_dict, constants, predicates, \
+    domain_name, requirements, types, type_dict, constants, predicates, \
         predicate_dict, functions, actions, axioms = parse_domain_pddl(context, domain_pddl)
+    domain = pddl.Task(
+        domain_name, None, requirements, types, constants, predicates,
+        functions, [], pddl.Conjunction([]), actions, axioms, False)
+    return domain, type_dict, predicate_dict
+
+
+def parse_task_with_domain(domain, type_dict, predicate_dict, task_pddl):
+    """Complete the domain returned by parse_domain to the given task."""
+    context = Context()
     if not isinstance(task_pddl, list):
         context.error("Invalid definition of a PDDL task.")
     task_name, task_domain_name, task_requirements, objects, init, goal, \
         use_metric = parse_task_pddl(context, task_pddl, type_dict, predicate_dict)
 
-    if domain_name != task_domain_name:
+    if domain.domain_name != task_domain_name:
         context.error(f"The domain name specified by the task "
                       f"({task_domain_name}) does not match the name specified "
-                      f"by the domain file ({domain_name}).")
+                      f"by the domain file ({domain.domain_name}).")
     requirements = pddl.Requirements(sorted(set(
-                domain_requirements.requirements +
+                domain.requirements.requirements +
                 task_requirements.requirements)))
-    objects = constants + objects
+    objects = domain.objects + objects
     check_for_duplicates(
         context,
         [o.name for o in objects],
@@ -649,9 +666,13 @@ def parse_task(domain_pddl, task_pddl):
         finalmsg="please check :constants and :objects definitions")
     init += [pddl.Atom("=", (obj.name, obj.name)) for obj in objects]
 
-    return pddl.Task(
-        domain_name, task_name, requirements, types, objects,
-        predicates, functions, init, goal, actions, axioms, use_metric)
+    domain.task_name = task_name
+    domain.requirements = requirements
+    domain.objects = objects
+    domain.init = init
+    domain.goal = goal
+    domain.use_min_cost_metric = use_metric
+    return domain
 
 
 def parse_domain_pddl(context, domain_pddl):
@@ -1,3 +1,5 @@
+import io
+
 from . import lisp_parser
 from . import parse_error
 from . import parsing_functions
@@ -22,14 +24,22 @@ def parse_pddl_file(type, filename):
                          (type, filename, e))
 
 
+def parse_pddl_text(type, text):
+    try:
+        return lisp_parser.parse_nested_list(io.StringIO(text))
+    except parse_error.ParseError as e:
+        raise parse_error.ParseError("Error: Could not parse %s: %s" %
+                                     (type, e))
+
+
 def open(domain_filename=None, task_filename=None):
     if domain_filename is None or task_filename is None:
-        # Importing options triggers parsing the problem and domain file names
-        # as arguments from the command line. We don't import unconditionally
-        # at the head of this file because open is exposed in __init__.py
-        # and as a result importing anything of the pddl_parser package in
-        # external code would then trigger this arg parse.
+        # Take the missing file names from the command line. We only import
+        # the translator options here, so that the pddl_parser package can
+        # be used without them.
         import options
+        if options.domain is None:
+            options.setup()
         domain_filename = domain_filename or options.domain
         task_filename = task_filename or options.task
 
@@ -37,3 +47,11 @@ def open(domain_filename=None, task_filename=None):
     task_pddl = parse_pddl_file("task", task_filename)
 
     return parsing_functions.parse_task(domain_pddl, task_pddl)
+
+
+def parse(domain_text, task_text):
+    """Parse a task from the PDDL texts of its domain and task files."""
+    domain_pddl = parse_pddl_text("domain", domain_text)
+    task_pddl = parse_pddl_text("task", task_text)
+
+    return parsing_functions.parse_task(domain_pddl, task_pddl)
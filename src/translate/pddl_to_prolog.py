@@ -6,23 +6,37 @@ import itertools
 import copy
 
 import normalize
+import options
 import pddl
 import timers
 
 class PrologProgram:
-    def __init__(self):
+    def __init__(self, new_name=None):
         self.facts = []
         self.rules = []
         self.objects = set()
         def predicate_name_generator():
             for count in itertools.count():
                 yield "p$%d" % count
-        self.new_name = predicate_name_generator()
+        if new_name is None:
+            new_name = predicate_name_generator()
+        self.new_name = new_name
     def add_fact(self, atom):
         self.facts.append(Fact(atom))
         self.objects |= set(atom.args)
     def add_rule(self, rule):
         self.rules.append(rule)
+    def add_program(self, other):
+        """Add the facts and rules of another normalized and split program.
+        Both programs must have been generated with the same name
+        generator so that their auxiliary predicates are distinct."""
+        assert other.new_name is self.new_name
+        known_facts = {fact.atom for fact in self.facts}
+        for fact in other.facts:
+            if fact.atom not in known_facts:
+                known_facts.add(fact.atom)
+                self.add_fact(fact.atom)
+        self.rules += other.rules
     def dump(self, file=None):
         for fact in self.facts:
             print(fact, file=file)
@@ -41,15 +55,23 @@ class PrologProgram:
         for rule in self.rules:
             if not rule.conditions:
                 self.add_fact(rule.effect)
-    def split_rules(self):
+    def split_rules(self, join_order="greedy"):
+        import greedy_join
         import split_rules
         # Splits rules whose conditions can be partitioned in such a way that
         # the parts have disjoint variable sets, then split n-ary joins into
         # a number of binary joins, introducing new pseudo-predicates for the
         # intermediate values.
+        if join_order == "cardinality":
+            relation_sizes = greedy_join.RelationSizes(self)
+        else:
+            relation_sizes = None
         new_rules = []
         for rule in self.rules:
-            new_rules += split_rules.split_rule(rule, self.new_name)
+            for new_rule in split_rules.split_rule(
+                    rule, self.new_name, relation_sizes):
+                new_rule.origin = rule.origin
+                new_rules.append(new_rule)
         self.rules = new_rules
     def remove_free_effect_variables(self):
         """Remove free effect variables like the variable Y in the rule
@@ -116,6 +138,16 @@ class PrologProgram:
         join eff_1(?x) :- p(?x, ?b), r(?x).
         join eff_2(?x) :- p(?x, ?b), r(?x).
 
+        The axiom predicates are removed in the same way, with weight 0,
+        so that the derived atoms become effects of relaxed operators.
+        Rules of conditional effects keep their effect conditions:
+
+        join eff_3(?y) :- action_a(?x, ?b), q(?b, ?y).
+
+        becomes
+
+        join eff_3(?y) :- p(?x, ?b), r(?x), q(?b, ?y).
+
         This *needs* to be made before the renaming.
         '''
 
@@ -130,19 +162,25 @@ class PrologProgram:
                     if hex(action_id) in rule_name:
                         r.weight = cost
                 action_rules[rule_name] = r
+            elif isinstance(r.effect.predicate, pddl.Axiom):
+                action_rules[rule_name] = r
             else:
                 non_action_rules.append(r)
 
         final_rules = []
         for r in non_action_rules:
-            if len(r.conditions) == 1:
-                condition_name = str(r.conditions[0])
-                if condition_name in action_rules.keys():
-                    new_action_rule = copy.deepcopy(action_rules[condition_name])
-                    new_action_rule.effect = r.effect
-                    final_rules.append(new_action_rule)
-                else:
-                    final_rules.append(r)
+            # The action or axiom atom is the first condition.
+            condition_name = str(r.conditions[0]) if r.conditions else None
+            if condition_name in action_rules:
+                new_action_rule = copy.deepcopy(action_rules[condition_name])
+                new_action_rule.effect = r.effect
+                effect_conditions = r.conditions[1:]
+                if effect_conditions:
+                    rename_local_variables(
+                        new_action_rule, r.conditions[0].args,
+                        get_variables(effect_conditions + [r.effect]))
+                    new_action_rule.conditions += effect_conditions
+                final_rules.append(new_action_rule)
             else:
                 final_rules.append(r)
         self.rules = final_rules
@@ -177,7 +215,8 @@ class PrologProgram:
                     num_free_vars += increase
                 else:
                     new_effect.append(e)
-            rule.effect.args = tuple(new_effect)
+            rule.effect = rule.effect.__class__(
+                rule.effect.predicate, new_effect)
             for index, c in enumerate(rule.conditions):
                 new_condition = []
                 for a in c.args:
@@ -187,7 +226,8 @@ class PrologProgram:
                         num_free_vars += increase
                     else:
                         new_condition.append(a)
-                rule.conditions[index].args = tuple(new_condition)
+                rule.conditions[index] = c.__class__(
+                    c.predicate, new_condition)
             new_rules.append(rule)
         self.rules = new_rules
 
@@ -221,8 +261,8 @@ class PrologProgram:
                 for i, c in enumerate(rule.conditions):
                     pred_symb = str(c.predicate)
                     if pred_symb in equivalence.keys():
-                        new_cond = c
-                        new_cond.predicate = equivalence[pred_symb]
+                        new_cond = c.__class__(
+                            equivalence[pred_symb], c.args)
                         number_removed += 1
                         #print("Replace %s by %s" % (pred_symb, equivalence[pred_symb]))
                         rule.conditions[i] = new_cond
@@ -237,6 +277,20 @@ def get_variables(symbolic_atoms):
         variables |= {arg for arg in sym_atom.args if arg[0] == "?"}
     return variables
 
+def rename_local_variables(rule, head_args, used_variables):
+    """Rename the variables of the rule conditions that do not occur in
+    head_args if they occur in used_variables."""
+    renaming = {}
+    for var in sorted(get_variables(rule.conditions) - set(head_args)):
+        if var in used_variables:
+            num = 0
+            while "%s@%d" % (var, num) in used_variables:
+                num += 1
+            renaming[var] = "%s@%d" % (var, num)
+    if renaming:
+        rule.conditions = [atom.rename_variables(renaming)
+                           for atom in rule.conditions]
+
 def instantiate_costs(task):
         costs = []
         init_assignments = {}
@@ -259,8 +313,9 @@ def instantiate_costs(task):
 def remove_duplicate_preconditions_in_actions(task):
     for action in task.actions:
         if isinstance(action.precondition, pddl.Conjunction):
-            action.precondition.parts = tuple([condition for index, condition in enumerate(action.precondition.parts) 
-                                               if condition not in action.precondition.parts[:index]])
+            action.precondition = pddl.Conjunction(
+                [condition for index, condition in enumerate(action.precondition.parts)
+                 if condition not in action.precondition.parts[:index]])
 
 class Fact:
     def __init__(self, atom):
@@ -269,10 +324,13 @@ class Fact:
         return "%s." % self.atom
 
 class Rule:
-    def __init__(self, conditions, effect, weight=0):
+    def __init__(self, conditions, effect, weight=0, origin=None):
         self.conditions = conditions
         self.effect = effect
         self.weight = weight
+        # The action, axiom or goal that the rule was built for (see
+        # get_rule_origin). Rules split from a rule share its origin.
+        self.origin = origin
     def add_condition(self, condition):
         self.conditions.append(condition)
     def get_variables(self):
@@ -306,6 +364,29 @@ class Rule:
         cond_str = ", ".join(map(str, self.conditions))
         return "%s :- %s." % (self.effect, cond_str)
 
+def get_predicate_name(predicate):
+    # The predicates of the applicability rules are the actions and axioms.
+    if isinstance(predicate, (pddl.Action, pddl.Axiom)):
+        return "<%s %s>" % (type(predicate).__name__.lower(), predicate.name)
+    return str(predicate)
+
+def get_atom_string(atom):
+    return "%s(%s)" % (get_predicate_name(atom.predicate), ", ".join(atom.args))
+
+def get_rule_string(rule):
+    return "%s :- %s." % (get_atom_string(rule.effect),
+                          ", ".join(map(get_atom_string, rule.conditions)))
+
+def get_rule_origin(conditions, effect):
+    """Describe the action, axiom or goal of a rule built by
+    normalize.build_exploration_rules."""
+    for atom in [effect] + conditions[:1]:
+        if isinstance(atom.predicate, (pddl.Action, pddl.Axiom)):
+            return get_predicate_name(atom.predicate)
+    if effect.predicate == "@goal-reachable":
+        return "<goal>"
+    return None
+
 def translate_typed_object(prog, obj, type_dict):
     supertypes = type_dict[obj.type_name].supertype_names
     for type_name in [obj.type_name] + supertypes:
@@ -324,18 +405,21 @@ def translate_facts(prog, task):
             # fact.fluent has been defined.
             prog.add_fact(normalize.get_pne_definition_predicate(fact.fluent))
 
-def translate(task):
+def translate(task, new_name=None):
     # Note: The function requires that the task has been normalized.
+    # Pass the name generator of another program as new_name to combine
+    # both programs with PrologProgram.add_program.
     with timers.timing("Generating Datalog program"):
-        prog = PrologProgram()
+        prog = PrologProgram(new_name)
         translate_facts(prog, task)
         for conditions, effect in normalize.build_exploration_rules(task):
-            prog.add_rule(Rule(conditions, effect))
+            prog.add_rule(Rule(conditions, effect,
+                               origin=get_rule_origin(conditions, effect)))
     with timers.timing("Normalizing Datalog program", block=True):
         # Using block=True because normalization can output some messages
         # in rare cases.
         prog.normalize()
-        prog.split_rules()
+        prog.split_rules(options.join_order)
     return prog
 
 def translate_optimize(task):
@@ -343,9 +427,12 @@ def translate_optimize(task):
     prog = PrologProgram()
     translate_facts(prog, task)
     for conditions, effect in normalize.build_exploration_rules(task):
-        prog.add_rule(Rule(conditions, effect))
+        prog.add_rule(Rule(conditions, effect,
+                           origin=get_rule_origin(conditions, effect)))
     prog.remove_action_predicates(task)
     prog.normalize()
+    # The split rules become the relaxed operators, so the join order
+    # determines the relaxation heuristics. Keep the greedy order.
     prog.split_rules()
     prog.rename_free_variables()
     prog.remove_duplicated_rules()
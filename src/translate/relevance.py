@@ -0,0 +1,190 @@
+"""Backward relevance analysis on the relaxed model.
+
+The relaxed model contains an atom for every reachable instantiation of
+the actions and axioms of a normalized task. Starting from the goal, we
+mark as relevant all atoms that can influence the goal:
+
+- The atoms of the goal are relevant.
+- An action or axiom instantiation is relevant if one of its effects adds
+  or deletes a relevant atom. (We include deletes because relevant
+  conditions may be negative.)
+- The atoms in the preconditions and effect conditions of relevant
+  instantiations are relevant.
+
+The parameters of universal effects are not bound by the action atoms of
+the model, so effects and effect conditions that mention them are
+patterns. An effect pattern matches every atom that agrees with it on the
+bound arguments. To keep the analysis simple, a condition pattern makes
+all atoms of its predicate relevant.
+
+Instantiations that are not relevant cannot contribute to reaching the
+goal, so instantiate can skip them. This is a ground variant of the
+relevance analysis that variable_order performs on the causal graph after
+the translation."""
+
+from collections import defaultdict
+import operator
+
+import pddl
+
+
+def get_literals(condition):
+    """Yield the literals of a normalized condition."""
+    if isinstance(condition, pddl.Literal):
+        yield condition
+    else:
+        for part in condition.parts:
+            yield from get_literals(part)
+
+
+class Template:
+    """A literal of an action or axiom, compiled for instantiating it
+    quickly with the arguments of its atoms in the model. Its arguments
+    are taken from the atom arguments followed by the constants of the
+    action or axiom. The positions of the variables that the atom does not
+    bind, i.e., the parameters of universal effects, are left out."""
+    def __init__(self, literal, parameters, constants):
+        self.predicate = literal.predicate
+        self.arity = len(literal.args)
+        parameter_indices = {par.name: index
+                             for index, par in enumerate(parameters)}
+        self.positions = []
+        self.indices = []
+        for pos, arg in enumerate(literal.args):
+            if arg in parameter_indices:
+                index = parameter_indices[arg]
+            elif arg[0] == "?":
+                continue
+            else:
+                if arg not in constants:
+                    constants[arg] = len(parameters) + len(constants)
+                index = constants[arg]
+            self.positions.append(pos)
+            self.indices.append(index)
+        self.positions = tuple(self.positions)
+        self.is_ground = len(self.positions) == self.arity
+        # get_key(values) returns the arguments at the bound positions.
+        if len(self.indices) == 1:
+            index, = self.indices
+            self.get_key = lambda values: (values[index],)
+        elif self.indices:
+            self.get_key = operator.itemgetter(*self.indices)
+        else:
+            self.get_key = lambda values: ()
+
+
+class CompiledAchiever:
+    """The effect and condition templates of an action or axiom."""
+    def __init__(self, predicate):
+        if isinstance(predicate, pddl.Action):
+            parameters = predicate.parameters
+            effects = [effect.literal for effect in predicate.effects]
+            conditions = list(get_literals(predicate.precondition))
+            for effect in predicate.effects:
+                conditions += get_literals(effect.condition)
+        else:
+            parameters = predicate.parameters
+            effects = [pddl.Atom(predicate.name, [
+                par.name for par in
+                parameters[:predicate.num_external_parameters]])]
+            conditions = list(get_literals(predicate.condition))
+        constants = {}
+        self.effects = [Template(literal, parameters, constants)
+                        for literal in effects]
+        # Different literals with the same atom have the same template.
+        conditions = {(literal.predicate, literal.args): literal
+                      for literal in conditions}
+        self.conditions = [Template(literal, parameters, constants)
+                           for literal in conditions.values()]
+        self.constants = tuple(constants)
+
+    def get_values(self, atom):
+        if self.constants:
+            return atom.args + self.constants
+        return atom.args
+
+
+class RelevanceAnalysis:
+    """Index of the action and axiom atoms of the model (the achievers) by
+    the atoms they can add or delete."""
+    def __init__(self, model):
+        self.atoms_by_predicate = defaultdict(list)
+        for atom in model:
+            if isinstance(atom.predicate, (pddl.Action, pddl.Axiom)):
+                self.atoms_by_predicate[atom.predicate].append(atom)
+        self.compiled = {predicate: CompiledAchiever(predicate)
+                         for predicate in self.atoms_by_predicate}
+        # Achievers by ground effect atom.
+        self.achievers = defaultdict(list)
+        # Achievers by predicate, bound positions and bound arguments of
+        # their effect patterns.
+        self.pattern_achievers = defaultdict(lambda: defaultdict(
+            lambda: defaultdict(list)))
+        # Actions and axioms by the predicates they can add or delete.
+        self.effect_predicates = defaultdict(set)
+        for predicate, atoms in self.atoms_by_predicate.items():
+            compiled = self.compiled[predicate]
+            values = [compiled.get_values(atom) for atom in atoms]
+            for template in compiled.effects:
+                self.effect_predicates[template.predicate].add(predicate)
+                if template.is_ground:
+                    index = self.achievers
+                    effect_predicate = template.predicate
+                    for atom, atom_values in zip(atoms, values):
+                        index[effect_predicate, template.get_key(
+                            atom_values)].append(atom)
+                else:
+                    index = self.pattern_achievers[template.predicate][
+                        template.positions]
+                    for atom, atom_values in zip(atoms, values):
+                        index[template.get_key(atom_values)].append(atom)
+        self.relevant_atoms = set()
+        self.relevant_predicates = set()
+        self.relevant_achievers = set()
+        self.queue = []
+
+    def mark_atom_relevant(self, predicate, args):
+        if (predicate in self.relevant_predicates or
+                (predicate, args) in self.relevant_atoms):
+            return
+        self.relevant_atoms.add((predicate, args))
+        self.mark_achievers_relevant(self.achievers.get((predicate, args), []))
+        for positions, index in self.pattern_achievers.get(
+                predicate, {}).items():
+            key = tuple(map(args.__getitem__, positions))
+            self.mark_achievers_relevant(index.get(key, []))
+
+    def mark_predicate_relevant(self, predicate):
+        if predicate not in self.relevant_predicates:
+            self.relevant_predicates.add(predicate)
+            for achiever_predicate in self.effect_predicates.get(
+                    predicate, []):
+                self.mark_achievers_relevant(
+                    self.atoms_by_predicate[achiever_predicate])
+
+    def mark_achievers_relevant(self, achievers):
+        for achiever in achievers:
+            if achiever not in self.relevant_achievers:
+                self.relevant_achievers.add(achiever)
+                self.queue.append(achiever)
+
+    def run(self, goal):
+        for literal in get_literals(goal):
+            self.mark_atom_relevant(literal.predicate, literal.args)
+        while self.queue:
+            achiever = self.queue.pop()
+            compiled = self.compiled[achiever.predicate]
+            values = compiled.get_values(achiever)
+            for template in compiled.conditions:
+                if template.is_ground:
+                    self.mark_atom_relevant(
+                        template.predicate, template.get_key(values))
+                else:
+                    self.mark_predicate_relevant(template.predicate)
+        return self.relevant_achievers
+
+
+def compute_relevant_achievers(task, model):
+    """Return the set of action and axiom atoms of the model that are
+    relevant for the goal of the normalized task."""
+    return RelevanceAnalysis(model).run(task.goal)
@@ -4,6 +4,11 @@ SAS_FILE_VERSION = 3
 
 DEBUG = False
 
+# The output methods build the text of each element with str.join and
+# write the operators and axioms in chunks of this many elements, which
+# is much faster than printing each number separately.
+OUTPUT_CHUNK_SIZE = 1000
+
 VarValPair = Tuple[int, int]
 
 class SASTask:
@@ -85,24 +90,14 @@ class SASTask:
         print("metric: %s" % self.metric)
 
     def output(self, stream):
-        print("begin_version", file=stream)
-        print(SAS_FILE_VERSION, file=stream)
-        print("end_version", file=stream)
-        print("begin_metric", file=stream)
-        print(int(self.metric), file=stream)
-        print("end_metric", file=stream)
+        stream.write("begin_version\n%d\nend_version\n" % SAS_FILE_VERSION)
+        stream.write("begin_metric\n%d\nend_metric\n" % int(self.metric))
         self.variables.output(stream)
-        print(len(self.mutexes), file=stream)
-        for mutex in self.mutexes:
-            mutex.output(stream)
+        output_elements(self.mutexes, stream)
         self.init.output(stream)
         self.goal.output(stream)
-        print(len(self.operators), file=stream)
-        for op in self.operators:
-            op.output(stream)
-        print(len(self.axioms), file=stream)
-        for axiom in self.axioms:
-            axiom.output(stream)
+        output_elements(self.operators, stream)
+        output_elements(self.axioms, stream)
 
     def get_encoding_size(self):
         task_size = 0
@@ -117,6 +112,15 @@ class SASTask:
         return task_size
 
 
+def output_elements(elements, stream):
+    """Write the number of elements followed by their output text."""
+    stream.write("%d\n" % len(elements))
+    for start in range(0, len(elements), OUTPUT_CHUNK_SIZE):
+        stream.write("".join(
+            element.get_output_text()
+            for element in elements[start:start + OUTPUT_CHUNK_SIZE]))
+
+
 class SASVariables:
     def __init__(self, ranges: List[int], axiom_layers: List[int],
                  value_names: List[List[str]]) -> None:
@@ -166,17 +170,18 @@ class SASVariables:
             print("v%d in {%s}%s" % (var, list(range(rang)), axiom_str))
 
     def output(self, stream):
-        print(len(self.ranges), file=stream)
+        lines = [str(len(self.ranges))]
         for var, (rang, axiom_layer, values) in enumerate(zip(
                 self.ranges, self.axiom_layers, self.value_names)):
-            print("begin_variable", file=stream)
-            print("var%d" % var, file=stream)
-            print(axiom_layer, file=stream)
-            print(rang, file=stream)
+            lines.append("begin_variable")
+            lines.append("var%d" % var)
+            lines.append(str(axiom_layer))
+            lines.append(str(rang))
             assert rang == len(values), (rang, values)
-            for value in values:
-                print(value, file=stream)
-            print("end_variable", file=stream)
+            lines.extend(map(str, values))
+            lines.append("end_variable")
+        lines.append("")
+        stream.write("\n".join(lines))
 
     def get_encoding_size(self):
         # A variable with range k has encoding size k + 1 to also give the
@@ -200,11 +205,13 @@ class SASMutexGroup:
             print("v%d: %d" % (var, val))
 
     def output(self, stream):
-        print("begin_mutex_group", file=stream)
-        print(len(self.facts), file=stream)
-        for var, val in self.facts:
-            print(var, val, file=stream)
-        print("end_mutex_group", file=stream)
+        stream.write(self.get_output_text())
+
+    def get_output_text(self):
+        lines = ["begin_mutex_group", str(len(self.facts))]
+        lines.extend("%s %s" % (var, val) for var, val in self.facts)
+        lines.append("end_mutex_group\n")
+        return "\n".join(lines)
 
     def get_encoding_size(self):
         return len(self.facts)
@@ -230,10 +237,10 @@ class SASInit:
             print("v%d: %d" % (var, val))
 
     def output(self, stream):
-        print("begin_state", file=stream)
-        for val in self.values:
-            print(val, file=stream)
-        print("end_state", file=stream)
+        lines = ["begin_state"]
+        lines.extend(map(str, self.values))
+        lines.append("end_state\n")
+        stream.write("\n".join(lines))
 
 
 class SASGoal:
@@ -250,11 +257,10 @@ class SASGoal:
             print("v%d: %d" % (var, val))
 
     def output(self, stream):
-        print("begin_goal", file=stream)
-        print(len(self.pairs), file=stream)
-        for var, val in self.pairs:
-            print(var, val, file=stream)
-        print("end_goal", file=stream)
+        lines = ["begin_goal", str(len(self.pairs))]
+        lines.extend("%s %s" % (var, val) for var, val in self.pairs)
+        lines.append("end_goal\n")
+        stream.write("\n".join(lines))
 
     def get_encoding_size(self):
         return len(self.pairs)
@@ -368,19 +374,19 @@ class SASOperator:
             print("  v%d: %d -> %d%s" % (var, pre, post, cond_str))
 
     def output(self, stream):
-        print("begin_operator", file=stream)
-        print(self.name[1:-1], file=stream)
-        print(len(self.prevail), file=stream)
-        for var, val in self.prevail:
-            print(var, val, file=stream)
-        print(len(self.pre_post), file=stream)
+        stream.write(self.get_output_text())
+
+    def get_output_text(self):
+        lines = ["begin_operator", self.name[1:-1], str(len(self.prevail))]
+        lines.extend("%s %s" % (var, val) for var, val in self.prevail)
+        lines.append(str(len(self.pre_post)))
         for var, pre, post, cond in self.pre_post:
-            print(len(cond), end=' ', file=stream)
-            for cvar, cval in cond:
-                print(cvar, cval, end=' ', file=stream)
-            print(var, pre, post, file=stream)
-        print(self.cost, file=stream)
-        print("end_operator", file=stream)
+            cond_text = "".join(
+                "%s %s " % (cvar, cval) for cvar, cval in cond)
+            lines.append("%d %s%s %s %s" % (len(cond), cond_text, var, pre, post))
+        lines.append(str(self.cost))
+        lines.append("end_operator\n")
+        return "\n".join(lines)
 
     def get_encoding_size(self):
         size = 1 + len(self.prevail)
@@ -476,13 +482,15 @@ class SASAxiom:
         print("  v%d: %d" % (var, val))
 
     def output(self, stream):
-        print("begin_rule", file=stream)
-        print(len(self.condition), file=stream)
-        for var, val in self.condition:
-            print(var, val, file=stream)
+        stream.write(self.get_output_text())
+
+    def get_output_text(self):
+        lines = ["begin_rule", str(len(self.condition))]
+        lines.extend("%s %s" % (var, val) for var, val in self.condition)
         var, val = self.effect
-        print(var, 1 - val, val, file=stream)
-        print("end_rule", file=stream)
+        lines.append("%s %s %s" % (var, 1 - val, val))
+        lines.append("end_rule\n")
+        return "\n".join(lines)
 
     def get_encoding_size(self):
         return 1 + len(self.condition)
@@ -28,7 +28,7 @@ def project_rule(rule, conditions, name_generator):
     projected_rule = Rule(conditions, effect)
     return projected_rule
 
-def split_rule(rule, name_generator):
+def split_rule(rule, name_generator, relation_sizes=None):
     # Capture original rule weight
     weight = rule.weight
 
@@ -46,13 +46,14 @@ def split_rule(rule, name_generator):
 
     components = get_connected_conditions(important_conditions)
     if len(components) == 1 and not trivial_conditions:
-        return split_into_binary_rules(rule, name_generator)
+        return split_into_binary_rules(rule, name_generator, relation_sizes)
 
     projected_rules = [project_rule(rule, conditions, name_generator)
                        for conditions in components]
     result = []
     for proj_rule in projected_rules:
-        result += split_into_binary_rules(proj_rule, name_generator)
+        result += split_into_binary_rules(
+            proj_rule, name_generator, relation_sizes)
 
     conditions = ([proj_rule.effect for proj_rule in projected_rules] +
                   trivial_conditions)
@@ -68,11 +69,11 @@ def split_rule(rule, name_generator):
 
     return result
 
-def split_into_binary_rules(rule, name_generator):
+def split_into_binary_rules(rule, name_generator, relation_sizes=None):
     if len(rule.conditions) <= 1:
         rule.type = "project"
         return [rule]
-    rules =  greedy_join.greedy_join(rule, name_generator)
+    rules = greedy_join.greedy_join(rule, name_generator, relation_sizes)
     # Last rule is always the "root" rule. Its weight should be updated
     rules[-1].weight = rule.weight
     return rules
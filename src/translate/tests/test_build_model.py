@@ -0,0 +1,109 @@
+import itertools
+import json
+import os.path
+import re
+import subprocess
+import sys
+
+import build_model
+import pddl
+import pddl_to_prolog
+
+DIR = os.path.dirname(os.path.abspath(__file__))
+TRANSLATE_DIR = os.path.dirname(DIR)
+REPO = os.path.abspath(os.path.join(DIR, "..", "..", ".."))
+BENCHMARKS = os.path.join(REPO, "misc", "tests", "benchmarks")
+TASKS = [
+    ("gripper", "prob01.pddl"),
+    ("miconic-simpleadl", "s1-0.pddl"),
+    ("philosophers", "p01-phil2.pddl"),
+]
+
+def translate(domain, problem, sas_file, *extra_options,
+              relaxation_operators_file=None):
+    """Return the SAS output of the translator. If relaxation_operators_file
+    is given, return the text export of the relaxed operators as well."""
+    translator = os.path.join(TRANSLATE_DIR, "translate.py")
+    domain_file = os.path.join(BENCHMARKS, domain, "domain.pddl")
+    problem_file = os.path.join(BENCHMARKS, domain, problem)
+    if relaxation_operators_file is None:
+        export_options = ["--skip-relaxation-operators"]
+    else:
+        export_options = [
+            "--relaxation-operators-format", "text",
+            "--relaxation-operators-file", str(relaxation_operators_file)]
+    subprocess.check_call(
+        [sys.executable, translator, domain_file, problem_file,
+         "--sas-file", str(sas_file)] + export_options + list(extra_options),
+        cwd=os.path.dirname(str(sas_file)), stdout=subprocess.DEVNULL)
+    with open(sas_file) as f:
+        output = f.read()
+    if relaxation_operators_file is None:
+        return output
+    with open(relaxation_operators_file) as f:
+        return output, f.read()
+
+def test_semi_naive_model_computation(tmp_path):
+    for domain, problem in TASKS:
+        queue_output = translate(
+            domain, problem, tmp_path / "queue.sas")
+        semi_naive_output = translate(
+            domain, problem, tmp_path / "semi-naive.sas",
+            "--model-computation", "semi-naive")
+        assert queue_output == semi_naive_output, domain
+
+def test_cardinality_join_order(tmp_path):
+    # The join order must change neither the SAS task nor the relaxed
+    # operators, which determine the relaxation heuristics.
+    for domain, problem in TASKS + [("satellite", "p25-HC-pfile5.pddl")]:
+        greedy_output = translate(
+            domain, problem, tmp_path / "greedy.sas",
+            relaxation_operators_file=tmp_path / "greedy.txt")
+        cardinality_output = translate(
+            domain, problem, tmp_path / "cardinality.sas",
+            "--join-order", "cardinality",
+            relaxation_operators_file=tmp_path / "cardinality.txt")
+        assert greedy_output == cardinality_output, domain
+
+def test_product_rule_fires_combinations_with_new_atom():
+    conditions = [pddl.Atom("p", ["?x"]), pddl.Atom("q", ["?y", "c"]),
+                  pddl.Atom("p", ["?z"])]
+    rule = pddl_to_prolog.Rule(conditions, pddl.Atom("r", ["?x", "?y", "?z"]))
+    rule.type = "product"
+    prog = pddl_to_prolog.PrologProgram()
+    prog.add_rule(rule)
+    rule, = build_model.convert_rules(prog)
+    atoms = [pddl.Atom("p", ["a"]), pddl.Atom("q", ["b", "c"]),
+             pddl.Atom("p", ["d"]), pddl.Atom("q", ["e", "c"])]
+    fired = []
+    for atom in atoms:
+        for cond_index, cond in enumerate(rule.conditions):
+            if cond.predicate == atom.predicate:
+                rule.update_index(atom, cond_index)
+                rule.fire(atom, cond_index,
+                          lambda predicate, args: fired.append(tuple(args)))
+    expected = set(itertools.product(["a", "d"], ["b", "e"], ["a", "d"]))
+    assert set(fired) == expected
+
+def test_model_profile(tmp_path):
+    domain_file = os.path.join(BENCHMARKS, "gripper", "domain.pddl")
+    problem_file = os.path.join(BENCHMARKS, "gripper", "prob01.pddl")
+    for model_computation in ["queue", "semi-naive"]:
+        profile_file = tmp_path / ("%s.json" % model_computation)
+        log = subprocess.check_output(
+            [sys.executable, os.path.join(TRANSLATE_DIR, "translate.py"),
+             domain_file, problem_file, "--sas-file", str(tmp_path / "sas"),
+             "--model-computation", model_computation,
+             "--model-profile-file", str(profile_file)],
+            cwd=str(tmp_path), encoding="utf-8")
+        with open(profile_file) as f:
+            profile = json.load(f)
+        num_facts = (int(re.search(r"(\d+) final queue length", log)[1]) -
+                     sum(rule["pushes"] - rule["duplicate_pushes"]
+                         for rule in profile["rules"]))
+        assert int(re.search(r"(\d+) total queue pushes", log)[1]) == (
+            num_facts + sum(rule["pushes"] for rule in profile["rules"]))
+        origins = {rule["origin"] for rule in profile["rules"]}
+        assert {"<action move>", "<action pick>", "<action drop>",
+                "<goal>"} <= origins
+        assert {origin["origin"] for origin in profile["origins"]} == origins
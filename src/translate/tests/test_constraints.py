@@ -0,0 +1,54 @@
+import itertools
+import random
+
+import constraints
+
+
+def is_solvable_by_enumeration(system):
+    """Check all combinations of EqualityConjunctions of the system."""
+    for eq_conjunctions in itertools.product(*system.equality_DNFs):
+        combined = constraints.EqualityConjunction([
+            equality for eq_conjunction in eq_conjunctions
+            for equality in eq_conjunction.equalities])
+        if not combined.is_consistent():
+            continue
+        representative = combined.get_representative()
+        def get_representative(term):
+            return representative.get(term, term)
+        if any(constraints.is_object(get_representative(term))
+               for term in system.not_constant):
+            continue
+        if all(any(get_representative(a) != get_representative(b)
+                   for a, b in ineq_disj.parts)
+               for ineq_disj in system.ineq_disjunctions):
+            return True
+    return False
+
+
+def get_random_system(rng):
+    terms = ["?x", "?y", "?z", "?w", 0, 1, "a", "b"]
+    def get_pairs(max_num):
+        return [tuple(rng.sample(terms, 2))
+                for _ in range(rng.randint(1, max_num))]
+    system = constraints.ConstraintSystem()
+    for _ in range(rng.randint(0, 5)):
+        system.add_equality_DNF([
+            constraints.EqualityConjunction(get_pairs(3))
+            for _ in range(rng.randint(0, 3))])
+    for _ in range(rng.randint(0, 3)):
+        system.add_inequality_disjunction(
+            constraints.InequalityDisjunction(get_pairs(2)))
+    for _ in range(rng.randint(0, 2)):
+        system.add_not_constant(rng.choice(terms[:4]))
+    return system
+
+
+def test_is_solvable_matches_enumeration():
+    rng = random.Random(2024)
+    results = set()
+    for _ in range(2000):
+        system = get_random_system(rng)
+        expected = is_solvable_by_enumeration(system)
+        assert system.is_solvable() == expected, str(system)
+        results.add(expected)
+    assert results == {False, True}
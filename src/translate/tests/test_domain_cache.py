@@ -0,0 +1,44 @@
+import os
+import os.path
+import subprocess
+import sys
+
+DIR = os.path.dirname(os.path.abspath(__file__))
+TRANSLATE_DIR = os.path.dirname(DIR)
+REPO = os.path.abspath(os.path.join(DIR, "..", "..", ".."))
+BENCHMARKS = os.path.join(REPO, "misc", "tests", "benchmarks")
+TASKS = [
+    ("miconic-simpleadl", "s1-0.pddl"),
+    ("philosophers", "p01-phil2.pddl"),
+]
+
+def translate(domain, problem, sas_file, hash_seed, *extra_options):
+    translator = os.path.join(TRANSLATE_DIR, "translate.py")
+    domain_file = os.path.join(BENCHMARKS, domain, "domain.pddl")
+    problem_file = os.path.join(BENCHMARKS, domain, problem)
+    # Cached conditions must not keep hash values from another process.
+    env = dict(os.environ, PYTHONHASHSEED=str(hash_seed))
+    log = subprocess.check_output(
+        [sys.executable, translator, domain_file, problem_file,
+         "--sas-file", str(sas_file), "--skip-relaxation-operators"] +
+        list(extra_options),
+        cwd=os.path.dirname(str(sas_file)), env=env, text=True)
+    with open(sas_file) as f:
+        return f.read(), log
+
+def test_domain_cache(tmp_path):
+    cache_dir = tmp_path / "cache"
+    for domain, problem in TASKS:
+        expected_output, _ = translate(
+            domain, problem, tmp_path / "output.sas", 1)
+        for hash_seed, cached in [(2, False), (3, True)]:
+            output, log = translate(
+                domain, problem, tmp_path / "output.sas", hash_seed,
+                "--domain-cache-dir", str(cache_dir))
+            assert ("Using cached domain" in log) == cached, domain
+            assert ("Using cached invariants" in log) == cached, domain
+            assert output == expected_output, domain
+    cache_files = os.listdir(cache_dir)
+    for prefix in ["domain-", "invariants-"]:
+        assert len([f for f in cache_files
+                    if f.startswith(prefix)]) == len(TASKS)
@@ -0,0 +1,49 @@
+import random
+
+import greedy_join
+import pddl
+import pddl_to_prolog
+
+
+def find_min_pair_by_scanning(costs):
+    """Return the first pair with minimal cost in the triangular matrix
+    costs, scanning it row by row."""
+    min_cost = None
+    for i, row in enumerate(costs):
+        for j, cost in enumerate(row):
+            if min_cost is None or cost < min_cost:
+                min_cost = cost
+                min_pair = i, j
+    return min_pair
+
+
+def get_random_rule(rng, num_conditions):
+    variables = ["?v%d" % i for i in range(num_conditions // 2 + 1)]
+    conditions = []
+    for i in range(num_conditions):
+        args = rng.sample(variables, rng.randint(1, min(3, len(variables))))
+        conditions.append(pddl.Atom("p%d" % i, args))
+    effect = pddl.Atom("goal", sorted(pddl_to_prolog.get_variables(
+        conditions[:2])))
+    return pddl_to_prolog.Rule(conditions, effect)
+
+
+def test_find_min_pair_matches_scanning():
+    rng = random.Random(2024)
+    for _ in range(50):
+        rule = get_random_rule(rng, rng.randint(2, 30))
+        cost_matrix = greedy_join.CostMatrix(rule.conditions)
+        joinees = list(rule.conditions)
+        while cost_matrix.can_join():
+            costs = [[cost_matrix.compute_join_cost(joinee, other)
+                      for other in joinees[:i]]
+                     for i, joinee in enumerate(joinees)]
+            left_index, right_index = find_min_pair_by_scanning(costs)
+            expected = (joinees[left_index], joinees[right_index])
+            assert cost_matrix.remove_min_pair() == expected
+            del joinees[left_index]
+            del joinees[right_index]
+            joint = pddl.Atom("joint%d" % len(joinees), sorted(
+                pddl_to_prolog.get_variables(expected)))
+            joinees.append(joint)
+            cost_matrix.add_entry(joint)
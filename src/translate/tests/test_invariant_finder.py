@@ -0,0 +1,31 @@
+import contextlib
+from io import StringIO
+import os.path
+
+import instantiate
+import invariant_finder
+import normalize
+import options
+import pddl_parser
+
+DIR = os.path.dirname(os.path.abspath(__file__))
+REGRESSION_TESTS = os.path.join(os.path.dirname(DIR), "regression-tests")
+
+def find_invariants(monkeypatch, jobs):
+    monkeypatch.setattr(options, "jobs", jobs)
+    # With the serial check, the invariants of this task depend on the
+    # order in which the actions are checked.
+    task = pddl_parser.open(
+        os.path.join(REGRESSION_TESTS, "issue7-domain.pddl"),
+        os.path.join(REGRESSION_TESTS, "issue7-problem.pddl"))
+    with contextlib.redirect_stdout(StringIO()):
+        normalize.normalize(task)
+        _, _, _, _, _, reachable_action_params = instantiate.explore(task)
+        return [str(invariant) for invariant in
+                invariant_finder.find_invariants(
+                    task, reachable_action_params)]
+
+def test_parallel_invariant_checking(monkeypatch):
+    serial_invariants = find_invariants(monkeypatch, 1)
+    assert serial_invariants
+    assert find_invariants(monkeypatch, 3) == serial_invariants
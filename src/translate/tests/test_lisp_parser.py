@@ -0,0 +1,32 @@
+from io import StringIO
+
+import pytest
+
+from pddl_parser.lisp_parser import parse_nested_list
+from pddl_parser.parse_error import ParseError
+
+def parse(text):
+    return parse_nested_list(StringIO(text))
+
+def test_parse_nested_list():
+    text = "(Define (DOMAIN d) ; comment (with parentheses)\n  (at ?x?y) ())\n"
+    assert parse(text) == ["define", ["domain", "d"], ["at", "?x", "?y"], []]
+
+def test_deep_nesting():
+    depth = 10000
+    result = parse("(" * depth + "a" + ")" * depth)
+    for _ in range(depth - 1):
+        result, = result
+    assert result == ["a"]
+
+@pytest.mark.parametrize("text, message", [
+    ("", "Expected '(', got end of file."),
+    ("a (b)", "Expected '(', got 'a'."),
+    ("(a (b)", "Missing ')'"),
+    ("(a) (b)", "Tokens remaining after parsing: ( b )"),
+    ("(a ; é\n é b)\n", "Non-ASCII character outside comment:  é b)"),
+])
+def test_parse_errors(text, message):
+    with pytest.raises(ParseError) as excinfo:
+        parse(text)
+    assert str(excinfo.value) == message
@@ -0,0 +1,102 @@
+from io import StringIO
+
+from sas_tasks import (SASAxiom, SASGoal, SASInit, SASMutexGroup,
+                       SASOperator, SASTask, SASVariables)
+
+def make_task():
+    variables = SASVariables(
+        ranges=[2, 3, 2],
+        axiom_layers=[-1, -1, 0],
+        value_names=[
+            ["Atom at(a)", "NegatedAtom at(a)"],
+            ["Atom pos(x)", "Atom pos(y)", "<none of those>"],
+            ["Atom derived()", "NegatedAtom derived()"],
+        ])
+    mutexes = [SASMutexGroup([(1, 0), (1, 1)])]
+    init = SASInit([0, 2, 1])
+    goal = SASGoal([(0, 1), (2, 0)])
+    operators = [
+        SASOperator("(move x y)", [(0, 0)], [(1, 0, 1, [])], 1),
+        SASOperator("(toggle)", [], [
+            (0, -1, 1, [(1, 1), (2, 0)]),
+            (1, -1, 2, []),
+        ], 5),
+    ]
+    axioms = [SASAxiom([(0, 1), (1, 1)], (2, 0))]
+    return SASTask(variables, mutexes, init, goal, operators, axioms,
+                   metric=True)
+
+def test_output():
+    output = StringIO()
+    make_task().output(output)
+    assert output.getvalue() == """\
+begin_version
+3
+end_version
+begin_metric
+1
+end_metric
+3
+begin_variable
+var0
+-1
+2
+Atom at(a)
+NegatedAtom at(a)
+end_variable
+begin_variable
+var1
+-1
+3
+Atom pos(x)
+Atom pos(y)
+<none of those>
+end_variable
+begin_variable
+var2
+0
+2
+Atom derived()
+NegatedAtom derived()
+end_variable
+1
+begin_mutex_group
+2
+1 0
+1 1
+end_mutex_group
+begin_state
+0
+2
+1
+end_state
+begin_goal
+2
+0 1
+2 0
+end_goal
+2
+begin_operator
+move x y
+1
+0 0
+1
+0 1 0 1
+1
+end_operator
+begin_operator
+toggle
+0
+2
+2 1 1 2 0 0 -1 1
+0 1 -1 2
+5
+end_operator
+1
+begin_rule
+2
+0 1
+1 1
+2 1 0
+end_rule
+"""
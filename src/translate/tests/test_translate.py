@@ -0,0 +1,140 @@
+import contextlib
+from io import BytesIO, StringIO
+import os.path
+import struct
+import subprocess
+import sys
+
+import instantiate
+import options
+import pddl_parser
+import translate
+
+DIR = os.path.dirname(os.path.abspath(__file__))
+TRANSLATE_DIR = os.path.dirname(DIR)
+REPO = os.path.abspath(os.path.join(DIR, "..", "..", ".."))
+BENCHMARKS = os.path.join(REPO, "misc", "tests", "benchmarks")
+DOMAIN = os.path.join(BENCHMARKS, "gripper", "domain.pddl")
+PROBLEM = os.path.join(BENCHMARKS, "gripper", "prob01.pddl")
+
+def translate_in_memory(args=None):
+    with open(DOMAIN) as domain_file, open(PROBLEM) as problem_file:
+        task = pddl_parser.parse(domain_file.read(), problem_file.read())
+    with contextlib.redirect_stdout(StringIO()):
+        sas_task, relaxed_operators = translate.translate(task, args)
+    output = StringIO()
+    sas_task.output(output)
+    return output.getvalue(), relaxed_operators
+
+def test_translate_in_memory(tmp_path):
+    sas_file = tmp_path / "output.sas"
+    subprocess.check_call(
+        [sys.executable, os.path.join(TRANSLATE_DIR, "translate.py"),
+         DOMAIN, PROBLEM, "--sas-file", str(sas_file),
+         "--skip-relaxation-operators"],
+        cwd=str(tmp_path), stdout=subprocess.DEVNULL)
+
+    output, relaxed_operators = translate_in_memory()
+    assert output == sas_file.read_text()
+    assert relaxed_operators
+
+    args = options.get_default_args()
+    args.export_relaxation_operators = False
+    output, relaxed_operators = translate_in_memory(args)
+    assert output == sas_file.read_text()
+    assert relaxed_operators is None
+    assert options.export_relaxation_operators
+
+def translate_issue7(jobs):
+    task = pddl_parser.open(
+        os.path.join(TRANSLATE_DIR, "regression-tests", "issue7-domain.pddl"),
+        os.path.join(TRANSLATE_DIR, "regression-tests", "issue7-problem.pddl"))
+    args = options.get_default_args()
+    args.add_implied_preconditions = True
+    args.jobs = jobs
+    with contextlib.redirect_stdout(StringIO()):
+        sas_task, _ = translate.translate(task, args)
+    output = StringIO()
+    sas_task.output(output)
+    return (output.getvalue(), translate.simplified_effect_condition_counter,
+            translate.added_implied_precondition_counter)
+
+def test_parallel_operator_translation():
+    serial_result = translate_issue7(1)
+    output, num_simplified, num_implied = serial_result
+    assert num_simplified and num_implied
+    assert translate_issue7(3) == serial_result
+
+def decode_binary_operators(data, value_names):
+    """Decode the binary export of the relaxed operators. Return the
+    operators as (effect, preconditions, cost) triples of proposition
+    names, with ("aux", index) for auxiliary propositions."""
+    magic, version, num_auxiliary, num_operators, num_preconditions = \
+        struct.unpack_from("<4s4i", data)
+    assert magic == instantiate.RELAXED_OPERATORS_MAGIC
+    assert version == instantiate.RELAXED_OPERATORS_VERSION
+    header_size = struct.calcsize("<4s4i")
+    num_numbers = 4 * num_operators + 2 * num_preconditions
+    assert len(data) == header_size + 4 * num_numbers
+    numbers = struct.unpack_from("<%di" % num_numbers, data, header_size)
+    preconditions = iter(zip(*[iter(numbers[4 * num_operators:])] * 2))
+    def get_name(var, value):
+        if var == -1:
+            assert 0 <= value < num_auxiliary
+            return ("aux", value)
+        return value_names[var][value]
+    operators = []
+    for op_no in range(num_operators):
+        var, value, cost, num_op_preconditions = numbers[4 * op_no:4 * op_no + 4]
+        operators.append((get_name(var, value), [
+            get_name(*next(preconditions))
+            for _ in range(num_op_preconditions)], cost))
+    assert next(preconditions, None) is None
+    return operators
+
+def decode_text_operators(text, fact_names):
+    """Parse the text export of the relaxed operators like
+    decode_binary_operators. Auxiliary propositions are numbered in the
+    order of their first occurrence, like the binary export does."""
+    auxiliary_ids = {}
+    def get_name(name):
+        if name in fact_names:
+            return name
+        return ("aux", auxiliary_ids.setdefault(name, len(auxiliary_ids)))
+    lines = iter(text.splitlines())
+    operators = []
+    for line in lines:
+        if line == "end_operators":
+            break
+        effect = get_name(line)
+        preconditions = [get_name(name)
+                         for name in iter(lines.__next__, "cost")]
+        operators.append((effect, preconditions, int(next(lines))))
+    assert next(lines, None) is None
+    return operators
+
+def test_binary_relaxed_operators():
+    regression_tests = os.path.join(TRANSLATE_DIR, "regression-tests")
+    for domain, problem in [
+            (os.path.join(BENCHMARKS, "gripper", "domain.pddl"),
+             os.path.join(BENCHMARKS, "gripper", "prob01.pddl")),
+            (os.path.join(BENCHMARKS, "miconic-simpleadl", "domain.pddl"),
+             os.path.join(BENCHMARKS, "miconic-simpleadl", "s1-0.pddl")),
+            (os.path.join(BENCHMARKS, "philosophers", "domain.pddl"),
+             os.path.join(BENCHMARKS, "philosophers", "p01-phil2.pddl")),
+            (os.path.join(regression_tests, "issue7-domain.pddl"),
+             os.path.join(regression_tests, "issue7-problem.pddl"))]:
+        task = pddl_parser.open(domain, problem)
+        with contextlib.redirect_stdout(StringIO()):
+            sas_task, relaxed_operators = translate.translate(task)
+        value_names = sas_task.variables.value_names
+        text_output = StringIO()
+        instantiate.output(relaxed_operators, text_output)
+        binary_output = BytesIO()
+        instantiate.output_binary(relaxed_operators, value_names, binary_output)
+
+        fact_names = {name for names in value_names for name in names}
+        operators = decode_text_operators(text_output.getvalue(), fact_names)
+        assert operators
+        assert decode_binary_operators(
+            binary_output.getvalue(), value_names) == operators
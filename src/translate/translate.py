@@ -1,6 +1,7 @@
 #! /usr/bin/env python3
 
 
+import multiprocessing
 import os
 import sys
 import traceback
@@ -20,6 +21,7 @@ from copy import deepcopy
 from itertools import product
 
 import axiom_rules
+import domain_cache
 import fact_groups
 import instantiate
 import normalize
@@ -396,6 +398,11 @@ def translate_strips_axiom(axiom, dictionary, ranges, mutex_dict, mutex_ranges):
 
 def translate_strips_operators(actions, strips_to_sas, ranges, mutex_dict,
                                mutex_ranges, implied_facts):
+    if (options.jobs > 1 and len(actions) > 1 and
+            "fork" in multiprocessing.get_all_start_methods()):
+        return translate_strips_operators_in_parallel(
+            actions, strips_to_sas, ranges, mutex_dict, mutex_ranges,
+            implied_facts, options.jobs)
     result = []
     for action in actions:
         sas_ops = translate_strips_operator(action, strips_to_sas, ranges,
@@ -405,6 +412,56 @@ def translate_strips_operators(actions, strips_to_sas, ranges, mutex_dict,
     return result
 
 
+def init_operator_worker(*args):
+    global worker_operator_args
+    worker_operator_args = args
+
+
+def translate_operator_shard(shard):
+    """Translate the actions in the given range of indices in a worker
+    process. Return the operators together with the increments of the
+    counters, which the parent process adds to its own counters."""
+    global simplified_effect_condition_counter
+    global added_implied_precondition_counter
+    simplified_effect_condition_counter = 0
+    added_implied_precondition_counter = 0
+    actions, *dictionaries = worker_operator_args
+    start, end = shard
+    result = []
+    for action in actions[start:end]:
+        result.extend(translate_strips_operator(action, *dictionaries))
+    return (result, simplified_effect_condition_counter,
+            added_implied_precondition_counter)
+
+
+def translate_strips_operators_in_parallel(actions, strips_to_sas, ranges,
+                                           mutex_dict, mutex_ranges,
+                                           implied_facts, jobs):
+    """Translate the actions like translate_strips_operators does, but
+    split them into contiguous shards that a pool of processes translates.
+    The workers inherit the actions and dictionaries through fork, so only
+    the resulting operators are sent back. We concatenate them in the
+    order of the shards to get the same operators as the serial
+    translation."""
+    global simplified_effect_condition_counter
+    global added_implied_precondition_counter
+    print("Translating operators with %d processes" % jobs)
+    num_shards = min(len(actions), 4 * jobs)
+    bounds = [len(actions) * i // num_shards for i in range(num_shards + 1)]
+    shards = list(zip(bounds, bounds[1:]))
+    context = multiprocessing.get_context("fork")
+    result = []
+    with context.Pool(jobs, initializer=init_operator_worker, initargs=(
+            actions, strips_to_sas, ranges, mutex_dict, mutex_ranges,
+            implied_facts)) as pool:
+        for sas_ops, num_simplified, num_implied in pool.imap(
+                translate_operator_shard, shards):
+            result.extend(sas_ops)
+            simplified_effect_condition_counter += num_simplified
+            added_implied_precondition_counter += num_implied
+    return result
+
+
 def translate_strips_axioms(axioms, strips_to_sas, ranges, mutex_dict,
                             mutex_ranges):
     result = []
@@ -545,10 +602,11 @@ def unsolvable_sas_task(msg):
     print("%s! Generating unsolvable task..." % msg)
     return trivial_task(solvable=False)
 
-def pddl_to_sas(task):
+def pddl_to_sas(task, relaxation_exploration=None):
     with timers.timing("Instantiating", block=True):
         (relaxed_reachable, atoms, actions, goal_list, axioms,
-         reachable_action_params) = instantiate.explore(task)
+         reachable_action_params) = instantiate.explore(
+             task, relaxation_exploration)
 
     if not relaxed_reachable:
         return unsolvable_sas_task("No relaxed solution")
@@ -593,6 +651,12 @@ def pddl_to_sas(task):
             print("using full encoding: between-variable mutex information skipped.")
             mutex_key = []
 
+    # Reset the statistics in case the translator runs repeatedly in one
+    # process (see translate).
+    global simplified_effect_condition_counter
+    global added_implied_precondition_counter
+    simplified_effect_condition_counter = 0
+    added_implied_precondition_counter = 0
     with timers.timing("Translating task", block=True):
         sas_task = translate_task(
             strips_to_sas, ranges, translation_key,
@@ -703,14 +767,25 @@ def dump_statistics(sas_task):
         print("Translator peak memory: %d KB" % peak_memory)
 
 
-def main():
-    timer = timers.Timer()
-    with timers.timing("Parsing", True):
-        task = pddl_parser.open(
-            domain_filename=options.domain, task_filename=options.task)
+def translate(task, args=None):
+    """Translate the parsed PDDL task (see pddl_parser.open and
+    pddl_parser.parse) in memory, without reading or writing files (except
+    for the debug output of --dump-task).
+
+    Use the translator options args (see options.get_default_args; the
+    options for input and output files are ignored) or the default options.
+    Return the SAS task and the relaxed operators for the relaxation
+    heuristics (see instantiate.get_operators_for_relaxation_heuristic),
+    which are None if args.export_relaxation_operators is False."""
+    if args is None:
+        args = options.get_default_args()
+    with options.use_args(args):
+        return pddl_task_to_sas(task)
 
+
+def pddl_task_to_sas(task, domain_normalization=None):
     with timers.timing("Normalizing task"):
-        normalize.normalize(task)
+        normalize.normalize(task, domain_normalization)
 
     if options.generate_relaxed_task:
         # Remove delete effects.
@@ -719,14 +794,50 @@ def main():
                 if effect.literal.negated:
                     del action.effects[index]
 
-    sas_task = pddl_to_sas(task)
+    if options.export_relaxation_operators:
+        # Explore the rules for the relaxed operators together with the
+        # normal exploration rules instead of computing a second model.
+        relaxation_exploration = instantiate.RelaxationExploration(task)
+    else:
+        relaxation_exploration = None
+
+    sas_task = pddl_to_sas(task, relaxation_exploration)
     dump_statistics(sas_task)
 
-    instantiate.compute_operators_for_relaxation_heuristic(task, sas_task)
+    if relaxation_exploration is not None:
+        relaxed_operators = instantiate.get_operators_for_relaxation_heuristic(
+            task, sas_task, relaxation_exploration)
+    else:
+        relaxed_operators = None
+    return sas_task, relaxed_operators
+
+
+def main():
+    timer = timers.Timer()
+    with timers.timing("Parsing", True):
+        if options.domain_cache_dir is None:
+            task = pddl_parser.open(
+                domain_filename=options.domain, task_filename=options.task)
+            domain_normalization = None
+        else:
+            task, domain_normalization = domain_cache.parse_task(
+                options.domain, options.task, options.domain_cache_dir)
+
+    sas_task, relaxed_operators = pddl_task_to_sas(task, domain_normalization)
 
     with timers.timing("Writing output"):
         with open(options.sas_file, "w") as output_file:
             sas_task.output(output_file)
+
+    # Write the relaxed operators after the SAS file, so that the driver
+    # can tell from the modification times that they belong together.
+    if relaxed_operators is not None:
+        instantiate.write_operators_for_relaxation_heuristic(
+            relaxed_operators, sas_task, options.relaxation_operators_format,
+            options.relaxation_operators_file)
+    else:
+        instantiate.remove_operators_for_relaxation_heuristic(
+            options.relaxation_operators_file)
     print("Done! %s" % timer)
 
 
@@ -738,7 +849,8 @@ def handle_sigxcpu(signum, stackframe):
     os._exit(TRANSLATE_OUT_OF_TIME)
 
 
-if __name__ == "__main__":
+def run():
+    options.setup()
     try:
         signal.signal(signal.SIGXCPU, handle_sigxcpu)
     except AttributeError:
@@ -762,3 +874,7 @@ if __name__ == "__main__":
     except pddl_parser.ParseError as e:
         print(e)
         sys.exit(TRANSLATE_INPUT_ERROR)
+
+
+if __name__ == "__main__":
+    run()